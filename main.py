@@ -14,11 +14,39 @@ def main():
     print(f"🔧 Режим: {'ТЕСТОВЫЙ' if os.getenv('TEST_MODE') == 'true' else 'РАБОЧИЙ'}")
 
     try:
+        from src.config.settings import settings
         from src.core.manager import ResponseManager
+        from src.core.state import RunState
+        from src.core.tenants import TenantRunner, load_tenants
+        from src.utils.deadline import Deadline
 
-        # Создаем менеджер и запускаем одну итерацию
-        manager = ResponseManager(test_mode=False)
-        manager.process_new_reviews()
+        # Раннер убьет процесс по timeout-minutes - заканчиваем раньше сами
+        deadline = Deadline(settings.RUN_TIME_BUDGET or None, settings.RUN_TIME_RESERVE)
+
+        # Восстанавливаем состояние прошлого запуска (кэш GitHub Actions)
+        state = RunState(settings.STATE_FILE)
+
+        # Создаем менеджер (или по менеджеру на каждого продавца) и запускаем одну итерацию
+        tenants = load_tenants()
+        if tenants:
+            print(f"🏪 Продавцов: {len(tenants)}")
+            bot = TenantRunner(tenants, test_mode=False, snapshot=state.load(), deadline=deadline)
+            run_once = bot.process_all
+        else:
+            bot = ResponseManager(test_mode=False, snapshot=state.load(), deadline=deadline)
+            run_once = bot.process_new_reviews
+
+        try:
+            run_once()
+        finally:
+            bot.close()
+            state.save(bot.export_state())
+            print(f"⏱️ Осталось времени запуска: {deadline.describe()}")
+
+        from src.utils.http import transport
+        for host, stats in transport.pool_stats().items():
+            print(f"🔌 {host}: {stats['requests']} запросов, "
+                  f"{stats['connections_opened']} соединений, ошибок: {stats['errors']}")
 
         print("✅ Обработка завершена успешно")
         return 0
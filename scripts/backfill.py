@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Выгрузка истории отзывов Wildberries за период
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timezone
+
+# Добавляем путь к src
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.api.wb_client import WBAPIClient
+from src.config.settings import settings
+from src.core.backfill import ArchiveBackfiller
+
+def parse_date(value: str) -> datetime:
+    """Парсит дату в формате YYYY-MM-DD (UTC)"""
+    return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+
+def main():
+    parser = argparse.ArgumentParser(description="Выгрузка истории отзывов Wildberries")
+    parser.add_argument('--from', dest='date_from', required=True, type=parse_date,
+                        help="Начало периода, YYYY-MM-DD")
+    parser.add_argument('--to', dest='date_to', type=parse_date,
+                        default=datetime.now(timezone.utc),
+                        help="Конец периода, YYYY-MM-DD (по умолчанию сейчас; неполное "
+                             "последнее окно выгружается заново при каждом запуске)")
+    parser.add_argument('--window-days', type=int, default=30, help="Размер окна в днях")
+    parser.add_argument('--workers', type=int, default=4, help="Число параллельных окон")
+    parser.add_argument('--output', default=os.path.join(settings.STATE_DIR, 'backfill'),
+                        help="Каталог для результатов и чекпоинта")
+    args = parser.parse_args()
+
+    print("📦 Выгрузка истории отзывов Wildberries...")
+    print(f"📅 Период: {args.date_from:%Y-%m-%d} - {args.date_to:%Y-%m-%d}")
+
+    client = WBAPIClient(test_mode=False)
+    backfiller = ArchiveBackfiller(client, args.output,
+                                   window_days=args.window_days, workers=args.workers)
+
+    try:
+        backfiller.run(args.date_from, args.date_to)
+    except KeyboardInterrupt:
+        print("\n🛑 Прервано. Повторный запуск продолжит с незавершенных окон.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Выборщик и воркеры очереди задач обработки отзывов
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+# Добавляем путь к src
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.config.settings import settings
+from src.core.manager import ResponseManager
+from src.core.poller import AdaptivePoller
+from src.core.workers import ReviewProducer, ReviewWorker
+from src.storage.work_queue import create_work_queue
+from src.utils.deadline import Deadline
+
+def run_producer(manager: ResponseManager, queue, once: bool, stop: threading.Event):
+    """Ставит новые отзывы в очередь (в цикле с адаптивным интервалом)"""
+    producer = ReviewProducer(manager, queue)
+    poller = AdaptivePoller(
+        min_interval=settings.POLL_MIN_INTERVAL,
+        max_interval=settings.CHECK_INTERVAL * 60,
+        backoff=settings.POLL_BACKOFF,
+        jitter=settings.POLL_JITTER
+    )
+
+    # Выборщик владеет курсором - второй экземпляр ждет, пока первый не пропадет
+    leader_ttl = settings.CHECK_INTERVAL * 60 + settings.LEASE_TTL
+    while not stop.is_set():
+        if manager.leases and not manager.leases.leader('queue_producer', leader_ttl):
+            print("🔒 Выборщик уже запущен в другом экземпляре, ждем")
+            if once:
+                break
+            stop.wait(settings.POLL_MIN_INTERVAL)
+            continue
+
+        queued = producer.run_once()
+        if once:
+            break
+        delay = poller.next_interval(queued)
+        print(f"⏰ Следующая выборка через {delay / 60:.1f} мин")
+        stop.wait(delay)
+
+def run_workers(manager: ResponseManager, queue, threads: int, once: bool, stop: threading.Event):
+    """Обрабатывает задачи в threads потоках; основной поток досылает outbox"""
+    worker = ReviewWorker(manager, queue, visibility_timeout=settings.QUEUE_VISIBILITY_TIMEOUT)
+    pool = [threading.Thread(target=worker.run, kwargs={'stop': stop, 'once': once},
+                             name=f"queue-worker-{index}", daemon=True)
+            for index in range(threads)]
+    for thread in pool:
+        thread.start()
+
+    while any(thread.is_alive() for thread in pool):
+        requeued = queue.requeue_expired()
+        if requeued:
+            print(f"♻️ Возвращено в очередь {requeued} задач упавших воркеров")
+        if manager.dispatcher:
+            manager.dispatcher.drain()
+        for thread in pool:
+            thread.join(timeout=5)
+
+    print(f"📋 Воркеры: {worker.stats}, очередь: {queue.stats()}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Обработка отзывов через очередь задач")
+    parser.add_argument('--role', choices=['producer', 'worker'], required=True,
+                        help="producer - выборка отзывов в очередь, worker - генерация и отправка")
+    parser.add_argument('--threads', type=int, default=settings.GENERATION_WORKERS,
+                        help="Число потоков воркера")
+    parser.add_argument('--once', action='store_true',
+                        help="Один проход: выборка или обработка текущей очереди")
+    parser.add_argument('--queue', default=settings.WORK_QUEUE_URL,
+                        help="Адрес очереди: sqlite:///data/queue.db или redis://host:6379/0")
+    args = parser.parse_args()
+
+    deadline = Deadline(settings.RUN_TIME_BUDGET or None, settings.RUN_TIME_RESERVE)
+    queue = create_work_queue(args.queue, max_attempts=settings.QUEUE_MAX_ATTEMPTS)
+    manager = ResponseManager(test_mode=settings.TEST_MODE, deadline=deadline)
+    stop = threading.Event()
+
+    print(f"🚀 Очередь задач: {args.queue}, роль: {args.role}")
+    started = time.monotonic()
+    try:
+        if args.role == 'producer':
+            run_producer(manager, queue, args.once, stop)
+        else:
+            run_workers(manager, queue, max(1, args.threads), args.once, stop)
+    except KeyboardInterrupt:
+        print("\n🛑 Остановка. Незавершенные задачи заберут другие воркеры.")
+        stop.set()
+        deadline.cancel()
+    finally:
+        manager.close()
+        print(f"⏱️ Время работы: {time.monotonic() - started:.0f} с")
+
+if __name__ == "__main__":
+    main()
@@ -56,7 +56,7 @@ def check_settings():
         print(f"🔐 WB API Key: {wb_status}")
         print(f"🏷️  Supplier ID: {supplier_status}")
         print(f"🤖 AI Провайдер: {ai_status}")
-        print(f"⏰ Интервал проверки: {settings.CHECK_INTERVAL} минут")
+        print(f"⏰ Интервал проверки: {settings.POLL_MIN_INTERVAL:g} с - {settings.CHECK_INTERVAL} минут")
         print(f"🔧 Тестовый режим: {'✅ ВКЛ' if settings.TEST_MODE else '✅ ВЫКЛ'}")
 
         # Все настройки в порядке если есть WB API ключ
@@ -176,7 +176,7 @@ def check_system():
     print(f"🐍 Версия Python: {sys.version.split()[0]}")
 
     # Доступность модулей
-    modules = ['requests', 'openai', 'schedule', 'dotenv']
+    modules = ['requests', 'openai', 'dotenv']
     available_modules = []
     for module in modules:
         try:
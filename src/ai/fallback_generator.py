@@ -3,6 +3,7 @@
 """
 
 import random
+from typing import List
 
 class FallbackAIGenerator:
     """Генератор ответов без использования OpenAI API"""
@@ -60,3 +61,7 @@ class FallbackAIGenerator:
 
         print(f"📝 Локальный шаблон: {response}")
         return response
+
+    def generate_replies(self, reviews: List[dict]) -> List[str]:
+        """Ответы на несколько отзывов (поля - как у generate_reply)"""
+        return [self.generate_reply(**review) for review in reviews]
@@ -3,6 +3,7 @@
 """
 
 import random
+from typing import List
 
 class FreeAIGenerator:
     """Генератор ответов с использованием бесплатных шаблонов"""
@@ -58,3 +59,7 @@ class FreeAIGenerator:
 
         print(f"🤖 Бесплатный AI: {response}")
         return response
+
+    def generate_replies(self, reviews: List[dict]) -> List[str]:
+        """Ответы на несколько отзывов (поля - как у generate_reply)"""
+        return [self.generate_reply(**review) for review in reviews]
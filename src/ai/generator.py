@@ -2,23 +2,34 @@
 Основной генератор ответов
 """
 
+import os
+import threading
+from typing import Callable, List, Tuple
 from .free_generator import FreeAIGenerator
 from .fallback_generator import FallbackAIGenerator
+from .reply_cache import ReplyCache
 from .russian_generator import RussianAIGenerator
+from .similarity import SimilarityIndex, review_group
+from .templates import get_fallback_response, has_leftover_placeholder, replace_name_placeholder
+from src.config.providers import AIProvider
 from src.config.settings import settings
 
+NAME_PLACEHOLDER = "[имя]"
+
 class AIGenerator:
     """Универсальный генератор ответов"""
 
-    def __init__(self, test_mode=False):
+    def __init__(self, test_mode=False, provider_state=None, deadline=None):
         self.test_mode = test_mode
+        self._slots_lock = threading.Lock()
+        self._provider_slots = {}
 
         if test_mode:
             self.generator = FallbackAIGenerator()
             print("🔧 ТЕСТОВЫЙ РЕЖИМ: Используем локальные шаблоны")
         else:
             if settings.AI_PROVIDER == "russian" and settings.has_russian_ai:
-                self.generator = RussianAIGenerator()
+                self.generator = RussianAIGenerator(provider_state, deadline)
                 print("🇷🇺 Используем российские AI провайдеры")
             elif settings.AI_PROVIDER == "free":
                 self.generator = FreeAIGenerator()
@@ -27,6 +38,130 @@ class AIGenerator:
                 self.generator = FallbackAIGenerator()
                 print("🔄 Используем локальные шаблоны")
 
+        # Кэш и индекс похожих отзывов нужны только платным LLM: шаблоны и так ничего не стоят
+        uses_llm = isinstance(self.generator, RussianAIGenerator)
+        cache_path = os.path.join(settings.STATE_DIR, 'reply_cache.db')
+        self.cache = ReplyCache(
+            cache_path,
+            max_entries=settings.REPLY_CACHE_SIZE,
+            ttl=settings.REPLY_CACHE_TTL_HOURS * 3600,
+            enabled=settings.REPLY_CACHE_ENABLED and uses_llm
+        )
+        self.similar = SimilarityIndex(
+            cache_path,
+            threshold=settings.SIMILARITY_THRESHOLD,
+            max_entries=settings.SIMILARITY_MAX_ENTRIES,
+            enabled=settings.SIMILARITY_ENABLED and uses_llm
+        )
+        # Похожие ответы, подобранные заранее для страницы отзывов (ключ кэша -> совпадение)
+        self._prepared = {}
+        self._prepared_lock = threading.Lock()
+
+    def provider_state(self):
+        """Состояние выбора провайдера (только для российских AI)"""
+        if isinstance(self.generator, RussianAIGenerator):
+            return self.generator.provider_state()
+        return None
+
+    @property
+    def max_concurrency(self):
+        """Ограничение параллельных запросов текущего провайдера (None - без ограничения)"""
+        return getattr(self.generator, 'max_concurrency', None)
+
+    def concurrency_slot(self, default_limit: int) -> threading.BoundedSemaphore:
+        """Семафор текущего провайдера, общий для всех пользователей генератора"""
+        name = self.provider_name
+        with self._slots_lock:
+            semaphore = self._provider_slots.get(name)
+            if semaphore is None:
+                limit = self.max_concurrency or max(1, default_limit)
+                semaphore = self._provider_slots[name] = threading.BoundedSemaphore(limit)
+            return semaphore
+
+    @property
+    def provider_name(self) -> str:
+        """Название используемого генератора (для истории ответов)"""
+        current = getattr(self.generator, 'current_provider', None)
+        if current is not None:
+            return current.value
+        return type(self.generator).__name__
+
+    @staticmethod
+    def _full_review_text(review_text: str, pros: str = "", cons: str = "") -> str:
+        """Полный текст отзыва из отдельных полей (если он еще не собран)"""
+        if "Отзыв:" in review_text or "Преимущества:" in review_text:
+            return review_text
+
+        full_review = []
+        if review_text.strip():
+            full_review.append(f"Отзыв: {review_text}")
+        if pros.strip():
+            full_review.append(f"Преимущества: {pros}")
+        if cons.strip():
+            full_review.append(f"Недостатки: {cons}")
+
+        return "\n".join(full_review) if full_review else review_text
+
+    def prepare(self, reviews: List) -> int:
+        """Подбирает похожие прошлые ответы для страницы отзывов одним запросом к индексу"""
+        if not self.similar.enabled:
+            return 0
+
+        candidates = []
+        for review in reviews:
+            text = self._full_review_text(review.review_text, review.pros, review.cons)
+            if not self.similar.eligible(text, review.rating):
+                continue
+            has_name = bool(review.user_name and review.user_name.strip())
+            key = ReplyCache.make_key(text, review.rating, review.product_name, has_name)
+            with self._prepared_lock:
+                if key in self._prepared:
+                    continue
+            candidates.append((key, text, review_group(review.rating, review.product_name, has_name)))
+
+        matches = self.similar.query([(text, group) for _, text, group in candidates])
+        with self._prepared_lock:
+            # Совпадения отзывов, которые так и не дошли до генерации, не копим бесконечно
+            if len(self._prepared) > 10 * settings.PIPELINE_QUEUE_SIZE:
+                self._prepared.clear()
+            for (key, _, _), match in zip(candidates, matches):
+                self._prepared[key] = match
+        return sum(match is not None for match in matches)
+
+    def _find_similar(self, key: str, text: str, rating: int, product_name: str, has_name: bool):
+        """Совпадение из prepare или отдельный запрос к индексу"""
+        if not self.similar.eligible(text, rating):
+            return None
+
+        with self._prepared_lock:
+            if key in self._prepared:
+                return self._prepared.pop(key)
+        return self.similar.query([(text, review_group(rating, product_name, has_name))])[0]
+
+    def _reuse(self, key: str, review_text: str, product_name: str, rating: int, has_name: bool):
+        """Готовый ответ (с плейсхолдером [имя]) из кэша или индекса похожих отзывов"""
+        cached = self.cache.get(key)
+        if cached is not None:
+            print("♻️ Такой отзыв уже встречался, ответ взят из кэша")
+            with self._prepared_lock:
+                self._prepared.pop(key, None)
+            return cached
+
+        similar = self._find_similar(key, review_text, rating, product_name, has_name)
+        if similar is not None:
+            reply, score = similar
+            print(f"♻️ Похожий отзыв уже встречался (близость {score:.2f}), используем его ответ")
+            self.cache.put(key, reply)
+            return reply
+        return None
+
+    def _remember(self, key: str, review_text: str, product_name: str, rating: int,
+                  has_name: bool, reply: str):
+        """Сохраняет ответ LLM для одинаковых и похожих отзывов"""
+        self.cache.put(key, reply)
+        if self.similar.eligible(review_text, rating):
+            self.similar.add(review_text, reply, review_group(rating, product_name, has_name))
+
     def generate_reply(self, review_text: str, product_name: str = "",
                     rating: int = 5, user_name: str = "",
                     pros: str = "", cons: str = "") -> str:
@@ -34,16 +169,101 @@ class AIGenerator:
 
         # Если review_text уже содержит объединенные данные, используем как есть
         # Иначе создаем полный текст из отдельных полей
-        if "Отзыв:" not in review_text and "Преимущества:" not in review_text:
-            full_review = []
-            if review_text.strip():
-                full_review.append(f"Отзыв: {review_text}")
-            if pros.strip():
-                full_review.append(f"Преимущества: {pros}")
-            if cons.strip():
-                full_review.append(f"Недостатки: {cons}")
-
-            if full_review:
-                review_text = "\n".join(full_review)
-
-        return self.generator.generate_reply(review_text, product_name, rating, user_name, pros, cons)
+        review_text = self._full_review_text(review_text, pros, cons)
+
+        if not self.cache.enabled and not self.similar.enabled:
+            reply, _ = self._checked(
+                self.generator.generate_reply(review_text, product_name, rating, user_name, pros, cons),
+                lambda: self.generator.generate_reply(review_text, product_name, rating, user_name, pros, cons),
+                rating, user_name
+            )
+            return reply
+
+        has_name = bool(user_name and user_name.strip())
+        key = ReplyCache.make_key(review_text, rating, product_name, has_name)
+        reply = self._reuse(key, review_text, product_name, rating, has_name)
+        if reply is not None:
+            return replace_name_placeholder(reply, user_name)
+
+        # Генерируем с плейсхолдером вместо имени, чтобы ответ подошел и другим покупателям
+        provider = self.provider_name
+        name = NAME_PLACEHOLDER if has_name else ""
+        reply, valid = self._checked(
+            self.generator.generate_reply(review_text, product_name, rating, name, pros, cons),
+            lambda: self.generator.generate_reply(review_text, product_name, rating, name, pros, cons),
+            rating, name
+        )
+        # Шаблон после сбоя провайдера в кэш не кладем - в следующий раз ответит LLM
+        if reply and valid and provider == self.provider_name != AIProvider.FALLBACK.value:
+            self._remember(key, review_text, product_name, rating, has_name, reply)
+        return replace_name_placeholder(reply, user_name)
+
+    @staticmethod
+    def _checked(reply: str, regenerate: Callable[[], str], rating: int,
+                 user_name: str) -> Tuple[str, bool]:
+        """Ответ без оставшихся плейсхолдеров; False - LLM не справилась и ответ взят из шаблона
+
+        Ответ с плейсхолдером вроде [Имя покупателя] генерируется заново один раз,
+        затем заменяется шаблоном. Такой шаблон в кэш не попадает.
+        """
+        if not has_leftover_placeholder(reply):
+            return reply, True
+
+        print(f"⚠️ В ответе остался плейсхолдер, генерируем заново: {reply[:80]}...")
+        reply = regenerate()
+        if not has_leftover_placeholder(reply):
+            return reply, True
+
+        print("⚠️ Плейсхолдер остался и в новом ответе, используем шаблон")
+        return get_fallback_response(rating, user_name), False
+
+    def generate_replies(self, reviews: List) -> List[str]:
+        """Генерирует ответы на несколько отзывов (WBReview), порядок сохраняется
+
+        Готовые ответы берутся из кэша и индекса похожих отзывов, остальные
+        генерируются пачкой: российские LLM получают несколько отзывов в
+        одном запросе.
+        """
+        reuse = self.cache.enabled or self.similar.enabled
+        if reuse:
+            self.prepare(reviews)
+
+        replies = [""] * len(reviews)
+        pending = []
+        for index, review in enumerate(reviews):
+            text = self._full_review_text(review.review_text, review.pros, review.cons)
+            has_name = bool(review.user_name and review.user_name.strip())
+            key = ReplyCache.make_key(text, review.rating, review.product_name, has_name)
+
+            reply = self._reuse(key, text, review.product_name, review.rating, has_name) if reuse else None
+            if reply is not None:
+                replies[index] = replace_name_placeholder(reply, review.user_name)
+            else:
+                pending.append((index, key, text, has_name))
+
+        if not pending:
+            return replies
+
+        provider = self.provider_name
+        requests = [
+            {
+                'review_text': text,
+                'product_name': reviews[index].product_name,
+                'rating': reviews[index].rating,
+                'user_name': (NAME_PLACEHOLDER if has_name else "") if reuse else reviews[index].user_name,
+                'pros': reviews[index].pros,
+                'cons': reviews[index].cons
+            }
+            for index, key, text, has_name in pending
+        ]
+        generated = self.generator.generate_replies(requests)
+        llm_replies = provider == self.provider_name != AIProvider.FALLBACK.value
+
+        for (index, key, text, has_name), request, reply in zip(pending, requests, generated):
+            review = reviews[index]
+            reply, valid = self._checked(reply, lambda: self.generator.generate_reply(**request),
+                                         review.rating, request['user_name'])
+            if reuse and reply and valid and llm_replies:
+                self._remember(key, text, review.product_name, review.rating, has_name, reply)
+            replies[index] = replace_name_placeholder(reply, review.user_name) if reuse else reply
+        return replies
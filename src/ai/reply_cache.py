@@ -0,0 +1,141 @@
+"""
+Кэш ответов на одинаковые отзывы
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reply_cache (
+    key TEXT PRIMARY KEY,
+    reply TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+def normalize_text(text: str) -> str:
+    """Текст отзыва без регистра, пунктуации, эмодзи и лишних пробелов"""
+    text = text.lower().replace('ё', 'е')
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+def rating_bucket(rating: int) -> str:
+    """Оценки, на которые отвечают одинаково"""
+    if rating >= 4:
+        return "positive"
+    if rating <= 2:
+        return "negative"
+    return "neutral"
+
+class ReplyCache:
+    """LRU кэш ответов с временем жизни и копией на диске
+
+    Ключ - нормализованный текст отзыва, группа оценки, товар и наличие
+    имени покупателя. Ответы хранятся с плейсхолдером [имя], имя
+    подставляется после выборки. Память - быстрый уровень на max_entries
+    записей, SQLite - второй уровень, который переживает перезапуск и
+    разовые запуски. Записи старше ttl секунд не выдаются.
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000, ttl: float = 30 * 24 * 3600,
+                 enabled: bool = True):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = {'memory': 0, 'disk': 0}
+        self.misses = 0
+
+        if not self.enabled:
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.execute("DELETE FROM reply_cache WHERE created_at < ?", (time.time() - self.ttl,))
+
+    def _conn(self) -> sqlite3.Connection:
+        """Соединение в режиме autocommit, отдельное на каждый поток"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(review_text: str, rating: int, product_name: str = "", has_name: bool = False) -> str:
+        raw = "|".join([normalize_text(review_text), rating_bucket(rating),
+                        normalize_text(product_name), "name" if has_name else ""])
+        return hashlib.blake2b(raw.encode('utf-8'), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Ответ с плейсхолдером [имя] или None"""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                reply, created_at = entry
+                if created_at >= now - self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits['memory'] += 1
+                    return reply
+                del self._memory[key]
+
+        row = self._conn().execute(
+            "SELECT reply, created_at FROM reply_cache WHERE key = ? AND created_at >= ?",
+            (key, now - self.ttl)
+        ).fetchone()
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits['disk'] += 1
+            self._remember(key, row[0], row[1])
+        return row[0]
+
+    def put(self, key: str, reply: str):
+        if not self.enabled or not reply:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._remember(key, reply, now)
+        self._conn().execute(
+            "INSERT OR REPLACE INTO reply_cache (key, reply, created_at) VALUES (?, ?, ?)",
+            (key, reply, now)
+        )
+
+    def _remember(self, key: str, reply: str, created_at: float):
+        self._memory[key] = (reply, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.hits['memory'] + self.hits['disk']
+            lookups = hits + self.misses
+            return {
+                'hits_memory': self.hits['memory'],
+                'hits_disk': self.hits['disk'],
+                'misses': self.misses,
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+                'entries': len(self._memory)
+            }
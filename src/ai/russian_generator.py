@@ -2,22 +2,58 @@
 Генератор ответов с использованием российских AI API
 """
 
-import requests
-from typing import Optional
+import json
+import threading
+import time
+from typing import Dict, List, Optional
 from src.config.providers import AIProvider, PROVIDER_CONFIGS
 from src.ai.templates import get_fallback_response, replace_name_placeholder
 from src.config.settings import settings
+from src.utils.deadline import Deadline
+from src.utils.http import transport
 
 class RussianAIGenerator:
     """Генератор ответов с российскими AI провайдерами"""
 
-    def __init__(self):
+    def __init__(self, provider_state: Optional[dict] = None, deadline: Optional[Deadline] = None):
+        self.deadline = deadline or Deadline()
         self.providers = self._initialize_providers()
         self.current_provider = None
         self.fallback_generator = None
+        self.provider_checked_at = 0.0
+        self._switch_lock = threading.Lock()
+        self.batch_size = max(1, settings.GENERATION_BATCH_SIZE)
+
+        # Если недавно уже выбирали провайдер - не тратим запросы на проверку
+        if not self._restore_provider(provider_state):
+            # Инициализируем провайдеры по порядку приоритета
+            self._select_provider()
+
+    def _restore_provider(self, provider_state: Optional[dict]) -> bool:
+        """Восстанавливает выбранный провайдер из сохраненного состояния"""
+        if not provider_state:
+            return False
+
+        try:
+            provider = AIProvider(provider_state.get('provider'))
+            checked_at = float(provider_state.get('checked_at', 0))
+        except (ValueError, TypeError):
+            return False
 
-        # Инициализируем провайдеры по порядку приоритета
-        self._select_provider()
+        if provider not in self.providers or time.time() - checked_at > settings.PROVIDER_HEALTH_TTL:
+            return False
+
+        self.current_provider = provider
+        self.provider_checked_at = checked_at
+        print(f"♻️ Провайдер из прошлого запуска: {self.providers[provider]['config']['name']}")
+        return True
+
+    def provider_state(self) -> dict:
+        """Состояние выбора провайдера для сохранения между запусками"""
+        return {
+            'provider': self.current_provider.value if self.current_provider else None,
+            'checked_at': self.provider_checked_at
+        }
 
     def _initialize_providers(self) -> dict:
         """Инициализирует доступные провайдеры"""
@@ -47,6 +83,8 @@ class RussianAIGenerator:
 
     def _select_provider(self):
         """Выбирает рабочий провайдер"""
+        self.provider_checked_at = time.time()
+
         # Пробуем провайдеры по порядку приоритета
         for provider in [AIProvider.YANDEX_GPT, AIProvider.GIGA_CHAT]:
             if provider in self.providers:
@@ -68,23 +106,32 @@ class RussianAIGenerator:
         except:
             return False
 
-    def _make_request(self, provider: AIProvider, prompt: str) -> Optional[str]:
+    def _make_request(self, provider: AIProvider, prompt: str,
+                      max_tokens: Optional[int] = None) -> Optional[str]:
         """Выполняет запрос к выбранному провайдеру"""
         provider_config = self.providers[provider]
         config = provider_config['config']
+        max_tokens = max_tokens or config['max_tokens']
+
+        # Запрос не должен пережить дедлайн запуска
+        timeout = self.deadline.timeout(transport.connect_timeout, transport.read_timeout)
+        if timeout is None:
+            print(f"⏰ Время запуска истекло, запрос к {config['name']} не отправлен")
+            return None
 
         try:
             if provider == AIProvider.YANDEX_GPT:
-                return self._call_yandex_gpt(provider_config, prompt)
+                return self._call_yandex_gpt(provider_config, prompt, timeout, max_tokens)
             elif provider == AIProvider.GIGA_CHAT:
-                return self._call_gigachat(provider_config, prompt)
+                return self._call_gigachat(provider_config, prompt, timeout, max_tokens)
             else:
                 return None
         except Exception as e:
             print(f"❌ Ошибка {config['name']}: {e}")
             return None
 
-    def _call_yandex_gpt(self, provider_config: dict, prompt: str) -> Optional[str]:
+    def _call_yandex_gpt(self, provider_config: dict, prompt: str, timeout=None,
+                         max_tokens: Optional[int] = None) -> Optional[str]:
         """Вызывает Yandex GPT API"""
         url = provider_config['config']['base_url']
 
@@ -98,7 +145,7 @@ class RussianAIGenerator:
             "completionOptions": {
                 "stream": False,
                 "temperature": provider_config['config']['temperature'],
-                "maxTokens": provider_config['config']['max_tokens']
+                "maxTokens": max_tokens or provider_config['config']['max_tokens']
             },
             "messages": [
                 {
@@ -112,18 +159,19 @@ class RussianAIGenerator:
             ]
         }
 
-        response = requests.post(url, headers=headers, json=data, timeout=30)
+        response = transport.post(url, headers=headers, json=data, timeout=timeout)
         response.raise_for_status()
 
         result = response.json()
         return result['result']['alternatives'][0]['message']['text']
 
-    def _call_gigachat(self, provider_config: dict, prompt: str) -> Optional[str]:
+    def _call_gigachat(self, provider_config: dict, prompt: str, timeout=None,
+                       max_tokens: Optional[int] = None) -> Optional[str]:
         """Вызывает GigaChat API"""
         url = provider_config['config']['base_url']
 
         # Для GigaChat нужно получить access token
-        access_token = self._get_gigachat_token(provider_config['api_key'])
+        access_token = self._get_gigachat_token(provider_config['api_key'], timeout)
         if not access_token:
             return None
 
@@ -144,17 +192,17 @@ class RussianAIGenerator:
                     "content": prompt
                 }
             ],
-            "max_tokens": provider_config['config']['max_tokens'],
+            "max_tokens": max_tokens or provider_config['config']['max_tokens'],
             "temperature": provider_config['config']['temperature']
         }
 
-        response = requests.post(url, headers=headers, json=data, timeout=30)
+        response = transport.post(url, headers=headers, json=data, timeout=timeout)
         response.raise_for_status()
 
         result = response.json()
         return result['choices'][0]['message']['content']
 
-    def _get_gigachat_token(self, api_key: str) -> Optional[str]:
+    def _get_gigachat_token(self, api_key: str, timeout=None) -> Optional[str]:
         """Получает access token для GigaChat"""
         try:
             url = "https://ngw.devices.sberbank.ru:9443/api/v2/oauth"
@@ -169,7 +217,7 @@ class RussianAIGenerator:
                 "scope": "GIGACHAT_API_PERS"
             }
 
-            response = requests.post(url, headers=headers, data=data, timeout=30)
+            response = transport.post(url, headers=headers, data=data, timeout=timeout)
             response.raise_for_status()
 
             result = response.json()
@@ -187,23 +235,125 @@ class RussianAIGenerator:
         prompt = self._build_prompt(review_text, product_name, rating, user_name, pros, cons)
 
         # Пробуем текущий провайдер
-        if self.current_provider != AIProvider.FALLBACK:
-            print(f"🤖 Генерация через {self.providers[self.current_provider]['config']['name']}...")
-            response = self._make_request(self.current_provider, prompt)
+        provider = self.current_provider
+        if provider != AIProvider.FALLBACK:
+            print(f"🤖 Генерация через {self.providers[provider]['config']['name']}...")
+            response = self._make_request(provider, prompt)
 
             if response:
                 final_response = replace_name_placeholder(response, user_name)
                 print(f"✅ Ответ сгенерирован: {final_response[:80]}...")
                 return final_response
+            elif self.deadline.expired:
+                # Провайдер не виноват - не переключаемся, отзыв обработаем в следующий раз
+                print("⏰ Время запуска истекло, ответ не сгенерирован")
+                return ""
             else:
                 print("🔄 Провайдер не ответил, пробуем следующий...")
-                self._try_next_provider()
+                self._switch_provider_from(provider)
 
         # Используем fallback
         return get_fallback_response(rating, user_name)
 
+    def generate_replies(self, reviews: List[dict]) -> List[str]:
+        """Генерирует ответы пачками: несколько отзывов в одном запросе к LLM
+
+        Общая инструкция отправляется один раз на пачку, ответы возвращаются
+        JSON массивом. Отзывы, ответ на которые не удалось разобрать,
+        генерируются отдельными запросами. Если провайдер не ответил на пачку
+        (ошибка сети, таймаут), пачка целиком уходит следующему провайдеру.
+        """
+        replies = []
+        for start in range(0, len(reviews), self.batch_size):
+            replies += self._generate_batch(reviews[start:start + self.batch_size])
+        return replies
+
+    def _generate_batch(self, batch: List[dict]) -> List[str]:
+        if len(batch) == 1:
+            return [self.generate_reply(**batch[0])]
+
+        parsed = {}
+        # Провайдеры переключаются только вперед, до шаблонов - цикл конечен
+        for _ in range(len(self.providers)):
+            provider = self.current_provider
+            if provider == AIProvider.FALLBACK:
+                break
+
+            config = self.providers[provider]['config']
+            print(f"🤖 Генерация {len(batch)} ответов одним запросом через {config['name']}...")
+            response = self._make_request(provider, self._build_batch_prompt(batch),
+                                          max_tokens=config['max_tokens'] * len(batch))
+            if response:
+                parsed = self._parse_batch_response(response, len(batch))
+                missing = len(batch) - len(parsed)
+                if missing:
+                    print(f"🔄 Не удалось разобрать {missing} из {len(batch)} ответов, генерируем их по одному")
+                break
+            if self.deadline.expired:
+                print("⏰ Время запуска истекло, ответы не сгенерированы")
+                return [""] * len(batch)
+
+            # Не ответивший на пачку провайдер не ответит и на отдельные отзывы
+            print("🔄 Провайдер не ответил на пачку, пробуем следующий...")
+            self._switch_provider_from(provider)
+
+        replies = []
+        for index, review in enumerate(batch, 1):
+            reply = parsed.get(index)
+            if reply:
+                replies.append(replace_name_placeholder(reply, review.get('user_name', '')))
+            else:
+                replies.append(self.generate_reply(**review))
+        return replies
+
+    @staticmethod
+    def _parse_batch_response(response: str, count: int) -> Dict[int, str]:
+        """Разбирает JSON массив [{"id": 1, "reply": "..."}] из ответа модели"""
+        # Модель может обернуть JSON в ```json ... ``` или добавить пояснения вокруг,
+        # в том числе со скобками ("Ответы [1]:", "[]") - ищем первый массив с ответами
+        decoder = json.JSONDecoder()
+        start = response.find('[')
+        while start != -1:
+            try:
+                items, _ = decoder.raw_decode(response, start)
+            except ValueError:
+                items = None
+            replies = RussianAIGenerator._batch_replies(items, count)
+            if replies:
+                return replies
+            start = response.find('[', start + 1)
+        return {}
+
+    @staticmethod
+    def _batch_replies(items, count: int) -> Dict[int, str]:
+        """Ответы с корректными id из разобранного массива"""
+        replies = {}
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            try:
+                index = int(item.get('id'))
+            except (TypeError, ValueError):
+                continue
+            reply = item.get('reply')
+            if 1 <= index <= count and isinstance(reply, str) and reply.strip():
+                replies[index] = reply.strip()
+        return replies
+
+    @property
+    def max_concurrency(self) -> Optional[int]:
+        """Сколько одновременных запросов допускает текущий провайдер"""
+        return self.providers[self.current_provider]['config'].get('max_concurrency')
+
+    def _switch_provider_from(self, failed_provider: AIProvider):
+        """Переключает провайдер, если его еще не сменил другой поток"""
+        with self._switch_lock:
+            if self.current_provider == failed_provider:
+                self._try_next_provider()
+
     def _try_next_provider(self):
         """Пробует следующий доступный провайдер"""
+        self.provider_checked_at = time.time()
         current_index = list(self.providers.keys()).index(self.current_provider)
         next_providers = list(self.providers.keys())[current_index + 1:]
 
@@ -249,3 +399,39 @@ class RussianAIGenerator:
 
         Ответ:
         """
+
+    def _build_batch_prompt(self, batch: List[dict]) -> str:
+        """Строит один промпт для нескольких отзывов"""
+
+        blocks = []
+        for index, review in enumerate(batch, 1):
+            lines = [f"Отзыв {index}:", f"Текст: \"{review['review_text']}\"",
+                     f"Рейтинг: {review.get('rating', 5)}/5"]
+            if review.get('product_name'):
+                lines.append(f"Товар: {review['product_name']}")
+            # Собранный текст отзыва обычно уже содержит плюсы и минусы - не дублируем
+            if review.get('pros') and review['pros'] not in review['review_text']:
+                lines.append(f"Плюсы: {review['pros']}")
+            if review.get('cons') and review['cons'] not in review['review_text']:
+                lines.append(f"Минусы: {review['cons']}")
+            user_name = review.get('user_name')
+            lines.append(f"Имя покупателя: {user_name}" if user_name else "Имя покупателя не указано")
+            blocks.append("\n".join(lines))
+
+        reviews_text = "\n\n".join(blocks)
+
+        return f"""
+        Ниже {len(batch)} отзывов покупателей.
+
+        {reviews_text}
+
+        На каждый отзыв составь вежливый ответ представителя службы поддержки (2-3 предложения):
+        - Поблагодари за отзыв
+        - Упоминай ключевую мысль отзыва
+        - Будь дружелюбным и профессиональным
+        - Не используй шаблонные фразы
+        - Используй обращение по имени если оно указано
+
+        Верни только JSON массив без пояснений, по одному объекту на отзыв:
+        [{{"id": 1, "reply": "текст ответа"}}, {{"id": 2, "reply": "текст ответа"}}]
+        """
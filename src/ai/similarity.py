@@ -0,0 +1,188 @@
+"""
+Локальный индекс похожих отзывов для повторного использования ответов
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy опционален
+    np = None
+
+from .reply_cache import normalize_text, rating_bucket
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS similar_replies (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    review_text TEXT NOT NULL,
+    reply TEXT NOT NULL,
+    grp TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+NGRAM_SIZE = 3
+# Символьные n-граммы хэшируются в вектор фиксированной длины - словарь не нужен
+DIMENSIONS = 2048
+
+def review_group(rating: int, product_name: str, has_name: bool) -> str:
+    """Ответ переносится только между отзывами одной группы"""
+    return "|".join([rating_bucket(rating), normalize_text(product_name), "name" if has_name else ""])
+
+class SimilarityIndex:
+    """TF-IDF по символьным n-граммам для коротких положительных отзывов
+
+    Короткие отзывы на 4-5 звезд ("Все супер, спасибо", "Отличный товар,
+    рекомендую") в основном пересказывают друг друга. Индекс хранит пары
+    (отзыв, ответ LLM) и для нового отзыва находит самый похожий прошлый
+    по косинусной близости. Если близость не ниже threshold и совпадают
+    группа оценки, товар и наличие имени, прошлый ответ используется
+    повторно. Запрос для целой страницы отзывов - одно умножение матриц.
+    Без numpy индекс выключен.
+    """
+
+    def __init__(self, path: str, threshold: float = 0.8, max_entries: int = 2000,
+                 max_text: int = 200, enabled: bool = True):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_text = max_text
+        self.enabled = enabled and np is not None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.queries = 0
+        self.matches = 0
+
+        if not self.enabled:
+            return
+
+        self._group_codes: Dict[str, int] = {}
+        self._groups = np.zeros(0, dtype=np.int32)
+        self._replies: List[str] = []
+        self._counts = np.zeros((0, DIMENSIONS), dtype=np.float32)
+        self._weighted = None
+        self._idf = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(SCHEMA)
+        self._load()
+
+    def _conn(self) -> sqlite3.Connection:
+        """Соединение в режиме autocommit, отдельное на каждый поток"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _load(self):
+        """Восстанавливает индекс из SQLite: последние max_entries пар"""
+        conn = self._conn()
+        conn.execute(
+            "DELETE FROM similar_replies WHERE id NOT IN "
+            "(SELECT id FROM similar_replies ORDER BY id DESC LIMIT ?)", (self.max_entries,)
+        )
+        rows = conn.execute(
+            "SELECT review_text, reply, grp FROM similar_replies ORDER BY id"
+        ).fetchall()
+        if rows:
+            self._counts = np.stack([self._vector(text) for text, _, _ in rows])
+            self._replies = [reply for _, reply, _ in rows]
+            self._groups = np.array([self._group_code(group) for _, _, group in rows], dtype=np.int32)
+
+    def _group_code(self, group: str) -> int:
+        return self._group_codes.setdefault(group, len(self._group_codes))
+
+    def eligible(self, review_text: str, rating: int) -> bool:
+        """Повторно используем ответы только на короткие положительные отзывы"""
+        return self.enabled and rating >= 4 and 0 < len(normalize_text(review_text)) <= self.max_text
+
+    @staticmethod
+    def _vector(text: str):
+        """Сублинейные частоты хэшированных символьных n-грамм"""
+        padded = f" {normalize_text(text)} "
+        indices = [zlib.crc32(padded[i:i + NGRAM_SIZE].encode('utf-8')) % DIMENSIONS
+                   for i in range(max(1, len(padded) - NGRAM_SIZE + 1))]
+        counts = np.bincount(indices, minlength=DIMENSIONS).astype(np.float32)
+        nonzero = counts > 0
+        counts[nonzero] = 1.0 + np.log(counts[nonzero])
+        return counts
+
+    def _reweight(self):
+        """Пересчитывает IDF и нормированную матрицу индекса после добавлений"""
+        df = np.count_nonzero(self._counts, axis=0)
+        self._idf = (np.log((1.0 + len(self._replies)) / (1.0 + df)) + 1.0).astype(np.float32)
+        self._weighted = self._normalize(self._counts * self._idf)
+
+    @staticmethod
+    def _normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def add(self, review_text: str, reply: str, group: str):
+        """Добавляет пару отзыв-ответ (ответ с плейсхолдером [имя])"""
+        if not self.enabled or not reply:
+            return
+
+        vector = self._vector(review_text)
+        with self._lock:
+            self._counts = np.vstack([self._counts, vector])[-self.max_entries:]
+            self._replies = (self._replies + [reply])[-self.max_entries:]
+            self._groups = np.append(self._groups, self._group_code(group))[-self.max_entries:]
+            self._weighted = None
+
+        self._conn().execute(
+            "INSERT INTO similar_replies (review_text, reply, grp, created_at) VALUES (?, ?, ?, ?)",
+            (review_text, reply, group, time.time())
+        )
+
+    def query(self, items: List[Tuple[str, str]]) -> List[Optional[Tuple[str, float]]]:
+        """Для каждого (текст, группа) - (ответ, близость) самого похожего отзыва или None"""
+        if not self.enabled or not items:
+            return [None] * len(items)
+
+        with self._lock:
+            if not self._replies:
+                self.queries += len(items)
+                return [None] * len(items)
+
+            if self._weighted is None:
+                self._reweight()
+            weighted, idf, replies, groups = self._weighted, self._idf, self._replies, self._groups
+            query_groups = np.array([self._group_codes.get(group, -1) for _, group in items], dtype=np.int32)
+
+        queries = self._normalize(np.stack([self._vector(text) for text, _ in items]) * idf)
+        scores = queries @ weighted.T
+
+        # Отзывы другой группы (оценка, товар, имя) не рассматриваем
+        scores[query_groups[:, None] != groups[None, :]] = -1.0
+
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(items)), best]
+
+        results = []
+        for index, score in zip(best, best_scores):
+            results.append((replies[index], float(score)) if score >= self.threshold else None)
+
+        with self._lock:
+            self.queries += len(items)
+            self.matches += sum(result is not None for result in results)
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._replies) if self.enabled else 0,
+                'queries': self.queries,
+                'matches': self.matches,
+                'match_rate': round(self.matches / self.queries, 3) if self.queries else 0.0
+            }
@@ -1,7 +1,13 @@
 """Шаблоны ответов"""
 
+import re
 from src.config.constants import DEFAULT_RESPONSES
 
+# Плейсхолдер имени в любом регистре: LLM часто пишет [Имя] или [ИМЯ]
+NAME_PLACEHOLDER_RE = re.compile(r"\[\s*имя\s*\]", re.IGNORECASE)
+# То, что осталось от плейсхолдеров после подстановки имени: [Имя покупателя], [name], голое "Имя"
+LEFTOVER_PLACEHOLDER_RE = re.compile(r"\[[^\[\]\n]{1,40}\]|\b(?:Имя|ИМЯ)\b")
+
 def get_fallback_response(rating: int, user_name: str = "") -> str:
     """Возвращает резервный ответ"""
     if rating >= 4:
@@ -14,8 +20,12 @@ def get_fallback_response(rating: int, user_name: str = "") -> str:
     return replace_name_placeholder(template, user_name)
 
 def replace_name_placeholder(text: str, user_name: str) -> str:
-    """Заменяет плейсхолдер [имя]"""
-    if user_name and user_name.strip():
-        clean_name = user_name.strip()
-        return text.replace("[имя]", clean_name)
-    return text.replace("[имя]", "")
+    """Заменяет плейсхолдер [имя] в любом регистре"""
+    clean_name = user_name.strip() if user_name else ""
+    return NAME_PLACEHOLDER_RE.sub(lambda match: clean_name, text)
+
+def has_leftover_placeholder(text: str) -> bool:
+    """Остался ли в ответе плейсхолдер, кроме [имя], который нельзя отправлять покупателю"""
+    if not text:
+        return False
+    return LEFTOVER_PLACEHOLDER_RE.search(NAME_PLACEHOLDER_RE.sub("", text)) is not None
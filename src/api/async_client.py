@@ -0,0 +1,253 @@
+"""
+Асинхронный клиент API Wildberries
+"""
+
+import asyncio
+from typing import List, Dict, Any, AsyncIterator, Callable, Optional
+
+import aiohttp
+
+from .shared_rate_limiter import create_rate_limiter
+from .models import WBReview
+from .decoder import WBResponseError, iter_reviews_async, loads
+from .wb_client import WBAPIClient, TEST_REVIEWS_DATA, TEST_UNANSWERED_COUNT
+from src.config.settings import settings
+from src.config.constants import *
+
+class AsyncWBAPIClient:
+    """Асинхронный клиент для работы с API Wildberries
+
+    Повторяет интерфейс WBAPIClient, но все методы - корутины. Позволяет
+    выполнять много запросов одновременно в одном event loop; темп запросов
+    держит EndpointRateLimiter.acquire_async без блокировки потока.
+
+    Использование:
+        async with AsyncWBAPIClient() as client:
+            reviews = await client.get_unanswered_reviews()
+    """
+
+    def __init__(self, test_mode: bool = False, session: Optional[aiohttp.ClientSession] = None):
+        self.test_mode = test_mode
+        self.base_url = settings.WB_BASE_URL
+        self.headers = {
+            "Authorization": settings.WB_API_KEY,
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip, deflate"
+        }
+        self.rate_limiter = create_rate_limiter(settings.WB_API_KEY)
+        self._session = session
+        self._owns_session = session is None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Лениво создает сессию с пулом соединений"""
+        if self._session is None or self._session.closed:
+            timeout = aiohttp.ClientTimeout(
+                sock_connect=settings.HTTP_CONNECT_TIMEOUT,
+                sock_read=settings.HTTP_READ_TIMEOUT
+            )
+            connector = aiohttp.TCPConnector(limit_per_host=settings.HTTP_POOL_SIZE)
+            self._session = aiohttp.ClientSession(timeout=timeout, connector=connector)
+            self._owns_session = True
+        return self._session
+
+    async def close(self):
+        """Закрывает сессию, если она была создана клиентом"""
+        if self._owns_session and self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    @staticmethod
+    def _prepare_params(params: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """aiohttp не принимает bool в query - переводим в 'true'/'false'"""
+        if not params:
+            return params
+        return {key: str(value).lower() if isinstance(value, bool) else value
+                for key, value in params.items()}
+
+    async def _make_request(self, method: str, endpoint: str, reader: Optional[Callable] = None,
+                            **kwargs) -> Dict[str, Any]:
+        """Выполняет запрос к API (повторы - как в WBAPIClient._send_request)
+
+        reader - корутина, которая разбирает успешный ответ; по умолчанию
+        тело декодируется как JSON.
+        """
+        if self.test_mode:
+            return {"error": False, "data": None}
+
+        reader = reader or self._read_json
+
+        url = f"{self.base_url}/{endpoint}"
+        if "params" in kwargs:
+            kwargs["params"] = self._prepare_params(kwargs["params"])
+
+        max_retries = settings.RATE_LIMIT_MAX_RETRIES
+        retry_safe = method.upper() == "GET"
+
+        for attempt in range(max_retries + 1):
+            await self.rate_limiter.acquire_async(endpoint)
+            last_attempt = attempt == max_retries
+
+            try:
+                session = await self._get_session()
+                async with session.request(method, url, headers=self.headers, **kwargs) as response:
+                    retry_delay = await self.rate_limiter.observe_async(endpoint, response.status,
+                                                                        response.headers, attempt)
+
+                    if response.status == HTTP_UNAUTHORIZED:
+                        print("❌ Ошибка 401: Неавторизован")
+                        return {"error": True, "errorText": "Unauthorized"}
+
+                    if response.status == HTTP_TOO_MANY_REQUESTS:
+                        if last_attempt:
+                            return {"error": True, "errorText": "Too Many Requests"}
+                        print(f"⚠️ Превышен лимит запросов, ждем {retry_delay:.1f} с...")
+                        continue
+
+                    if response.status >= 500 and retry_safe and not last_attempt:
+                        await asyncio.sleep(self.rate_limiter.backoff_delay(attempt))
+                        continue
+
+                    response.raise_for_status()
+                    return await reader(response)
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                transient = not isinstance(e, aiohttp.ClientResponseError)
+                if retry_safe and transient and not last_attempt:
+                    await asyncio.sleep(self.rate_limiter.backoff_delay(attempt))
+                    continue
+                print(f"❌ Ошибка запроса: {e or 'таймаут'}")
+                return {"error": True, "errorText": str(e) or "Timeout"}
+            except Exception as e:
+                print(f"❌ Неожиданная ошибка: {e}")
+                return {"error": True, "errorText": str(e)}
+
+        return {"error": True, "errorText": "Retry budget exhausted"}
+
+    @staticmethod
+    async def _read_json(response: aiohttp.ClientResponse) -> Dict[str, Any]:
+        body = await response.read()
+        if response.status == 204 or not body:
+            return {"error": False, "data": None}
+        return loads(body)
+
+    @staticmethod
+    async def _read_reviews(response: aiohttp.ClientResponse) -> Dict[str, Any]:
+        """Потоково разбирает страницу отзывов сразу в WBReview"""
+        try:
+            reviews = [review async for review in iter_reviews_async(response.content)]
+        except WBResponseError as e:
+            return {"error": True, "errorText": str(e)}
+        return {"error": False, "reviews": reviews}
+
+    async def has_unseen_feedbacks(self) -> bool:
+        """Проверяет наличие непросмотренных отзывов"""
+        if self.test_mode:
+            print("🔧 ТЕСТОВЫЙ РЕЖИМ: Есть непросмотренные отзывы")
+            return True
+
+        result = await self._make_request("GET", "new-feedbacks-questions")
+
+        if result.get("error"):
+            print("⚠️ Не удалось проверить непросмотренные отзывы, считаем что они есть")
+            return True
+
+        data = result.get("data") or {}
+        return data.get("hasNewFeedbacks", False)
+
+    async def get_unanswered_reviews(self) -> List[WBReview]:
+        """Получает полный список неотвеченных отзывов"""
+        reviews = []
+        async for page in self.iter_unanswered_pages():
+            reviews.extend(page)
+        return reviews
+
+    async def iter_unanswered_pages(self, page_size: Optional[int] = None,
+                                    date_from: Optional[int] = None) -> AsyncIterator[List[WBReview]]:
+        """Постранично обходит бэклог неотвеченных отзывов (см. WBAPIClient.iter_unanswered_pages)"""
+        if self.test_mode:
+            yield [WBReview(item) for item in TEST_REVIEWS_DATA]
+            return
+
+        take = page_size or settings.FEEDBACKS_PAGE_SIZE
+        date_to = None
+        boundary_ids = set()
+
+        while True:
+            params = {
+                "isAnswered": False,
+                "take": take,
+                "skip": 0,
+                "order": "dateDesc"
+            }
+            if date_from is not None:
+                params["dateFrom"] = date_from
+            if date_to is not None:
+                params["dateTo"] = date_to
+
+            result = await self._make_request("GET", "feedbacks", reader=self._read_reviews,
+                                              params=params)
+            if result.get("error"):
+                print(f"❌ Ошибка при получении отзывов: {result.get('errorText')}")
+                return
+
+            page = result["reviews"]
+            fresh = [review for review in page if review.id not in boundary_ids]
+            if not fresh:
+                break
+
+            reviews = [review for review in fresh if review.has_text]
+            if reviews:
+                yield reviews
+
+            next_page = WBAPIClient._next_page_cursor(page, take, date_to, boundary_ids)
+            if next_page is None:
+                break
+            date_to, boundary_ids = next_page
+
+    async def post_reply_to_review(self, review_id: str, reply_text: str) -> bool:
+        """Отправляет ответ на отзыв"""
+        if self.test_mode:
+            print(f"🔧 ТЕСТОВЫЙ РЕЖИМ: Ответ для отзыва {review_id}")
+            print(f"📝 Текст ответа: {reply_text}")
+            print("✅ Ответ успешно 'отправлен' (тестовый режим)")
+            return True
+
+        payload = {
+            "id": review_id,
+            "text": reply_text[:5000]
+        }
+
+        result = await self._make_request("POST", "feedbacks/answer", json=payload)
+
+        if result.get("error"):
+            print(f"❌ Ошибка при отправке ответа на {review_id}: {result.get('errorText')}")
+            return False
+
+        print(f"✅ Ответ успешно отправлен на отзыв {review_id}")
+        return True
+
+    async def get_unanswered_count(self) -> dict:
+        """Получает количество неотвеченных отзывов"""
+        if self.test_mode:
+            return dict(TEST_UNANSWERED_COUNT)
+
+        result = await self._make_request("GET", "feedbacks/count-unanswered")
+
+        if result.get("error"):
+            print(f"❌ Ошибка при получении статистики: {result.get('errorText')}")
+            return {
+                "countUnanswered": 0,
+                "countUnansweredToday": 0,
+                "valuation": "0.0"
+            }
+
+        data = result.get("data") or {}
+        data.setdefault('valuation', '0.0')
+        data.setdefault('countUnanswered', 0)
+        data.setdefault('countUnansweredToday', 0)
+        return data
@@ -0,0 +1,98 @@
+"""
+Быстрое декодирование ответов API WB
+"""
+
+import json
+from typing import Any, AsyncIterator, BinaryIO, Iterator, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson опционален
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover - ijson опционален
+    ijson = None
+
+from .models import WBReview
+
+FEEDBACKS_PREFIX = "data.feedbacks.item"
+
+class WBResponseError(Exception):
+    """WB вернул ответ с error: true"""
+
+def _check_error(error: Any, error_text: Optional[str]):
+    if error:
+        raise WBResponseError(error_text or "error: true")
+
+class _FeedbacksCollector:
+    """Собирает отзывы и поля error/errorText из событий ijson.parse за один проход"""
+
+    def __init__(self):
+        self.builder = None
+        self.error = False
+        self.error_text = None
+
+    def feed(self, prefix: str, event: str, value: Any) -> Optional[WBReview]:
+        """Принимает событие, возвращает WBReview, когда отзыв собран целиком"""
+        if self.builder is None and prefix == FEEDBACKS_PREFIX and event == 'start_map':
+            self.builder = ijson.ObjectBuilder()
+
+        if self.builder is not None:
+            self.builder.event(event, value)
+            if prefix == FEEDBACKS_PREFIX and event == 'end_map':
+                item, self.builder = self.builder.value, None
+                return WBReview(item)
+        elif prefix == 'error':
+            self.error = value
+        elif prefix == 'errorText':
+            self.error_text = value
+        return None
+
+    def check(self):
+        _check_error(self.error, self.error_text)
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Декодирует JSON через orjson, если он установлен"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def iter_reviews(source: Union[bytes, BinaryIO]) -> Iterator[WBReview]:
+    """Превращает тело ответа feedbacks сразу в WBReview
+
+    Если установлен ijson и передан поток, отзывы разбираются по одному
+    по мере чтения, без построения полного дерева ответа в памяти.
+    Иначе тело читается целиком и декодируется через loads. Ответ с
+    error: true (WB возвращает его и с кодом 200) - WBResponseError.
+    """
+    if ijson is not None and not isinstance(source, (bytes, bytearray)):
+        collector = _FeedbacksCollector()
+        for prefix, event, value in ijson.parse(source, use_float=True):
+            review = collector.feed(prefix, event, value)
+            if review is not None:
+                yield review
+        collector.check()
+        return
+
+    body = source if isinstance(source, (bytes, bytearray)) else source.read()
+    result = loads(body) or {}
+    _check_error(result.get("error"), result.get("errorText"))
+    data = result.get("data") or {}
+    for item in data.get("feedbacks") or []:
+        yield WBReview(item)
+
+async def iter_reviews_async(stream: Any) -> AsyncIterator[WBReview]:
+    """Асинхронный вариант iter_reviews для aiohttp.StreamReader"""
+    if ijson is not None:
+        collector = _FeedbacksCollector()
+        async for prefix, event, value in ijson.parse(stream, use_float=True):
+            review = collector.feed(prefix, event, value)
+            if review is not None:
+                yield review
+        collector.check()
+        return
+
+    for review in iter_reviews(await stream.read()):
+        yield review
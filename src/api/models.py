@@ -1,47 +1,157 @@
-from typing import Dict, Any
+from array import array
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional
+
+def parse_wb_date(value: str) -> int:
+    """Переводит дату WB (ISO 8601) в unix timestamp, 0 если дата некорректна"""
+    if not value:
+        return 0
+    try:
+        return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp())
+    except (ValueError, TypeError):
+        return 0
+
+def _has_meaningful_text(value: str) -> bool:
+    """Текст длиннее 3 символов без учета пробелов"""
+    return len(value.strip()) > 3
 
 class WBReview:
-    """Модель отзыва Wildberries"""
+    """Модель отзыва Wildberries
+
+    Использует __slots__ и не хранит исходный словарь: из productDetails
+    берутся только название и артикул. Производные поля (has_text,
+    review_text, created_ts) вычисляются один раз при создании, поэтому
+    отзыв следует считать неизменяемым.
+    """
+
+    __slots__ = (
+        'id', 'text', 'pros', 'cons', 'user_name', 'created_date', 'answered',
+        'rating', 'was_viewed', 'product_name', 'nm_id',
+        'created_ts', 'has_text', 'is_short_numeric', 'review_text'
+    )
 
     def __init__(self, data: Dict[str, Any]):
-        self.id: str = data.get('id', '')
-        self.text: str = data.get('text', '')
-        self.product_details: Dict[str, Any] = data.get('productDetails', {})
-        self.created_date: str = data.get('createdDate', '')
+        product_details = data.get('productDetails') or {}
+
+        self.id: str = data.get('id') or ''
+        self.text: str = data.get('text') or ''
+        self.pros: str = data.get('pros') or ''
+        self.cons: str = data.get('cons') or ''
+        self.user_name: str = data.get('userName') or ''
+        self.created_date: str = data.get('createdDate') or ''
         self.answered: bool = data.get('answered', False)
         self.rating: int = data.get('productValuation', 5)
         self.was_viewed: bool = data.get('wasViewed', False)
-        self.pros: str = data.get('pros', '')
-        self.cons: str = data.get('cons', '')
-        self.user_name: str = data.get('userName', '')
-
-    @property
-    def product_name(self) -> str:
-        """Название товара"""
-        return self.product_details.get('productName', '')
-
-    @property
-    def has_text(self) -> bool:
-        """Проверяет, есть ли текст в отзыве (text, pros или cons)"""
-        # Проверяем все возможные поля с текстом
-        has_main_text = bool(self.text and len(self.text.strip()) > 3)
-        has_pros = bool(self.pros and len(self.pros.strip()) > 3)
-        has_cons = bool(self.cons and len(self.cons.strip()) > 3)
-
-        return has_main_text or has_pros or has_cons
-
-    @property
-    def review_text(self) -> str:
-        """Возвращает полный текст отзыва из всех доступных полей"""
+        self.product_name: str = product_details.get('productName') or ''
+        self.nm_id: int = product_details.get('nmId') or 0
+
+        # Производные поля
+        self.created_ts: int = parse_wb_date(self.created_date)
+        self.has_text: bool = (_has_meaningful_text(self.text)
+                               or _has_meaningful_text(self.pros)
+                               or _has_meaningful_text(self.cons))
+        self.is_short_numeric: bool = (len(self.text.strip()) < 5
+                                       and any(char.isdigit() for char in self.text))
+        self.review_text: str = self._build_review_text()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Исходные поля в формате API WB (для очередей и снимков)"""
+        return {
+            'id': self.id,
+            'text': self.text,
+            'pros': self.pros,
+            'cons': self.cons,
+            'userName': self.user_name,
+            'createdDate': self.created_date,
+            'answered': self.answered,
+            'productValuation': self.rating,
+            'wasViewed': self.was_viewed,
+            'productDetails': {'productName': self.product_name, 'nmId': self.nm_id}
+        }
+
+    def _build_review_text(self) -> str:
+        """Собирает полный текст отзыва из всех доступных полей"""
         parts = []
 
-        if self.text and self.text.strip():
+        if self.text.strip():
             parts.append(f"Отзыв: {self.text}")
 
-        if self.pros and self.pros.strip():
+        if self.pros.strip():
             parts.append(f"Преимущества: {self.pros}")
 
-        if self.cons and self.cons.strip():
+        if self.cons.strip():
             parts.append(f"Недостатки: {self.cons}")
 
         return "\n".join(parts) if parts else "Текст отзыва отсутствует"
+
+class ReviewBatch:
+    """Колоночное хранилище большого количества отзывов
+
+    ID лежат в списке, рейтинги, даты и флаги - в компактных массивах,
+    а полные тексты склеены в одну строку с массивом смещений. Это в разы
+    дешевле, чем держать в памяти объекты WBReview, и позволяет
+    фильтровать весь бэклог одним проходом по массивам.
+    """
+
+    FLAG_HAS_TEXT = 1
+    FLAG_SHORT_NUMERIC = 2
+
+    def __init__(self, reviews: Iterable[WBReview] = ()):
+        self.ids: List[str] = []
+        self.ratings = array('b')
+        self.created = array('q')
+        self.flags = array('B')
+        self.text_offsets = array('q', [0])
+        self._text_parts: List[str] = []
+        self._text: Optional[str] = ""
+
+        for review in reviews:
+            self.append(review)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(self, review: WBReview):
+        """Добавляет отзыв в конец пакета"""
+        flags = 0
+        if review.has_text:
+            flags |= self.FLAG_HAS_TEXT
+        if review.is_short_numeric:
+            flags |= self.FLAG_SHORT_NUMERIC
+
+        self.ids.append(review.id)
+        self.ratings.append(review.rating or 0)
+        self.created.append(review.created_ts)
+        self.flags.append(flags)
+
+        self._text_parts.append(review.review_text)
+        self.text_offsets.append(self.text_offsets[-1] + len(review.review_text))
+        self._text = None
+
+    def review_text(self, index: int) -> str:
+        """Полный текст отзыва по индексу"""
+        if self._text is None:
+            # Склеиваем накопленные части один раз, а не на каждое добавление
+            self._text_parts = ["".join(self._text_parts)]
+            self._text = self._text_parts[0]
+        return self._text[self.text_offsets[index]:self.text_offsets[index + 1]]
+
+    def select(self, exclude_ids: Optional[set] = None, min_rating: int = 0,
+               max_rating: int = 5) -> array:
+        """Индексы отзывов, которые нужно обрабатывать, за один проход
+
+        Правила те же, что в ReviewProcessor.should_process: есть текст,
+        отзыв не является коротким набором цифр и еще не обработан.
+        """
+        exclude_ids = exclude_ids or set()
+        selected = array('l')
+        ids, ratings, flags = self.ids, self.ratings, self.flags
+
+        for index in range(len(ids)):
+            flag = flags[index]
+            if (flag & self.FLAG_HAS_TEXT and not flag & self.FLAG_SHORT_NUMERIC
+                    and min_rating <= ratings[index] <= max_rating
+                    and ids[index] not in exclude_ids):
+                selected.append(index)
+
+        return selected
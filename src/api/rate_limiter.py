@@ -1,19 +1,186 @@
+import asyncio
+import random
+import threading
 import time
+from contextlib import contextmanager
+from typing import Dict, Mapping, Optional, Tuple
 
 class RateLimiter:
-    """Ограничитель частоты запросов"""
+    """Ограничитель частоты запросов (потокобезопасный)"""
 
     def __init__(self, delay: float = 0.34):
         self.last_request_time = 0
         self.delay = delay
+        self._lock = threading.Lock()
 
     def wait_if_needed(self):
         """Ждет если нужно соблюсти лимит"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
+        # Резервируем слот под блокировкой, а спим уже без нее,
+        # чтобы параллельные потоки выстраивались в очередь с шагом delay
+        with self._lock:
+            current_time = time.time()
+            scheduled_time = max(current_time, self.last_request_time + self.delay)
+            self.last_request_time = scheduled_time
 
-        if time_since_last < self.delay:
-            sleep_time = self.delay - time_since_last
+        sleep_time = scheduled_time - current_time
+        if sleep_time > 0:
             time.sleep(sleep_time)
 
-        self.last_request_time = time.time()
+class TokenBucket:
+    """Корзина токенов одного эндпоинта
+
+    Токены пополняются со скоростью rate в секунду до capacity, что
+    позволяет делать короткие всплески запросов при запасе. Баланс может
+    уходить в минус: каждый ожидающий запрос резервирует свой токен,
+    и время ожидания считается от долга.
+    """
+
+    def __init__(self, rate: float, capacity: float, min_rate: float, now: Optional[float] = None):
+        self.rate = rate
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, now: float) -> float:
+        """Резервирует токен, возвращает сколько нужно подождать"""
+        self._refill(now)
+        self.tokens -= 1
+        ready_at = self.updated + max(0.0, -self.tokens) / self.rate
+        return max(0.0, ready_at - now)
+
+    def block(self, now: float, seconds: float):
+        """Запрещает запросы на seconds секунд (после 429 или исчерпания лимита)"""
+        until = now + seconds
+        if until > self.updated:
+            self.updated = until
+            self.tokens = min(self.tokens, 1.0)
+
+    def throttled(self):
+        """Сервер ответил 429 - уменьшаем скорость вдвое"""
+        self.rate = max(self.min_rate, self.rate / 2)
+
+    def succeeded(self, remaining: Optional[float], limit: Optional[float]):
+        """Успешный ответ - подстраиваемся под заголовки и плавно возвращаем скорость"""
+        if limit is not None and limit >= 1:
+            self.capacity = limit
+        if remaining is not None and remaining < self.tokens:
+            self.tokens = remaining
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+class EndpointRateLimiter:
+    """Адаптивный ограничитель запросов с отдельной корзиной на каждый эндпоинт
+
+    Скорость и размер всплеска подстраиваются по заголовкам ответов WB
+    (X-Ratelimit-Remaining, X-Ratelimit-Limit, X-Ratelimit-Reset,
+    X-Ratelimit-Retry, Retry-After). На 429 скорость эндпоинта снижается
+    вдвое и все его запросы ждут указанное сервером время, на успешных
+    ответах скорость постепенно возвращается к базовой.
+    """
+
+    def __init__(self, rate: float = 3.0, burst: float = 3.0,
+                 endpoint_limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 backoff_base: float = 1.0, backoff_cap: float = 30.0):
+        self.rate = rate
+        self.burst = burst
+        self.endpoint_limits = endpoint_limits or {}
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _clock(self) -> float:
+        return time.monotonic()
+
+    def _new_bucket(self, endpoint: str) -> TokenBucket:
+        rate, burst = self.endpoint_limits.get(endpoint, (self.rate, self.burst))
+        return TokenBucket(rate, burst, min_rate=rate / 8, now=self._clock())
+
+    @contextmanager
+    def _locked_bucket(self, endpoint: str):
+        """Дает эксклюзивный доступ к корзине эндпоинта"""
+        with self._lock:
+            bucket = self._buckets.get(endpoint)
+            if bucket is None:
+                bucket = self._buckets[endpoint] = self._new_bucket(endpoint)
+            yield bucket
+
+    def reserve(self, endpoint: str) -> float:
+        """Резервирует запрос, возвращает время ожидания в секундах"""
+        with self._locked_bucket(endpoint) as bucket:
+            return bucket.reserve(self._clock())
+
+    def acquire(self, endpoint: str):
+        """Блокирующее ожидание разрешения на запрос"""
+        delay = self.reserve(endpoint)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, endpoint: str):
+        """Ожидание разрешения на запрос без блокировки event loop"""
+        delay = self.reserve(endpoint)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def observe(self, endpoint: str, status_code: int, headers: Mapping[str, str],
+                attempt: int = 0) -> float:
+        """Учитывает ответ сервера
+
+        Возвращает паузу перед повтором, если запрос был отклонен по лимиту (429),
+        и 0 в остальных случаях.
+        """
+        remaining = _header_float(headers, 'X-Ratelimit-Remaining')
+        limit = _header_float(headers, 'X-Ratelimit-Limit')
+        reset = _header_float(headers, 'X-Ratelimit-Reset')
+        retry = _header_float(headers, 'X-Ratelimit-Retry', 'Retry-After')
+
+        with self._locked_bucket(endpoint) as bucket:
+            now = self._clock()
+
+            if status_code == 429:
+                bucket.throttled()
+                delay = retry if retry is not None else self.backoff_delay(attempt)
+                # Небольшой разброс, чтобы ожидающие не проснулись одновременно
+                delay += random.uniform(0, 1 / bucket.rate)
+                bucket.block(now, delay)
+                return delay
+
+            bucket.succeeded(remaining, limit)
+            if remaining is not None and remaining <= 0 and reset:
+                bucket.block(now, reset)
+            return 0.0
+
+    async def observe_async(self, endpoint: str, status_code: int, headers: Mapping[str, str],
+                            attempt: int = 0) -> float:
+        """observe для асинхронного клиента"""
+        return self.observe(endpoint, status_code, headers, attempt)
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Экспоненциальная пауза с разбросом (equal jitter)"""
+        delay = min(self.backoff_cap, self.backoff_base * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def stats(self) -> Dict[str, dict]:
+        """Текущие параметры корзин по эндпоинтам"""
+        with self._lock:
+            return {endpoint: {'rate': round(bucket.rate, 3), 'capacity': bucket.capacity,
+                               'tokens': round(bucket.tokens, 2)}
+                    for endpoint, bucket in self._buckets.items()}
+
+def _header_float(headers: Mapping[str, str], *names: str) -> Optional[float]:
+    """Читает числовой заголовок, None если его нет или он некорректен"""
+    for name in names:
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            continue
+    return None
@@ -0,0 +1,122 @@
+"""
+Общий для всех процессов хоста бюджет запросов к API WB
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Mapping
+
+from .rate_limiter import EndpointRateLimiter, TokenBucket
+from src.config.settings import settings
+
+class SQLiteRateLimiter(EndpointRateLimiter):
+    """EndpointRateLimiter, у которого состояние корзин хранится в SQLite
+
+    Каждое резервирование выполняется в транзакции BEGIN IMMEDIATE, поэтому
+    все процессы на хосте (демон, main.py, daily_report.py, status.py)
+    делят один бюджет. Корзины разделены по scope - обычно это хэш
+    токена продавца, так что разные продавцы друг другу не мешают.
+    Асинхронный клиент ждет блокировку БД в потоке из пула, а не в event loop.
+    """
+
+    def __init__(self, path: str, scope: str = "default", **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.scope = scope
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rate_buckets (
+                    scope TEXT NOT NULL,
+                    endpoint TEXT NOT NULL,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    rate REAL NOT NULL,
+                    max_rate REAL NOT NULL,
+                    capacity REAL NOT NULL,
+                    PRIMARY KEY (scope, endpoint)
+                )
+            """)
+
+    def _clock(self) -> float:
+        # Монотонные часы не совпадают между процессами
+        return time.time()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Отдельное соединение на поток"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _locked_bucket(self, endpoint: str):
+        """Читает корзину под блокировкой БД и сохраняет изменения"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated, rate, max_rate, capacity FROM rate_buckets "
+                "WHERE scope = ? AND endpoint = ?",
+                (self.scope, endpoint)
+            ).fetchone()
+
+            bucket = self._new_bucket(endpoint)
+            if row is not None:
+                bucket.tokens, bucket.updated, bucket.rate, bucket.max_rate, bucket.capacity = row
+
+            yield bucket
+
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.scope, endpoint, bucket.tokens, bucket.updated,
+                 bucket.rate, bucket.max_rate, bucket.capacity)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def acquire_async(self, endpoint: str):
+        # BEGIN IMMEDIATE может ждать другой процесс до 30 с - не держим на этом event loop
+        delay = await asyncio.to_thread(self.reserve, endpoint)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def observe_async(self, endpoint: str, status_code: int, headers: Mapping[str, str],
+                            attempt: int = 0) -> float:
+        return await asyncio.to_thread(self.observe, endpoint, status_code, headers, attempt)
+
+    def stats(self) -> Dict[str, dict]:
+        """Текущие параметры корзин по эндпоинтам"""
+        rows = self._connection().execute(
+            "SELECT endpoint, rate, capacity, tokens FROM rate_buckets WHERE scope = ?",
+            (self.scope,)
+        ).fetchall()
+        return {endpoint: {'rate': round(rate, 3), 'capacity': capacity, 'tokens': round(tokens, 2)}
+                for endpoint, rate, capacity, tokens in rows}
+
+def create_rate_limiter(api_key: str = "") -> EndpointRateLimiter:
+    """Создает ограничитель запросов согласно RATE_LIMIT_BACKEND"""
+    options = {
+        'rate': 1 / settings.REQUEST_DELAY,
+        'burst': settings.RATE_LIMIT_BURST
+    }
+
+    if settings.RATE_LIMIT_BACKEND == "sqlite":
+        scope = hashlib.sha256((api_key or settings.WB_API_KEY).encode()).hexdigest()[:16]
+        return SQLiteRateLimiter(settings.RATE_LIMIT_DB, scope=scope, **options)
+
+    return EndpointRateLimiter(**options)
@@ -0,0 +1,76 @@
+"""
+Курсор инкрементальной синхронизации отзывов
+"""
+
+import json
+import os
+import time
+from typing import Optional
+
+class SyncCursor:
+    """Сохраняемая на диск граница (high-water mark) уже просмотренных отзывов
+
+    date_from - unix timestamp, начиная с которого нужно запрашивать отзывы
+    в следующий раз (включительно). checked_at - время последней полной
+    выборки, после которой курсор был сдвинут.
+    """
+
+    def __init__(self, path: str, recheck_minutes: int = 180):
+        self.path = path
+        self.recheck_seconds = recheck_minutes * 60
+        self.date_from: Optional[int] = None
+        self.checked_at: float = 0.0
+        self.load()
+
+    def load(self):
+        """Загружает курсор с диска"""
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.date_from = data.get('date_from')
+            self.checked_at = float(data.get('checked_at', 0))
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Не удалось прочитать курсор синхронизации: {e}")
+            self.date_from = None
+            self.checked_at = 0.0
+
+    def save(self):
+        """Атомарно сохраняет курсор на диск"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, self.path)
+
+    def to_dict(self) -> dict:
+        return {'date_from': self.date_from, 'checked_at': self.checked_at}
+
+    def restore(self, data: Optional[dict]):
+        """Берет курсор из снимка состояния, если он новее текущего"""
+        if not data or data.get('date_from') is None:
+            return
+        if self.date_from is None or data['date_from'] > self.date_from:
+            self.date_from = data['date_from']
+            self.checked_at = float(data.get('checked_at', 0))
+
+    @property
+    def is_fresh(self) -> bool:
+        """Можно ли доверять курсору и пропустить полную выборку"""
+        return self.date_from is not None and time.time() - self.checked_at < self.recheck_seconds
+
+    def advance(self, date_from: Optional[int]):
+        """Сдвигает курсор после успешной выборки"""
+        if date_from is not None and (self.date_from is None or date_from > self.date_from):
+            self.date_from = date_from
+        self.checked_at = time.time()
+
+    def rewind(self, date_from: int):
+        """Возвращает курсор назад, чтобы следующая выборка снова захватила более старый отзыв"""
+        if self.date_from is not None and date_from < self.date_from:
+            self.date_from = date_from
@@ -1,58 +1,154 @@
 import requests
 import time
-from typing import List, Dict, Any
-from .rate_limiter import RateLimiter
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from .shared_rate_limiter import create_rate_limiter
 from .models import WBReview
+from .decoder import WBResponseError, iter_reviews, loads
 from src.config.settings import settings
+from src.utils.deadline import Deadline
+from src.utils.http import HTTPTransport, transport as shared_transport
 from src.config.constants import *
 
+# Тестовые отзывы для TEST_MODE
+TEST_REVIEWS_DATA = [
+    {
+        "id": "test_review_1",
+        "text": "Отличный товар! Качество на высоте, доставка быстрая.",
+        "productDetails": {"productName": "Тестовый товар 1"},
+        "createdDate": "2024-01-01",
+        "answered": False,
+        "productValuation": 5,
+        "wasViewed": False,
+        "pros": "Качество, доставка",
+        "cons": "",
+        "userName": "Анна"
+    },
+    {
+        "id": "test_review_2",
+        "text": "",
+        "productDetails": {"productName": "Тестовый товар 2"},
+        "createdDate": "2024-01-01",
+        "answered": False,
+        "productValuation": 5,
+        "wasViewed": True,
+        "pros": "Красивый сарафан, отличное качество",
+        "cons": "",
+        "userName": "Анастасия"
+    }
+]
+
+TEST_UNANSWERED_COUNT = {
+    "countUnanswered": 1,
+    "countUnansweredToday": 1,
+    "valuation": "4.5",  # Добавить тестовое значение
+    "feedbacksCount": 1,
+    "questionsCount": 0
+}
+
 class WBAPIClient:
     """Клиент для работы с API Wildberries"""
 
-    def __init__(self, test_mode: bool = False):
+    def __init__(self, test_mode: bool = False, transport: Optional[HTTPTransport] = None,
+                 deadline: Optional[Deadline] = None, api_key: Optional[str] = None):
         self.test_mode = test_mode
+        self.transport = transport or shared_transport
+        self.deadline = deadline or Deadline()
         self.base_url = settings.WB_BASE_URL
+        api_key = api_key or settings.WB_API_KEY
         self.headers = {
-            "Authorization": settings.WB_API_KEY,
+            "Authorization": api_key,
             "Content-Type": "application/json"
         }
-        self.rate_limiter = RateLimiter(delay=settings.REQUEST_DELAY)
+        # Лимиты WB считаются на ключ - у каждого продавца свой limiter
+        self.rate_limiter = create_rate_limiter(api_key)
 
     def _make_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
-        """Выполняет запрос к API"""
+        """Выполняет запрос к API и декодирует JSON ответа"""
         if self.test_mode:
             return {"error": False, "data": None}
 
-        self.rate_limiter.wait_if_needed()
-
-        url = f"{self.base_url}/{endpoint}"
+        response, error_text = self._send_request(method, endpoint, **kwargs)
+        if response is None:
+            return {"error": True, "errorText": error_text}
 
         try:
-            response = requests.request(method, url, headers=self.headers, **kwargs)
-
-            if response.status_code == HTTP_UNAUTHORIZED:
-                print("❌ Ошибка 401: Неавторизован")
-                return {"error": True, "errorText": "Unauthorized"}
-
-            if response.status_code == HTTP_TOO_MANY_REQUESTS:
-                print("⚠️ Превышен лимит запросов, ждем...")
-                time.sleep(1)
-                return self._make_request(method, endpoint, **kwargs)
-
-            response.raise_for_status()
-
-            if response.status_code == 204:
+            if response.status_code == 204 or not response.content:
                 return {"error": False, "data": None}
-
-            return response.json()
-
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Ошибка запроса: {e}")
-            return {"error": True, "errorText": str(e)}
+            return loads(response.content)
         except Exception as e:
             print(f"❌ Неожиданная ошибка: {e}")
             return {"error": True, "errorText": str(e)}
 
+    def _send_request(self, method: str, endpoint: str,
+                      **kwargs) -> Tuple[Optional[requests.Response], Optional[str]]:
+        """Отправляет запрос с учетом лимитов, возвращает (ответ, текст ошибки)
+
+        Ответы 429 повторяются с паузой из заголовков WB (или экспоненциальной
+        с разбросом), не более RATE_LIMIT_MAX_RETRIES раз. Ошибки сети и 5xx
+        повторяются только для GET, чтобы не отправить ответ на отзыв дважды.
+        Таймауты урезаются до оставшегося времени запуска, а повтор, пауза
+        перед которым не укладывается в дедлайн, не выполняется.
+        """
+        url = f"{self.base_url}/{endpoint}"
+        max_retries = settings.RATE_LIMIT_MAX_RETRIES
+        retry_safe = method.upper() == "GET"
+
+        for attempt in range(max_retries + 1):
+            self.rate_limiter.acquire(endpoint)
+            last_attempt = attempt == max_retries
+
+            timeout = self.deadline.timeout(self.transport.connect_timeout, self.transport.read_timeout)
+            if timeout is None:
+                print(f"⏰ Время запуска истекло, запрос {endpoint} не отправлен")
+                return None, "Run deadline exceeded"
+
+            try:
+                response = self.transport.request(method, url, headers=self.headers,
+                                                  timeout=timeout, **kwargs)
+                retry_delay = self.rate_limiter.observe(endpoint, response.status_code,
+                                                        response.headers, attempt)
+
+                if response.status_code == HTTP_UNAUTHORIZED:
+                    response.close()
+                    print("❌ Ошибка 401: Неавторизован")
+                    return None, "Unauthorized"
+
+                if response.status_code == HTTP_TOO_MANY_REQUESTS:
+                    response.close()
+                    if last_attempt or not self.deadline.allows(retry_delay):
+                        return None, "Too Many Requests"
+                    print(f"⚠️ Превышен лимит запросов, ждем {retry_delay:.1f} с...")
+                    continue
+
+                if response.status_code >= 500 and retry_safe and not last_attempt:
+                    delay = self.rate_limiter.backoff_delay(attempt)
+                    if self.deadline.allows(delay):
+                        response.close()
+                        print(f"⚠️ Ошибка сервера {response.status_code}, повтор через {delay:.1f} с...")
+                        time.sleep(delay)
+                        continue
+
+                if response.status_code >= 400:
+                    # Поток ответа не дочитан - закрываем, чтобы соединение вернулось в пул
+                    response.close()
+                response.raise_for_status()
+                return response, None
+
+            except requests.exceptions.RequestException as e:
+                delay = self.rate_limiter.backoff_delay(attempt)
+                if (retry_safe and not last_attempt and self.deadline.allows(delay)
+                        and not isinstance(e, requests.exceptions.HTTPError)):
+                    print(f"⚠️ Ошибка запроса: {e}, повтор через {delay:.1f} с...")
+                    time.sleep(delay)
+                    continue
+                print(f"❌ Ошибка запроса: {e}")
+                return None, str(e)
+            except Exception as e:
+                print(f"❌ Неожиданная ошибка: {e}")
+                return None, str(e)
+
+        return None, "Retry budget exhausted"
+
     def has_unseen_feedbacks(self) -> bool:
         """Проверяет наличие непросмотренных отзывов"""
         if self.test_mode:
@@ -63,69 +159,177 @@ class WBAPIClient:
         result = self._make_request("GET", "new-feedbacks-questions")
 
         if result.get("error"):
-            return False
+            # Не знаем наверняка - безопаснее считать, что отзывы есть
+            print("⚠️ Не удалось проверить непросмотренные отзывы, считаем что они есть")
+            return True
 
-        data = result.get("data", {})
+        data = result.get("data") or {}
         has_new_feedbacks = data.get("hasNewFeedbacks", False)
 
         print(f"📊 Непросмотренные отзывы: {'ЕСТЬ' if has_new_feedbacks else 'нет'}")
         return has_new_feedbacks
 
     def get_unanswered_reviews(self) -> List[WBReview]:
-        """Получает список неотвеченных отзывов"""
+        """Получает полный список неотвеченных отзывов"""
+        return list(self.iter_unanswered_reviews())
+
+    def iter_unanswered_reviews(self, page_size: Optional[int] = None,
+                                date_from: Optional[int] = None) -> Iterator[WBReview]:
+        """Итерирует неотвеченные отзывы по одному, подгружая страницы по мере необходимости"""
+        for page in self.iter_unanswered_pages(page_size, date_from):
+            yield from page
+
+    def iter_unanswered_pages(self, page_size: Optional[int] = None,
+                              date_from: Optional[int] = None) -> Iterator[List[WBReview]]:
+        """Постранично обходит весь бэклог неотвеченных отзывов
+
+        Страницы запрашиваются лениво: следующая загружается только когда
+        вызывающий код закончил с предыдущей. Пагинация идет по dateTo
+        (от новых к старым), а не по skip, поэтому отзывы, на которые мы
+        успели ответить между страницами, не сдвигают окно выборки.
+        Если передан date_from, запрашиваются только отзывы не старше него.
+        """
         if self.test_mode:
-            return self._get_test_reviews()
+            yield self._get_test_reviews()
+            return
+
+        take = page_size or settings.FEEDBACKS_PAGE_SIZE
+        date_to = None
+        boundary_ids = set()
+        page_number = 0
+        total = 0
+
+        while True:
+            page_number += 1
+            print(f"🔍 Получение страницы {page_number} отзывов (take={take})...")
+
+            params = {
+                "isAnswered": False,
+                "take": take,
+                "skip": 0,
+                "order": "dateDesc"
+            }
+            if date_from is not None:
+                params["dateFrom"] = date_from
+            if date_to is not None:
+                params["dateTo"] = date_to
 
-        print("🔍 Получение списка отзывов...")
+            page = self._fetch_feedbacks(params)
+            if page is None:
+                return
 
-        params = {
-            "isAnswered": False,
-            "take": 50,
-            "skip": 0,
-            "order": "dateDesc"
-        }
+            # Отзывы на границе страницы могут прийти повторно
+            fresh = [review for review in page if review.id not in boundary_ids]
+            if not fresh:
+                break
 
-        result = self._make_request("GET", "feedbacks", params=params)
+            self._log_feedbacks(fresh)
 
-        if result.get("error"):
-            print(f"❌ Ошибка при получении отзывов: {result.get('errorText')}")
-            return []
+            reviews = [review for review in fresh if review.has_text]
+            total += len(reviews)
+            print(f"📥 Страница {page_number}: {len(reviews)} из {len(fresh)} отзывов с текстом/pros/cons")
 
-        data = result.get("data", {})
-        feedbacks_data = data.get("feedbacks", [])
+            if reviews:
+                yield reviews
 
-        print(f"📊 Получено сырых данных: {len(feedbacks_data)} отзывов")
+            next_page = self._next_page_cursor(page, take, date_to, boundary_ids)
+            if next_page is None:
+                break
+            date_to, boundary_ids = next_page
 
-        # Детальная информация о полученных данных
-        for i, feedback in enumerate(feedbacks_data):
-            has_text = bool(feedback.get('text', '').strip())
-            has_pros = bool(feedback.get('pros', '').strip())
-            has_cons = bool(feedback.get('cons', '').strip())
-            is_answered = feedback.get('answered', True)
+        print(f"📥 Всего получено: {total} неотвеченных отзывов с текстом/pros/cons")
 
-            print(f"   {i+1}. ID: {feedback.get('id', 'N/A')}")
+    def iter_raw_feedbacks(self, endpoint: str = "feedbacks", page_size: Optional[int] = None,
+                           **filters) -> Iterator[Dict[str, Any]]:
+        """Постранично (через skip) обходит отзывы как есть, без фильтрации
+
+        Подходит для закрытых диапазонов дат и архива, где выборка не меняется
+        во время обхода. Используется для выгрузки истории.
+        """
+        if self.test_mode:
+            return
+
+        take = page_size or settings.FEEDBACKS_PAGE_SIZE
+        skip = 0
+
+        while True:
+            params = dict(filters, take=take, skip=skip, order="dateAsc")
+            result = self._make_request("GET", endpoint, params=params)
+
+            if result.get("error"):
+                raise RuntimeError(f"{endpoint}: {result.get('errorText')}")
+
+            data = result.get("data") or {}
+            feedbacks_data = data.get("feedbacks") or []
+            yield from feedbacks_data
+
+            if len(feedbacks_data) < take:
+                break
+            skip += take
+
+    @staticmethod
+    def _next_page_cursor(page: List[WBReview], take: int,
+                          date_to: Optional[int], boundary_ids: set) -> Optional[tuple]:
+        """Вычисляет dateTo и граничные ID для следующей страницы, None если страниц больше нет"""
+        if len(page) < take:
+            return None
+
+        oldest = min(review.created_ts for review in page)
+        if not oldest:
+            print("⚠️ Не удалось определить дату последнего отзыва, пагинация остановлена")
+            return None
+
+        oldest_ids = {review.id for review in page if review.created_ts == oldest}
+        boundary_ids = boundary_ids | oldest_ids if oldest == date_to else oldest_ids
+        return oldest, boundary_ids
+
+    def _fetch_feedbacks(self, params: Dict[str, Any]) -> Optional[List[WBReview]]:
+        """Запрашивает одну страницу отзывов, None при ошибке
+
+        Тело ответа читается потоком и сразу превращается в WBReview,
+        без промежуточного дерева словарей (см. decoder.iter_reviews).
+        """
+        response, error_text = self._send_request("GET", "feedbacks", params=params, stream=True)
+        if response is None:
+            print(f"❌ Ошибка при получении отзывов: {error_text}")
+            return None
+
+        try:
+            response.raw.decode_content = True
+            page = list(iter_reviews(response.raw))
+        except WBResponseError as e:
+            print(f"❌ Ошибка при получении отзывов: {e}")
+            return None
+        except Exception as e:
+            print(f"❌ Ошибка разбора отзывов: {e}")
+            return None
+        finally:
+            response.close()
+
+        print(f"📊 Получено сырых данных: {len(page)} отзывов")
+        return page
+
+    def _log_feedbacks(self, reviews: List[WBReview]):
+        """Детальная информация о полученных данных"""
+        for i, review in enumerate(reviews):
+            has_text = bool((review.text or '').strip())
+            has_pros = bool((review.pros or '').strip())
+            has_cons = bool((review.cons or '').strip())
+
+            print(f"   {i+1}. ID: {review.id or 'N/A'}")
             print(f"      Текст: {'✅ Есть' if has_text else '❌ Нет'}")
             print(f"      Pros: {'✅ Есть' if has_pros else '❌ Нет'}")
             print(f"      Cons: {'✅ Есть' if has_cons else '❌ Нет'}")
-            print(f"      Отвечен: {'✅ Да' if is_answered else '❌ Нет'}")
-            print(f"      Рейтинг: {feedback.get('productValuation', 'N/A')}")
+            print(f"      Отвечен: {'✅ Да' if review.answered else '❌ Нет'}")
+            print(f"      Рейтинг: {review.rating}")
 
             # Показываем превью всех текстовых полей
             if has_text:
-                print(f"      Текст: {feedback.get('text', '')[:50]}...")
+                print(f"      Текст: {review.text[:50]}...")
             if has_pros:
-                print(f"      Pros: {feedback.get('pros', '')[:50]}...")
+                print(f"      Pros: {review.pros[:50]}...")
             if has_cons:
-                print(f"      Cons: {feedback.get('cons', '')[:50]}...")
-
-        # Фильтруем отзывы с любым текстом (text, pros или cons)
-        reviews = [WBReview(item) for item in feedbacks_data
-                if (item.get('text') and len(item.get('text', '').strip()) > 3)
-                or (item.get('pros') and len(item.get('pros', '').strip()) > 3)
-                or (item.get('cons') and len(item.get('cons', '').strip()) > 3)]
-
-        print(f"📥 После фильтрации: {len(reviews)} неотвеченных отзывов с текстом/pros/cons")
-        return reviews
+                print(f"      Cons: {review.cons[:50]}...")
 
     def post_reply_to_review(self, review_id: str, reply_text: str) -> bool:
         """Отправляет ответ на отзыв"""
@@ -151,16 +355,24 @@ class WBAPIClient:
         print(f"✅ Ответ успешно отправлен на отзыв {review_id}")
         return True
 
+    def is_review_answered(self, review_id: str) -> Optional[bool]:
+        """Проверяет, есть ли у отзыва ответ в WB (None если узнать не удалось)"""
+        if self.test_mode:
+            return False
+
+        result = self._make_request("GET", "feedback", params={"id": review_id})
+
+        if result.get("error"):
+            print(f"⚠️ Не удалось проверить отзыв {review_id}: {result.get('errorText')}")
+            return None
+
+        data = result.get("data") or {}
+        return bool(data.get("answer"))
+
     def get_unanswered_count(self) -> dict:
         """Получает количество неотвеченных отзывов"""
         if self.test_mode:
-            return {
-                "countUnanswered": 1,
-                "countUnansweredToday": 1,
-                "valuation": "4.5",  # Добавить тестовое значение
-                "feedbacksCount": 1,
-                "questionsCount": 0
-            }
+            return dict(TEST_UNANSWERED_COUNT)
 
         try:
             print("📊 Получение статистики...")
@@ -193,30 +405,4 @@ class WBAPIClient:
 
     def _get_test_reviews(self) -> List[WBReview]:
         """Возвращает тестовые отзывы"""
-        test_data = [
-            {
-                "id": "test_review_1",
-                "text": "Отличный товар! Качество на высоте, доставка быстрая.",
-                "productDetails": {"productName": "Тестовый товар 1"},
-                "createdDate": "2024-01-01",
-                "answered": False,
-                "productValuation": 5,
-                "wasViewed": False,
-                "pros": "Качество, доставка",
-                "cons": "",
-                "userName": "Анна"
-            },
-            {
-                "id": "test_review_2",
-                "text": "",
-                "productDetails": {"productName": "Тестовый товар 2"},
-                "createdDate": "2024-01-01",
-                "answered": False,
-                "productValuation": 5,
-                "wasViewed": True,
-                "pros": "Красивый сарафан, отличное качество",
-                "cons": "",
-                "userName": "Анастасия"
-            }
-        ]
-        return [WBReview(item) for item in test_data]
+        return [WBReview(item) for item in TEST_REVIEWS_DATA]
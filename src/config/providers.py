@@ -17,14 +17,16 @@ PROVIDER_CONFIGS = {
         "base_url": "https://llm.api.cloud.yandex.net/foundationModels/v1/completion",
         "model": "yandexgpt-lite",
         "max_tokens": 150,
-        "temperature": 0.7
+        "temperature": 0.7,
+        "max_concurrency": 4
     },
     AIProvider.GIGA_CHAT: {
         "name": "GigaChat",
         "base_url": "https://gigachat.devices.sberbank.ru/api/v1/chat/completions",
         "model": "GigaChat",
         "max_tokens": 150,
-        "temperature": 0.7
+        "temperature": 0.7,
+        "max_concurrency": 2
     },
     AIProvider.FALLBACK: {
         "name": "Локальные шаблоны",
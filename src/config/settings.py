@@ -9,12 +9,56 @@ class Settings:
     # API Keys - Wildberries
     WB_API_KEY: str = os.getenv('WB_API_KEY', '')
     SUPPLIER_ID: str = os.getenv('SUPPLIER_ID', '')
+    TENANTS_FILE: str = os.getenv('TENANTS_FILE', '')  # JSON реестр продавцов (вместо WB_API_KEY)
 
     # App Settings
-    CHECK_INTERVAL: int = int(os.getenv('CHECK_INTERVAL', '30'))
-    REQUEST_DELAY: float = 0.34
+    CHECK_INTERVAL: int = int(os.getenv('CHECK_INTERVAL', '30'))  # максимальный интервал опроса, минуты
+    POLL_MIN_INTERVAL: float = float(os.getenv('POLL_MIN_INTERVAL', '60'))  # секунды, сразу после новых отзывов
+    POLL_BACKOFF: float = float(os.getenv('POLL_BACKOFF', '2'))  # множитель интервала после пустой проверки
+    POLL_JITTER: float = float(os.getenv('POLL_JITTER', '0.1'))  # случайный разброс интервала, доля
+    HEALTH_CHECK_INTERVAL: float = float(os.getenv('HEALTH_CHECK_INTERVAL', '300'))  # секунды, режим демона
+    SHUTDOWN_TIMEOUT: float = float(os.getenv('SHUTDOWN_TIMEOUT', '60'))  # ожидание задач при остановке
+    STATE_DIR: str = os.getenv('STATE_DIR', 'data')
+    REQUEST_DELAY: float = 0.34  # базовый интервал между запросами к одному эндпоинту
+    RATE_LIMIT_BURST: int = int(os.getenv('RATE_LIMIT_BURST', '3'))
+    RATE_LIMIT_BACKEND: str = os.getenv('RATE_LIMIT_BACKEND', 'memory')  # memory, sqlite
+    RATE_LIMIT_DB: str = os.getenv('RATE_LIMIT_DB', os.path.join(STATE_DIR, 'rate_limit.db'))
+    RATE_LIMIT_MAX_RETRIES: int = int(os.getenv('RATE_LIMIT_MAX_RETRIES', '5'))
+    DATABASE_PATH: str = os.getenv('DATABASE_PATH', os.path.join(STATE_DIR, 'bot.db'))
+    STORAGE_ENABLED: bool = os.getenv('STORAGE_ENABLED', 'true').lower() == 'true'
+    GENERATION_WORKERS: int = int(os.getenv('GENERATION_WORKERS', '1'))  # >1 - параллельная генерация
+    GENERATION_BATCH_SIZE: int = int(os.getenv('GENERATION_BATCH_SIZE', '5'))  # отзывов в одном запросе к LLM
+    PIPELINE_QUEUE_SIZE: int = int(os.getenv('PIPELINE_QUEUE_SIZE', '100'))  # длина очереди между стадиями
+    SLA_TARGET_HOURS: float = float(os.getenv('SLA_TARGET_HOURS', '24'))  # целевой срок ответа на 4-5 звезд
+    OUTBOX_WORKERS: int = int(os.getenv('OUTBOX_WORKERS', '4'))
+    OUTBOX_MAX_ATTEMPTS: int = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+    WORK_QUEUE_URL: str = os.getenv('WORK_QUEUE_URL', f"sqlite:///{os.path.join(STATE_DIR, 'queue.db')}")  # или redis://host:6379/0
+    QUEUE_VISIBILITY_TIMEOUT: float = float(os.getenv('QUEUE_VISIBILITY_TIMEOUT', '120'))  # после него задачу заберет другой воркер
+    QUEUE_MAX_ATTEMPTS: int = int(os.getenv('QUEUE_MAX_ATTEMPTS', '5'))
+    LEASE_URL: str = os.getenv('LEASE_URL', f"sqlite:///{os.path.join(STATE_DIR, 'leases.db')}")  # или redis://host:6379/0
+    LEASE_TTL: float = float(os.getenv('LEASE_TTL', '600'))  # на сколько секунд экземпляр бота берет отзыв
+    DEDUP_WINDOW_HOURS: int = int(os.getenv('DEDUP_WINDOW_HOURS', '72'))
+    DEDUP_MAX_RECENT: int = int(os.getenv('DEDUP_MAX_RECENT', '50000'))
+    STATE_FILE: str = os.getenv('STATE_FILE', os.path.join(STATE_DIR, 'run_state.json.gz'))
+    STATE_MAX_IDS: int = int(os.getenv('STATE_MAX_IDS', '20000'))
+    PROVIDER_HEALTH_TTL: int = int(os.getenv('PROVIDER_HEALTH_TTL', '3600'))
+    REPLY_CACHE_ENABLED: bool = os.getenv('REPLY_CACHE_ENABLED', 'true').lower() == 'true'
+    REPLY_CACHE_SIZE: int = int(os.getenv('REPLY_CACHE_SIZE', '5000'))  # записей в памяти
+    REPLY_CACHE_TTL_HOURS: float = float(os.getenv('REPLY_CACHE_TTL_HOURS', '720'))
+    SIMILARITY_ENABLED: bool = os.getenv('SIMILARITY_ENABLED', 'true').lower() == 'true'
+    SIMILARITY_THRESHOLD: float = float(os.getenv('SIMILARITY_THRESHOLD', '0.8'))  # косинусная близость 0-1
+    SIMILARITY_MAX_ENTRIES: int = int(os.getenv('SIMILARITY_MAX_ENTRIES', '2000'))
+    RUN_TIME_BUDGET: float = float(os.getenv('RUN_TIME_BUDGET', '0'))  # секунд на запуск, 0 - без ограничения
+    RUN_TIME_RESERVE: float = float(os.getenv('RUN_TIME_RESERVE', '30'))  # запас на сохранение состояния
+    SYNC_RECHECK_MINUTES: int = int(os.getenv('SYNC_RECHECK_MINUTES', '180'))
+    FEEDBACKS_PAGE_SIZE: int = int(os.getenv('FEEDBACKS_PAGE_SIZE', '5000'))  # максимум take в API WB
     TEST_MODE: bool = os.getenv('TEST_MODE', 'false').lower() == 'true'
 
+    # HTTP
+    HTTP_CONNECT_TIMEOUT: float = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+    HTTP_READ_TIMEOUT: float = float(os.getenv('HTTP_READ_TIMEOUT', '30'))
+    HTTP_POOL_SIZE: int = int(os.getenv('HTTP_POOL_SIZE', '10'))
+
     # API URLs
     WB_BASE_URL: str = "https://feedbacks-api.wildberries.ru/api/v1"
 
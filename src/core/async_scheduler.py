@@ -0,0 +1,157 @@
+"""
+Асинхронный планировщик периодических задач
+"""
+
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
+
+# Максимальный шаг ожидания: сверяемся с часами, чтобы заметить сон машины
+MAX_SLEEP_STEP = 30.0
+
+class Job:
+    """Периодическая задача
+
+    every - интервал в секундах или функция, которая по результату
+    прошлого запуска возвращает паузу до следующего, считая от конца
+    запуска (например, адаптивный опрос). jitter - случайный разброс
+    интервала (доля).
+    """
+
+    def __init__(self, name: str, func: Callable[[], Any],
+                 every: Union[float, Callable[[Any], float]],
+                 jitter: float = 0.0, run_immediately: bool = True):
+        self.name = name
+        self.func = func
+        self.every = every
+        self.jitter = jitter
+        self.run_immediately = run_immediately
+        self.next_run: Optional[float] = None
+        self.runs = 0
+        self.failures = 0
+        self.missed = 0
+
+    def delay_after(self, result: Any) -> float:
+        """Пауза до следующего запуска"""
+        delay = self.every(result) if callable(self.every) else self.every
+        if self.jitter:
+            delay += random.uniform(-delay * self.jitter, delay * self.jitter)
+        return max(delay, 0.0)
+
+    def stats(self) -> dict:
+        return {'runs': self.runs, 'failures': self.failures, 'missed': self.missed}
+
+class AsyncScheduler:
+    """Запускает задачи независимо друг от друга в event loop
+
+    У каждой задачи свой цикл, поэтому медленная обработка отзывов не
+    задерживает отчет и проверки здоровья, а два запуска одной задачи
+    никогда не идут одновременно. Синхронная работа выполняется в потоках.
+    Сроки считаются по настенным часам: если запуск затянулся или машина
+    спала, пропущенные запуски сливаются в один, выполняемый сразу.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.jobs: List[Job] = []
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Future] = {}
+        self._stopped: Optional[asyncio.Event] = None
+
+    def add_job(self, name: str, func: Callable[[], Any],
+                every: Union[float, Callable[[Any], float]],
+                jitter: float = 0.0, run_immediately: bool = True) -> Job:
+        job = Job(name, func, every, jitter, run_immediately)
+        self.jobs.append(job)
+        return job
+
+    async def run(self, shutdown_timeout: float = 60.0):
+        """Работает до stop(), затем дожидается завершения запущенных задач"""
+        self._stopped = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self._tasks = [asyncio.create_task(self._job_loop(job), name=f"job-{job.name}")
+                       for job in self.jobs]
+
+        await self._stopped.wait()
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        # Потоки нельзя прервать - ждем, пока работа остановится по своему дедлайну
+        running = [future for future in self._running.values() if not future.done()]
+        if running:
+            print(f"⏳ Ожидаем завершения задач: {', '.join(self._running)}")
+            done, pending = await asyncio.wait(running, timeout=shutdown_timeout)
+            if pending:
+                print(f"⚠️ Не дождались завершения {len(pending)} задач")
+
+        self._executor.shutdown(wait=False)
+
+    def stop(self):
+        """Останавливает планировщик (можно вызывать из обработчика сигнала)"""
+        if self._stopped is not None:
+            self._stopped.set()
+
+    async def _job_loop(self, job: Job):
+        job.next_run = time.time() if job.run_immediately else time.time() + job.delay_after(None)
+
+        while True:
+            await self._sleep_until(job.next_run)
+            result = await self._run_job(job)
+            now = time.time()
+
+            if callable(job.every):
+                job.next_run = now + job.delay_after(result)
+                continue
+
+            # Фиксированный интервал отсчитывается от плана, а не от конца запуска;
+            # если запуск затянулся, пропущенные сроки сливаются в один запуск сразу
+            delay = job.delay_after(result)
+            job.next_run += delay
+            if job.next_run <= now:
+                job.missed += self._missed_runs(job.next_run, now, delay)
+                job.next_run = now
+
+    @staticmethod
+    def _missed_runs(next_run: float, now: float, interval: float) -> int:
+        """Сколько сроков с next_run по now пропущено
+
+        Первый просроченный срок (next_run) выполняется сразу и пропущенным
+        не считается, пропущены только следующие за ним сроки до now.
+        """
+        if interval <= 0 or next_run > now:
+            return 0
+        return int((now - next_run) // interval)
+
+    async def _run_job(self, job: Job) -> Any:
+        future = asyncio.get_running_loop().run_in_executor(self._executor, job.func)
+        self._running[job.name] = future
+        try:
+            # shield: отмена цикла задачи не должна терять уже запущенную работу
+            result = await asyncio.shield(future)
+            job.runs += 1
+            return result
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.failures += 1
+            print(f"💥 Ошибка в задаче {job.name}: {e}")
+            return None
+        finally:
+            if future.done():
+                self._running.pop(job.name, None)
+
+    @staticmethod
+    async def _sleep_until(timestamp: float):
+        while True:
+            remaining = timestamp - time.time()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, MAX_SLEEP_STEP))
+
+    def stats(self) -> Dict[str, dict]:
+        return {job.name: job.stats() for job in self.jobs}
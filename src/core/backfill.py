@@ -0,0 +1,152 @@
+"""
+Выгрузка истории отзывов за большой период
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+from src.api.wb_client import WBAPIClient
+from src.api.models import parse_wb_date
+
+class ArchiveBackfiller:
+    """Параллельная выгрузка отзывов и ответов по окнам дат с чекпоинтами
+
+    Диапазон делится на окна по window_days дней. Для каждого окна
+    выгружаются отвеченные и неотвеченные отзывы из feedbacks и отзывы
+    из feedbacks/archive, результат пишется в отдельный JSONL-файл.
+    Готовые окна отмечаются в checkpoint.json, поэтому прерванная выгрузка
+    при повторном запуске продолжается с незавершенных окон. Окна
+    отсчитываются от начала диапазона, поэтому ключ окна не зависит от
+    конца диапазона; последнее неполное окно в чекпоинт не попадает и
+    выгружается заново, пока не закончится.
+    Все потоки делят rate limiter клиента.
+    """
+
+    CHECKPOINT_FILE = "checkpoint.json"
+
+    def __init__(self, client: WBAPIClient, output_dir: str,
+                 window_days: int = 30, workers: int = 4):
+        self.client = client
+        self.output_dir = output_dir
+        self.window_days = window_days
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._done = set()
+
+    @staticmethod
+    def split_windows(date_from: datetime, date_to: datetime, window_days: int) -> List[Tuple[int, int]]:
+        """Делит диапазон на окна [начало, конец] в unix timestamp"""
+        windows = []
+        start = date_from
+        step = timedelta(days=window_days)
+
+        while start < date_to:
+            end = min(start + step, date_to)
+            windows.append((int(start.timestamp()), int(end.timestamp()) - 1))
+            start = end
+
+        return windows
+
+    def run(self, date_from: datetime, date_to: datetime) -> int:
+        """Выгружает все незавершенные окна, возвращает число сохраненных отзывов"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._load_checkpoint()
+
+        windows = self.split_windows(date_from, date_to, self.window_days)
+        pending = [w for w in windows if self._window_key(w[0]) not in self._done]
+
+        print(f"📦 Окон всего: {len(windows)}, осталось: {len(pending)}")
+        if not pending:
+            return 0
+
+        total = 0
+        failed = 0
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._backfill_window, w): w for w in pending}
+
+            for future in as_completed(futures):
+                window = futures[future]
+                try:
+                    count = future.result()
+                    total += count
+                    print(f"✅ Окно {self._format_window(window)}: {count} отзывов")
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ Окно {self._format_window(window)}: {e}")
+
+        print(f"📦 Выгрузка завершена: {total} отзывов, ошибок в окнах: {failed}")
+        return total
+
+    def _backfill_window(self, window: Tuple[int, int]) -> int:
+        """Выгружает одно окно и отмечает его в чекпоинте"""
+        date_from, date_to = window
+        key = self._window_key(date_from)
+        path = os.path.join(self.output_dir, f"feedbacks_{key}.jsonl")
+        tmp_path = f"{path}.tmp"
+        seen = set()
+        count = 0
+
+        sources = [
+            ("feedbacks", {"isAnswered": True, "dateFrom": date_from, "dateTo": date_to}),
+            ("feedbacks", {"isAnswered": False, "dateFrom": date_from, "dateTo": date_to}),
+            ("feedbacks/archive", {"dateFrom": date_from, "dateTo": date_to}),
+        ]
+
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for endpoint, filters in sources:
+                for item in self.client.iter_raw_feedbacks(endpoint, **filters):
+                    # Архив может не учитывать фильтр по датам - проверяем сами.
+                    # Отзывы идут от старых к новым: после конца окна дальше не листаем
+                    created = parse_wb_date(item.get('createdDate', ''))
+                    if created and created > date_to:
+                        break
+                    if created and created < date_from:
+                        continue
+                    if item.get('id') in seen:
+                        continue
+
+                    seen.add(item.get('id'))
+                    item['_source'] = endpoint
+                    f.write(json.dumps(item, ensure_ascii=False) + "\n")
+                    count += 1
+
+        os.replace(tmp_path, path)
+        # Неполное последнее окно еще пополняется - в следующий раз выгрузим его снова
+        if date_to == self._window_end(date_from):
+            self._mark_done(key)
+        return count
+
+    def _load_checkpoint(self):
+        """Загружает список завершенных окон"""
+        path = os.path.join(self.output_dir, self.CHECKPOINT_FILE)
+        if not os.path.exists(path):
+            return
+
+        with open(path, 'r', encoding='utf-8') as f:
+            self._done = set(json.load(f).get('done', []))
+
+    def _mark_done(self, key: str):
+        """Атомарно добавляет окно в чекпоинт"""
+        with self._lock:
+            self._done.add(key)
+            path = os.path.join(self.output_dir, self.CHECKPOINT_FILE)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'done': sorted(self._done)}, f)
+            os.replace(tmp_path, path)
+
+    def _window_end(self, start: int) -> int:
+        """Конец полного окна, начинающегося в start"""
+        return start + int(timedelta(days=self.window_days).total_seconds()) - 1
+
+    def _window_key(self, start: int) -> str:
+        return f"{start}-{self._window_end(start)}"
+
+    @staticmethod
+    def _format_window(window: Tuple[int, int]) -> str:
+        start, end = (datetime.fromtimestamp(ts, tz=timezone.utc).strftime('%Y-%m-%d') for ts in window)
+        return f"{start}..{end}"
@@ -0,0 +1,131 @@
+"""
+Ограниченное по памяти множество обработанных отзывов
+"""
+
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional
+
+class BloomFilter:
+    """Компактный вероятностный фильтр (битовый массив в bytearray)
+
+    Может ошибаться только в одну сторону: "возможно есть" для
+    отсутствующего элемента. Поэтому его ответ всегда перепроверяется.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+class ProcessedIdSet:
+    """Множество ID обработанных отзывов с постоянным потреблением памяти
+
+    Недавние ID хранятся точно (в OrderedDict с временем добавления) в
+    пределах окна window_seconds и не более max_recent штук. Вытесненные
+    ID попадают в два поколения Bloom-фильтров: когда текущее заполняется,
+    старое поколение выбрасывается. Попадание в фильтр перепроверяется
+    через confirm (например, по outbox в SQLite), поэтому ложного
+    "уже обработан" не бывает; без confirm такой ID считается новым.
+    Проверка и добавление - O(1). Множество общее для потоков конвейера,
+    поэтому все операции идут под своей блокировкой.
+    """
+
+    def __init__(self, window_seconds: float = 72 * 3600, max_recent: int = 50000,
+                 bloom_capacity: int = 1000000,
+                 confirm: Optional[Callable[[str], bool]] = None):
+        self.window_seconds = window_seconds
+        self.max_recent = max_recent
+        self.bloom_capacity = bloom_capacity
+        self.confirm = confirm
+        self._recent: "OrderedDict[str, float]" = OrderedDict()
+        self._bloom = BloomFilter(bloom_capacity)
+        self._previous_bloom: Optional[BloomFilter] = None
+        self.stats = {'hits': 0, 'bloom_checks': 0, 'bloom_confirmed': 0}
+        self._lock = threading.Lock()
+
+    def add(self, review_id: str):
+        """Отмечает отзыв как обработанный"""
+        with self._lock:
+            self._recent[review_id] = time.monotonic()
+            self._recent.move_to_end(review_id)
+            self._evict()
+
+    def discard(self, review_id: str):
+        """Снимает отметку: ответ так и не дошел до WB, отзыв нужно обработать снова"""
+        with self._lock:
+            self._recent.pop(review_id, None)
+
+    def __contains__(self, review_id: str) -> bool:
+        with self._lock:
+            if review_id in self._recent:
+                self.stats['hits'] += 1
+                return True
+
+            in_bloom = review_id in self._bloom or (
+                self._previous_bloom is not None and review_id in self._previous_bloom)
+            if not in_bloom:
+                return False
+            self.stats['bloom_checks'] += 1
+
+        # Перепроверка обращается к SQLite - без блокировки
+        if self.confirm is None or not self.confirm(review_id):
+            return False
+
+        with self._lock:
+            self.stats['bloom_confirmed'] += 1
+        return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._recent)
+
+    def export(self, limit: int) -> List[str]:
+        """Последние limit ID из точного окна (для снимка состояния)"""
+        with self._lock:
+            ids = list(self._recent.keys())
+        return ids[-limit:] if limit else []
+
+    def restore(self, ids: Iterable[str]):
+        """Добавляет ID из снимка состояния"""
+        for review_id in ids:
+            self.add(review_id)
+
+    def _evict(self):
+        """Переносит устаревшие ID из точного окна в Bloom-фильтр"""
+        threshold = time.monotonic() - self.window_seconds
+
+        while self._recent:
+            review_id, added_at = next(iter(self._recent.items()))
+            if added_at >= threshold and len(self._recent) <= self.max_recent:
+                break
+            self._recent.popitem(last=False)
+
+            if self._bloom.is_full:
+                self._previous_bloom = self._bloom
+                self._bloom = BloomFilter(self.bloom_capacity)
+            self._bloom.add(review_id)
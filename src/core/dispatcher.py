@@ -0,0 +1,168 @@
+"""
+Отправка ответов из outbox в WB
+"""
+
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, List, Optional
+from src.api.wb_client import WBAPIClient
+from src.storage.outbox import ReplyOutbox, STATUS_FAILED
+from src.storage.database import ReviewStore
+from src.storage.leases import LeaseStore
+from src.utils.deadline import Deadline
+from src.utils.telegram_notifier import TelegramNotifier
+
+class OutboxDispatcher:
+    """Отправляет ответы из outbox с ограниченной параллельностью
+
+    Темп запросов задает rate limiter клиента, а max_workers ограничивает
+    число одновременно висящих запросов. Неудачные отправки повторяются
+    с экспоненциальной паузой. Если ответ уже пытались отправить (попытка
+    не первая), сначала проверяем в WB, не дошел ли он - так на отзыв
+    не будет отправлено два ответа. Когда время запуска истекает, новые
+    ответы не забираются, а уже забранные возвращаются в очередь.
+    Об окончательно неотправленном ответе сообщает on_failed(item).
+
+    Пока ответ в outbox, отзыв остается в аренде (leases): перед каждой
+    попыткой аренда продлевается токеном из outbox, при повторе - на время
+    паузы, после окончательной неудачи освобождается. Если аренда истекла,
+    dispatcher берет ее заново и сначала проверяет, не ответил ли на отзыв
+    другой экземпляр; занятый отзыв откладывается на lease_ttl.
+    """
+
+    def __init__(self, wb_client: WBAPIClient, outbox: ReplyOutbox, store: ReviewStore,
+                 telegram: TelegramNotifier, max_workers: int = 4, retry_base: float = 30.0,
+                 deadline: Optional[Deadline] = None,
+                 on_failed: Optional[Callable[[dict], None]] = None,
+                 leases: Optional[LeaseStore] = None, lease_ttl: float = 600.0):
+        self.wb_client = wb_client
+        self.outbox = outbox
+        self.store = store
+        self.telegram = telegram
+        self.max_workers = max_workers
+        self.retry_base = retry_base
+        self.deadline = deadline or Deadline()
+        self.on_failed = on_failed
+        self.leases = leases
+        self.lease_ttl = lease_ttl
+
+    def drain(self) -> List[dict]:
+        """Отправляет все готовые ответы, возвращает успешно отправленные"""
+        sent = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while not self.deadline.expired:
+                items = self.outbox.claim_due(limit=self.max_workers * 4)
+                if not items:
+                    break
+
+                for item, success in zip(items, executor.map(self._dispatch, items)):
+                    if success:
+                        sent.append(item)
+
+        return sent
+
+    def _dispatch(self, item: dict) -> bool:
+        """Отправляет один ответ и уведомляет о нем"""
+        if not self.send(item):
+            return False
+
+        self.notify(item)
+        return True
+
+    def send(self, item: dict) -> bool:
+        """Отправляет один забранный из outbox ответ и фиксирует результат"""
+        review_id = item['review_id']
+
+        if self.deadline.expired:
+            self.outbox.release(review_id)
+            return False
+
+        reacquired = self._hold_lease(item)
+        if reacquired is None:
+            return False
+
+        try:
+            if item['attempts'] > 1 or reacquired:
+                answered = self.wb_client.is_review_answered(review_id)
+                if answered:
+                    print(f"⏭️ На отзыв {review_id} уже есть ответ, повторно не отправляем")
+                    self.outbox.mark_sent(review_id)
+                    return False
+                if answered is None:
+                    self._schedule_retry(item, "не удалось проверить статус отзыва")
+                    return False
+
+            success = self.wb_client.post_reply_to_review(review_id, item['reply'])
+        except Exception as e:
+            success = False
+            print(f"❌ Ошибка отправки ответа для отзыва {review_id}: {e}")
+
+        self.store.record_post_attempt(review_id, success)
+
+        if not success:
+            self._schedule_retry(item, "ошибка отправки ответа")
+            return False
+
+        # Аренда, продленная перед отправкой, истечет сама: к тому времени WB отметит отзыв отвеченным
+        self.outbox.mark_sent(review_id)
+        return True
+
+    def _hold_lease(self, item: dict) -> Optional[bool]:
+        """Продлевает аренду отзыва перед отправкой
+
+        False - аренда продлена, True - аренда истекла и взята заново,
+        None - отзыв у другого экземпляра, ответ отложен на lease_ttl.
+        """
+        if self.leases is None:
+            return False
+
+        review_id = item['review_id']
+        name = f"review:{review_id}"
+        token = item.get('lease_token')
+        if token is not None and self.leases.renew(name, token, self.lease_ttl):
+            return False
+
+        token = self.leases.acquire(name, self.lease_ttl)
+        if token is None:
+            print(f"🔒 Отзыв {review_id} обрабатывает другой экземпляр бота, отправка отложена")
+            self.outbox.release(review_id, delay=self.lease_ttl)
+            return None
+
+        self.outbox.set_lease_token(review_id, token)
+        item['lease_token'] = token
+        return True
+
+    def notify(self, item: dict):
+        """Отправляет уведомление о КАЖДОМ новом ответе"""
+        review_data = {
+            'user_name': item['user_name'],
+            'rating': item['rating'],
+            'product_name': item['product_name'],
+            'text': item['review_text'],
+            'time': datetime.now().strftime('%H:%M:%S')
+        }
+        self.telegram.notify_new_review(review_data, item['reply'])
+
+    def _schedule_retry(self, item: dict, error: str):
+        """Планирует повтор с экспоненциальной паузой и разбросом"""
+        delay = self.retry_base * (2 ** (item['attempts'] - 1)) * random.uniform(0.8, 1.2)
+        status = self.outbox.mark_failed(item['review_id'], item['attempts'], error, delay)
+        token = item.get('lease_token')
+        if self.leases is not None and token is not None:
+            name = f"review:{item['review_id']}"
+            if status == STATUS_FAILED:
+                self.leases.release(name, token)
+            else:
+                # Аренда держится и на время паузы перед повтором
+                self.leases.renew(name, token, delay + self.lease_ttl)
+
+        if status == STATUS_FAILED:
+            message = f"Не удалось отправить ответ на отзыв {item['review_id']} за {item['attempts']} попыток"
+            print(f"❌ {message}")
+            self.telegram.notify_error(message)
+            if self.on_failed:
+                self.on_failed(item)
+        else:
+            print(f"🔁 Ответ на отзыв {item['review_id']} будет отправлен повторно через {delay:.0f} с")
@@ -1,21 +1,86 @@
-import time
-from datetime import datetime
+import json
+import os
+import threading
+from datetime import date, datetime
+from typing import List, Optional
+from src.api.models import WBReview
 from src.api.wb_client import WBAPIClient
+from src.api.sync_cursor import SyncCursor
+from src.config.settings import settings
 from src.ai.generator import AIGenerator
 from .processor import ReviewProcessor
+from src.utils.deadline import Deadline
+from src.utils.http import transport
 from src.utils.telegram_notifier import TelegramNotifier
+from src.storage.database import ReviewStore
+from src.storage.leases import create_lease_store
+from src.storage.outbox import ReplyOutbox
+from .dispatcher import OutboxDispatcher
+from .pipeline import Pipeline, Stage
+from .priority import SLAPolicy
 
 class ResponseManager:
     """Менеджер обработки отзывов"""
 
-    def __init__(self, test_mode: bool = False):
+    def __init__(self, test_mode: bool = False, snapshot: Optional[dict] = None,
+                 deadline: Optional[Deadline] = None, tenant=None,
+                 ai_generator: Optional[AIGenerator] = None,
+                 telegram: Optional[TelegramNotifier] = None, fair_share=None):
         self.test_mode = test_mode
-        self.wb_client = WBAPIClient(test_mode=test_mode)
-        self.ai_generator = AIGenerator(test_mode=test_mode)
-        self.processor = ReviewProcessor(self.ai_generator)
-        self.telegram = TelegramNotifier()
+        snapshot = snapshot or {}
+        # Продавец (None - единственный продавец из WB_API_KEY): свой ключ и свое состояние
+        self.tenant = tenant
+        self.state_dir = tenant.state_dir if tenant else settings.STATE_DIR
+        database_path = tenant.database_path if tenant else settings.DATABASE_PATH
+        # Общий дедлайн запуска: по нему все стадии урезают таймауты и объем работы
+        self.deadline = deadline or Deadline()
+        self.wb_client = WBAPIClient(test_mode=test_mode, deadline=self.deadline,
+                                     api_key=tenant.api_key if tenant else None)
+        self.ai_generator = ai_generator or AIGenerator(test_mode=test_mode,
+                                                        provider_state=snapshot.get('provider'),
+                                                        deadline=self.deadline)
+        self.telegram = telegram or TelegramNotifier()
+        self.store = ReviewStore(database_path,
+                                 enabled=settings.STORAGE_ENABLED and not test_mode)
+        self.outbox = None
+        self.dispatcher = None
+        # Аренды отзывов: параллельный экземпляр бота не ответит на тот же отзыв
+        self.leases = None
+        self._lease_tokens = {}
+        if not test_mode:
+            self.leases = create_lease_store(settings.LEASE_URL)
+            self.outbox = ReplyOutbox(database_path, max_attempts=settings.OUTBOX_MAX_ATTEMPTS)
+
+        # Outbox - авторитетный источник: ответ на отзыв уже сгенерирован
+        self.processor = ReviewProcessor(
+            self.ai_generator,
+            confirm_processed=self.outbox.contains if self.outbox else None,
+            deadline=self.deadline,
+            fair_share=fair_share,
+            tenant=tenant
+        )
+        if self.outbox is not None:
+            # Ответ так и не отправлен - при следующей выборке отзыв снова получит ответ
+            self.dispatcher = OutboxDispatcher(self.wb_client, self.outbox, self.store, self.telegram,
+                                               max_workers=settings.OUTBOX_WORKERS,
+                                               deadline=self.deadline,
+                                               on_failed=self._reply_failed,
+                                               leases=self.leases, lease_ttl=settings.LEASE_TTL)
+            recovered = self.outbox.recover()
+            if recovered:
+                print(f"♻️ Восстановлено {recovered} неподтвержденных ответов из outbox")
+        self._cursor_lock = threading.Lock()
+        self._rewound_to = None
+        self.sync_cursor = SyncCursor(
+            os.path.join(self.state_dir, 'sync_cursor.json'),
+            recheck_minutes=settings.SYNC_RECHECK_MINUTES
+        )
+
+        self.last_run_at = None
+        self.last_error = None
 
         # Статистика за день
+        self._daily_lock = threading.Lock()
         self.daily_stats = {
             'checks_count': 0,
             'reviews_processed': 0,
@@ -23,29 +88,66 @@ class ResponseManager:
             'last_check_date': datetime.now().date()
         }
 
-    def process_new_reviews(self):
-        """Обрабатывает новые отзывы"""
+        if snapshot and not test_mode:
+            self._restore_state(snapshot)
+
+    def _restore_state(self, snapshot: dict):
+        """Восстанавливает состояние из снимка прошлого запуска"""
+        self.sync_cursor.restore(snapshot.get('sync_cursor'))
+        self.processor.processed_ids.restore(snapshot.get('processed_ids', []))
+
+        restored = self.outbox.import_pending(snapshot.get('outbox', []))
+        if restored:
+            print(f"♻️ Из снимка восстановлено {restored} неотправленных ответов")
+
+        daily = snapshot.get('daily_stats')
+        if daily:
+            self.daily_stats = dict(daily, last_check_date=date.fromisoformat(daily['last_check_date']))
+
+        print(f"♻️ Состояние восстановлено: {len(self.processor.processed_ids)} обработанных отзывов, "
+              f"проверок сегодня: {self.daily_stats['checks_count']}")
+
+    def export_state(self) -> dict:
+        """Компактный снимок состояния для следующего запуска"""
+        return {
+            'sync_cursor': self.sync_cursor.to_dict(),
+            'processed_ids': self.processor.processed_ids.export(settings.STATE_MAX_IDS),
+            'outbox': self.outbox.export_pending() if self.outbox else [],
+            'provider': self.ai_generator.provider_state(),
+            'daily_stats': dict(self.daily_stats,
+                                last_check_date=self.daily_stats['last_check_date'].isoformat())
+        }
+
+    def process_new_reviews(self) -> int:
+        """Обрабатывает новые отзывы, возвращает число отзывов, отобранных для ответа"""
         print("\n" + "="*60)
-        print(f"🕒 Запуск обработки отзывов")
+        tenant_title = f" продавца {self.tenant.name}" if self.tenant else ""
+        print(f"🕒 Запуск обработки отзывов{tenant_title}")
         print(f"🔧 Режим: {'ТЕСТОВЫЙ' if self.test_mode else 'РАБОЧИЙ'}")
         print("="*60)
 
         start_time = datetime.now()
-        current_date = datetime.now().date()
-
-        # Сброс статистики если новый день
-        if current_date != self.daily_stats['last_check_date']:
-            self._send_daily_report()  # Отправляем отчет за предыдущий день
-            self.daily_stats = {
-                'checks_count': 0,
-                'reviews_processed': 0,
-                'replies_sent': 0,
-                'last_check_date': current_date
-            }
-
+        self.rollover_daily_stats()
         self.daily_stats['checks_count'] += 1
 
+        run_stats = {'reviews_fetched': 0, 'replies_generated': 0, 'replies_sent': 0, 'errors': 0}
+        self.last_error = None
+
         try:
+            # Сначала досылаем ответы, оставшиеся с прошлых запусков
+            if self.dispatcher:
+                leftover = self.dispatcher.drain()
+                if leftover:
+                    print(f"📤 Отправлено {len(leftover)} ответов из outbox")
+                    run_stats['replies_sent'] += len(leftover)
+                    self.daily_stats['replies_sent'] += len(leftover)
+
+            # Дешевая проверка: если новых отзывов нет и курсор свежий - выходим
+            if not self.test_mode and self.sync_cursor.is_fresh:
+                if not self.wb_client.has_unseen_feedbacks():
+                    print("📭 Новых отзывов нет, выборка пропущена.")
+                    return 0
+
             # Получаем статистику
             wb_stats = {}
             if not self.test_mode:
@@ -54,65 +156,301 @@ class ResponseManager:
                 print(f"📊 Новых сегодня: {wb_stats.get('countUnansweredToday', 0)}")
                 print(f"⭐ Средняя оценка: {wb_stats.get('valuation', 'N/A')}")
 
-            # Получаем отзывы
-            reviews = self.wb_client.get_unanswered_reviews()
+            # Выборка, отбор, генерация, отправка и уведомления идут конвейером:
+            # первый ответ уходит в WB, пока следующие страницы еще загружаются
+            progress = {'reviews': 0, 'selected': 0, 'generated': 0, 'sent': 0,
+                        'newest_seen': None, 'oldest_failed': None}
+            date_from = None if self.test_mode else self.sync_cursor.date_from
+            if not self.test_mode and not self.sync_cursor.is_fresh:
+                # Полная выборка: отзывы старше курсора, ответ на которые потерялся, найдутся снова
+                print("🔄 Курсор синхронизации устарел, запрашиваем все неотвеченные отзывы")
+                date_from = None
+            self._rewound_to = None
+            pipeline = self._build_pipeline(progress)
+            try:
+                pipeline.run(self.wb_client.iter_unanswered_pages(date_from=date_from))
+            finally:
+                run_stats['reviews_fetched'] += progress['reviews']
+                run_stats['replies_generated'] += progress['generated']
+                run_stats['replies_sent'] += progress['sent']
+                if progress['reviews']:
+                    pipeline.report()
+                    sla_stats = progress['sla'].stats()
+                    print(f"⏰ SLA {settings.SLA_TARGET_HOURS:g} ч: ответов {sla_stats['answered']}, "
+                          f"с просрочкой {sla_stats['overdue']}, "
+                          f"максимальная просрочка {sla_stats['max_lateness_hours']} ч")
+                    if self.ai_generator.cache.enabled:
+                        cache_stats = self.ai_generator.cache.stats()
+                        print(f"♻️ Кэш ответов: попаданий {cache_stats['hit_rate']:.0%} "
+                              f"(память {cache_stats['hits_memory']}, диск {cache_stats['hits_disk']}, "
+                              f"промахов {cache_stats['misses']})")
+                    if self.ai_generator.similar.enabled:
+                        similar_stats = self.ai_generator.similar.stats()
+                        print(f"♻️ Похожие отзывы: найдено {similar_stats['matches']} из "
+                              f"{similar_stats['queries']}, в индексе {similar_stats['entries']}")
 
-            if not reviews:
-                print("📭 Неотвеченных отзывов не найдено.")
-                return
+            if pipeline.truncated:
+                print("⏰ Время запуска на исходе, обработка остановлена. "
+                      "Оставшиеся отзывы обработаем в следующий раз")
+
+            total_reviews = progress['reviews']
+            total_sent = progress['sent']
+            newest_seen = progress['newest_seen']
+            oldest_failed = progress['oldest_failed']
 
-            # Обрабатываем отзывы
-            results = self.processor.process_reviews(reviews)
-            self.daily_stats['reviews_processed'] += len(reviews)
+            # Курсор не должен уйти дальше отзыва, на который не удалось ответить,
+            # а после остановки по дедлайну - дальше непросмотренных страниц
+            if not self.test_mode and not pipeline.truncated:
+                next_cursor = newest_seen
+                if oldest_failed is not None and next_cursor is not None:
+                    next_cursor = min(next_cursor, oldest_failed)
+                with self._cursor_lock:
+                    # Ответ, окончательно не отправленный за этот запуск, отодвинул курсор назад
+                    if self._rewound_to is not None and next_cursor is not None:
+                        next_cursor = min(next_cursor, self._rewound_to)
+                    self.sync_cursor.advance(next_cursor)
+                    self.sync_cursor.save()
 
-            # Отправляем ответы и уведомления
-            sent_count = self._send_replies(results)
-            self.daily_stats['replies_sent'] += sent_count
+            if not total_reviews:
+                print("📭 Неотвеченных отзывов не найдено.")
+                return 0
 
-            print(f"\n📊 ИТОГО: Обработано {sent_count} из {len(reviews)} отзывов")
+            print(f"\n📊 ИТОГО: Обработано {total_sent} из {total_reviews} отзывов")
+            return progress['selected']
 
         except Exception as e:
+            run_stats['errors'] += 1
             error_msg = f"Критическая ошибка: {e}"
             print(f"💥 {error_msg}")
             self.telegram.notify_error(error_msg)
+            self.last_error = error_msg
+            return 0
+
+        finally:
+            self.last_run_at = start_time
+            self.store.record_run(start_time.timestamp(), self.test_mode, **run_stats)
+
+    def _build_pipeline(self, progress: dict) -> Pipeline:
+        """Собирает стадии конвейера; progress накапливает итоги запуска"""
+        lock = threading.Lock()
+        # Негативные и давно ждущие отзывы первыми получают генерацию и отправку
+        sla = progress['sla'] = SLAPolicy(settings.SLA_TARGET_HOURS)
+
+        def track_failed(review: WBReview):
+            self.release_lease(review)
+            # Курсор не должен уйти дальше отзыва, на который не удалось ответить
+            if review.created_ts:
+                with lock:
+                    oldest = progress['oldest_failed']
+                    progress['oldest_failed'] = min(oldest or review.created_ts, review.created_ts)
 
-    def _send_replies(self, results: list) -> int:
-        """Отправляет ответы и уведомляет в Telegram"""
-        sent_count = 0
-
-        for result in results:
-            if result["success"] and not self.test_mode:
-                time.sleep(0.5)  # Задержка между запросами
-
-                success = self.wb_client.post_reply_to_review(
-                    result["review"].id,
-                    result["reply"]
-                )
-
-                if success:
-                    sent_count += 1
-                    print(f"✅ Ответ отправлен для отзыва {result['review'].id}")
-
-                    # Отправляем уведомление о КАЖДОМ новом ответе
-                    review_data = {
-                    'user_name': result['review'].user_name,
-                    'rating': result['review'].rating,
-                    'product_name': result['review'].product_name,
-                    'text': result['review'].review_text,
-                    'time': datetime.now().strftime('%H:%M:%S')
-                }
-                    self.telegram.notify_new_review(review_data, result["reply"])
+        def select(page: List[WBReview]) -> List[List[WBReview]]:
+            self.store.save_reviews(page)
 
+            # Ответы на эти отзывы уже в outbox - повторно не генерируем
+            if self.outbox:
+                for review in page:
+                    if self.outbox.contains(review.id):
+                        self.processor.processed_ids.add(review.id)
+
+            newest = max((review.created_ts for review in page), default=0)
+            with lock:
+                progress['reviews'] += len(page)
+                self.daily_stats['reviews_processed'] += len(page)
+                if newest:
+                    progress['newest_seen'] = max(progress['newest_seen'] or 0, newest)
+
+            selected = []
+            for review in self.processor.select_reviews(page):
+                if self.acquire_lease(review):
+                    selected.append(review)
                 else:
-                    print(f"❌ Ошибка отправки ответа для отзыва {result['review'].id}")
+                    # Отзыв у другого экземпляра: курсор не пропускает его, пока ответ не дойдет до WB
+                    track_failed(review)
+            selected.sort(key=sla.priority)
+            # Похожие прошлые отзывы для всей страницы ищем одним запросом к индексу
+            self.ai_generator.prepare(selected)
+            with lock:
+                progress['selected'] += len(selected)
+            # Пачки идут в LLM одним запросом; после сортировки в пачке отзывы близкой срочности
+            return self.processor.batches(selected)
+
+        def generate(batch: List[WBReview]) -> List[dict]:
+            results = []
+            for result in self.processor.process_batch(batch):
+                review = result["review"]
+                if not result["success"]:
+                    track_failed(review)
+                    continue
+
+                self.store.save_reply(review.id, result["reply"], self.ai_generator.provider_name)
+                with lock:
+                    progress['generated'] += 1
+                if self.test_mode:
+                    sla.record(review)
+                    continue
+                results.append(result)
+            return results
 
-        return sent_count
+        def skip_batch(batch: List[WBReview]):
+            for review in batch:
+                track_failed(review)
+
+        def fail_result(result: dict):
+            track_failed(result["review"])
+
+        def enqueue(result: dict) -> bool:
+            try:
+                if not self.queue_reply(result["review"], result["reply"]):
+                    return False
+            except Exception:
+                track_failed(result["review"])
+                raise
+            result["queued"] = True
+            return True
+
+        def post(result: dict) -> List[dict]:
+            review = result["review"]
+            if not enqueue(result):
+                return []
+
+            # Ответ уже отправляется или ждет повтора - его дошлет drain
+            item = self.outbox.claim(review.id)
+            if item is None or not self.dispatcher.send(item):
+                return []
+
+            print(f"✅ Ответ отправлен для отзыва {review.id}")
+            sla.record(review)
+            with lock:
+                progress['sent'] += 1
+                self.daily_stats['replies_sent'] += 1
+            return [item]
+
+        queue_size = settings.PIPELINE_QUEUE_SIZE
+        # Ошибка стадии (например, занятая SQLite) не должна сдвинуть курсор дальше
+        # отзывов, которые стадия держала в этот момент
+        stages = [
+            Stage('select', select, queue_size=queue_size, on_error=skip_batch),
+            Stage('generate', generate, workers=settings.GENERATION_WORKERS, queue_size=queue_size,
+                  priority=lambda batch: sla.priority(batch[0]), on_skip=skip_batch,
+                  on_error=skip_batch)
+        ]
+        if not self.test_mode:
+            stages += [
+                # Не успели отправить - ответ остается в outbox до следующего запуска
+                Stage('post', post, workers=settings.OUTBOX_WORKERS,
+                      queue_size=queue_size, priority=sla.priority, on_skip=enqueue,
+                      on_error=fail_result),
+                Stage('notify', self.dispatcher.notify, queue_size=queue_size)
+            ]
+        return Pipeline(stages, deadline=self.deadline)
+
+    def _reply_failed(self, item: dict):
+        """Ответ из outbox так и не отправлен - отзыв снова попадет в выборку"""
+        self.processor.processed_ids.discard(item['review_id'])
+        created_ts = item.get('review_created_ts')
+        if not created_ts:
+            return
+        with self._cursor_lock:
+            self.sync_cursor.rewind(created_ts)
+            self.sync_cursor.save()
+            self._rewound_to = min(self._rewound_to or created_ts, created_ts)
+
+    def acquire_lease(self, review: WBReview) -> bool:
+        """Берет отзыв в работу, False если его обрабатывает другой экземпляр"""
+        if self.leases is None:
+            return True
+
+        token = self.leases.acquire(f"review:{review.id}", settings.LEASE_TTL)
+        if token is None:
+            print(f"🔒 Отзыв {review.id} обрабатывает другой экземпляр бота")
+            return False
+        self._lease_tokens[review.id] = token
+        return True
+
+    def fence_lease(self, review: WBReview) -> bool:
+        """Проверяет токен аренды перед отправкой и продлевает ее на время отправки"""
+        token = self._lease_tokens.get(review.id)
+        if self.leases is None or token is None:
+            return True
+
+        if self.leases.renew(f"review:{review.id}", token, settings.LEASE_TTL):
+            return True
+        print(f"🔒 Аренда отзыва {review.id} истекла и передана другому экземпляру, ответ не отправляем")
+        self._lease_tokens.pop(review.id, None)
+        return False
+
+    def queue_reply(self, review: WBReview, reply: str) -> bool:
+        """Кладет ответ в outbox, если аренда отзыва еще за нами"""
+        # Аренда истекла и отзыв забрал другой экземпляр - наш ответ не нужен
+        if not self.fence_lease(review):
+            return False
+        # Токен уходит в outbox вместе с ответом: дальше аренду ведет dispatcher
+        self.outbox.add(review, reply, lease_token=self._lease_tokens.get(review.id))
+        self._lease_tokens.pop(review.id, None)
+        return True
+
+    def release_lease(self, review: WBReview):
+        """Отзыв не обработан - другой экземпляр может взять его сразу"""
+        token = self._lease_tokens.pop(review.id, None)
+        if self.leases is not None and token is not None:
+            self.leases.release(f"review:{review.id}", token)
+
+    def rollover_daily_stats(self) -> bool:
+        """Если начался новый день - отправляет отчет за прошлый и сбрасывает статистику"""
+        current_date = datetime.now().date()
+
+        # Отчет может запросить и обработка отзывов, и отдельная задача планировщика
+        with self._daily_lock:
+            if current_date == self.daily_stats['last_check_date']:
+                return False
+
+            self._send_daily_report()  # Отправляем отчет за предыдущий день
+            self.daily_stats = {
+                'checks_count': 0,
+                'reviews_processed': 0,
+                'replies_sent': 0,
+                'last_check_date': current_date
+            }
+            return True
+
+    def health_check(self) -> dict:
+        """Проверка здоровья для режима демона, результат пишется в health.json"""
+        health = {
+            'checked_at': datetime.now().isoformat(timespec='seconds'),
+            'last_run_at': self.last_run_at.isoformat(timespec='seconds') if self.last_run_at else None,
+            'last_error': self.last_error,
+            'provider': self.ai_generator.provider_name,
+            'outbox_pending': self.outbox.pending_count() if self.outbox else 0,
+            'rate_limits': self.wb_client.rate_limiter.stats(),
+            'reply_cache': self.ai_generator.cache.stats(),
+            'similar_replies': self.ai_generator.similar.stats(),
+            'http': transport.pool_stats()
+        }
+
+        path = os.path.join(self.state_dir, 'health.json')
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(health, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+
+        if self.last_error:
+            print(f"🩺 Последний запуск завершился ошибкой: {self.last_error}")
+        return health
 
     def _send_daily_report(self):
         """Отправляет ежедневный отчет"""
         if self.test_mode or not self.telegram.enabled:
             return
 
+        # Отчет за день отправляет только один из параллельных экземпляров
+        report_date = self.daily_stats['last_check_date'].isoformat()
+        tenant_suffix = f":{self.tenant.name}" if self.tenant else ""
+        if not self.leases.leader(f"daily_report{tenant_suffix}:{report_date}", 26 * 3600):
+            print(f"📊 Отчет за {report_date} отправляет другой экземпляр бота")
+            return
+
         try:
             # Получаем текущую статистику для отчета
             wb_stats = self.wb_client.get_unanswered_count()
@@ -135,7 +473,6 @@ class ResponseManager:
         except Exception as e:
             print(f"❌ Ошибка отправки ежедневного отчета: {e}")
 
-    def __del__(self):
-        """Деструктор - отправляет отчет при завершении"""
-        if not self.test_mode and self.daily_stats['checks_count'] > 0:
-            self._send_daily_report()
+    def close(self):
+        """Дописывает накопленные данные в хранилище"""
+        self.store.close()
@@ -0,0 +1,271 @@
+"""
+Потоковый конвейер обработки отзывов
+"""
+
+import itertools
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional
+from src.utils.deadline import Deadline
+
+# Маркер конца потока данных
+_STOP = object()
+
+class Stage:
+    """Стадия конвейера: функция над элементом и свой пул потоков
+
+    Функция получает элемент и возвращает список элементов для следующей
+    стадии (пустой или None - дальше ничего не передается). Очередь на
+    входе стадии ограничена: если стадия не успевает, предыдущая
+    блокируется на записи в очередь - это время учитывается как
+    backpressure предыдущей стадии.
+
+    Если задан priority, очередь стадии приоритетная: первым берется
+    элемент с наименьшим ключом, при равных ключах - пришедший раньше.
+    Элементы, которые уже не успеть обработать до дедлайна, передаются
+    в on_skip, а элементы, на которых функция стадии упала, - в on_error.
+    """
+
+    def __init__(self, name: str, func: Optional[Callable[[Any], Optional[Iterable]]],
+                 workers: int = 1, queue_size: int = 100,
+                 priority: Optional[Callable[[Any], float]] = None,
+                 on_skip: Optional[Callable[[Any], None]] = None,
+                 on_error: Optional[Callable[[Any], None]] = None):
+        self.name = name
+        self.func = func
+        self.on_skip = on_skip
+        self.on_error = on_error
+        self.workers = max(1, workers)
+        self.priority = priority
+        if priority is None:
+            self.queue = queue.Queue(maxsize=max(1, queue_size))
+        else:
+            self.queue = queue.PriorityQueue(maxsize=max(1, queue_size))
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._finished_workers = 0
+
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.skipped = 0
+        self.busy_time = 0.0
+        self.idle_time = 0.0
+        self.blocked_time = 0.0
+        self.max_queue = 0
+
+    def put(self, item):
+        """Кладет элемент во входную очередь (блокируется, если она заполнена)"""
+        if self.priority is None:
+            self.queue.put(item)
+        else:
+            key = float('inf') if item is _STOP else self.priority(item)
+            self.queue.put((key, next(self._sequence), item))
+
+    def get(self):
+        """Забирает следующий элемент из входной очереди"""
+        if self.priority is None:
+            return self.queue.get()
+        return self.queue.get()[2]
+
+    def _account(self, **deltas):
+        """Потокобезопасно увеличивает счетчики стадии"""
+        with self._lock:
+            for name, value in deltas.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    @property
+    def average_time(self) -> float:
+        """Среднее время обработки одного элемента"""
+        processed = self.items_in if self.func else self.items_out
+        return self.busy_time / processed if processed else 0.0
+
+    def _worker_finished(self) -> bool:
+        """Отмечает завершение потока, True для последнего потока стадии"""
+        with self._lock:
+            self._finished_workers += 1
+            return self._finished_workers == self.workers
+
+    def stats(self, elapsed: float) -> dict:
+        """Пропускная способность и загрузка стадии"""
+        capacity = max(elapsed * self.workers, 1e-9)
+        processed = self.items_in if self.func else self.items_out
+        return {
+            'stage': self.name,
+            'workers': self.workers,
+            'items_in': self.items_in,
+            'items_out': self.items_out,
+            'errors': self.errors,
+            'skipped': self.skipped,
+            'rate': round(processed / elapsed, 2) if elapsed else 0.0,
+            'service_rate': round(processed / self.busy_time, 2) if self.busy_time else 0.0,
+            'busy': round(self.busy_time / capacity, 3),
+            'idle': round(self.idle_time / capacity, 3),
+            'backpressure': round(self.blocked_time / capacity, 3),
+            'max_queue': self.max_queue
+        }
+
+class Pipeline:
+    """Конвейер стадий, соединенных ограниченными очередями
+
+    Источник (например, постраничная выборка отзывов) читается в
+    вызывающем потоке, каждая стадия работает в своих потоках. Первый
+    ответ уходит в WB, пока следующие страницы еще загружаются, а
+    ограниченные очереди не дают быстрой стадии накопить в памяти весь
+    бэклог перед медленной.
+
+    С дедлайном каждая стадия (и источник) берет следующий элемент, только
+    если успевает обработать его за свое среднее время - так запуск
+    заканчивается сам, а не обрывается раннером на середине.
+    """
+
+    def __init__(self, stages: List[Stage], source_name: str = 'fetch',
+                 deadline: Optional[Deadline] = None):
+        self.source = Stage(source_name, None)
+        self.stages = stages
+        self.deadline = deadline or Deadline()
+        self.elapsed = 0.0
+
+    @property
+    def truncated(self) -> bool:
+        """Часть работы не выполнена из-за дедлайна"""
+        return any(stage.skipped for stage in [self.source] + self.stages)
+
+    def run(self, source: Iterable):
+        """Прогоняет все элементы источника через стадии и дожидается завершения
+
+        Ошибка элемента учитывается в статистике стадии, передается в
+        on_error стадии и не останавливает конвейер. Ошибка источника
+        пробрасывается после того, как уже полученные элементы будут
+        обработаны.
+        """
+        started = time.monotonic()
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for number in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(index,),
+                                          name=f"pipeline-{stage.name}-{number}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        error = None
+        iterator = iter(source)
+        try:
+            while True:
+                if not self.deadline.allows(self.source.average_time):
+                    self.source._account(skipped=1)
+                    print(f"⏰ Времени на загрузку следующей страницы нет ({self.deadline.describe()})")
+                    break
+
+                fetch_started = time.monotonic()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    self.source._account(busy_time=time.monotonic() - fetch_started)
+
+                self._put(self.source, 0, item)
+        except Exception as e:
+            error = e
+            self.source._account(errors=1)
+        finally:
+            self._put(self.source, 0, _STOP, count=False)
+
+        for thread in threads:
+            thread.join()
+
+        self.elapsed = time.monotonic() - started
+        if error is not None:
+            raise error
+
+    def _work(self, index: int):
+        """Цикл потока стадии"""
+        stage = self.stages[index]
+
+        while True:
+            wait_started = time.monotonic()
+            item = stage.get()
+            stage._account(idle_time=time.monotonic() - wait_started)
+
+            if item is _STOP:
+                if stage._worker_finished():
+                    self._put(stage, index + 1, _STOP, count=False)
+                else:
+                    # Остальные потоки стадии тоже должны увидеть конец потока
+                    stage.put(_STOP)
+                return
+
+            if not self.deadline.allows(stage.average_time):
+                self._skip(stage, item)
+                continue
+
+            work_started = time.monotonic()
+            try:
+                outputs = list(stage.func(item) or ())
+            except Exception as e:
+                outputs = []
+                stage._account(errors=1)
+                print(f"❌ Ошибка на стадии {stage.name}: {e}")
+                self._fail(stage, item)
+            stage._account(items_in=1, busy_time=time.monotonic() - work_started)
+
+            for output in outputs:
+                self._put(stage, index + 1, output)
+
+    def _skip(self, stage: Stage, item):
+        """Элемент не успеть обработать до дедлайна"""
+        stage._account(skipped=1)
+        if stage.on_skip is None:
+            return
+        try:
+            stage.on_skip(item)
+        except Exception as e:
+            stage._account(errors=1)
+            print(f"❌ Ошибка на стадии {stage.name}: {e}")
+
+    def _fail(self, stage: Stage, item):
+        """Функция стадии упала на элементе"""
+        if stage.on_error is None:
+            return
+        try:
+            stage.on_error(item)
+        except Exception as e:
+            # Элемент не удалось даже учесть - считаем работу незавершенной
+            stage._account(errors=1, skipped=1)
+            print(f"❌ Ошибка на стадии {stage.name}: {e}")
+
+    def _put(self, stage: Stage, index: int, item, count: bool = True):
+        """Передает элемент следующей стадии, учитывая время блокировки"""
+        if count:
+            stage._account(items_out=1)
+        if index >= len(self.stages):
+            return
+
+        target = self.stages[index]
+        put_started = time.monotonic()
+        target.put(item)
+        stage._account(blocked_time=time.monotonic() - put_started)
+        if not count:
+            return
+
+        depth = target.queue.qsize()
+        if depth > target.max_queue:
+            with target._lock:
+                target.max_queue = max(target.max_queue, depth)
+
+    def stats(self) -> List[dict]:
+        """Статистика по всем стадиям, начиная с источника"""
+        return [stage.stats(self.elapsed) for stage in [self.source] + self.stages]
+
+    def report(self):
+        """Выводит пропускную способность и backpressure стадий"""
+        print(f"\n⏱️ Конвейер: {self.elapsed:.1f} с")
+        for item in self.stats():
+            print(f"   {item['stage']:<9} x{item['workers']}: "
+                  f"вход {item['items_in']}, выход {item['items_out']}, ошибок {item['errors']}, "
+                  f"пропущено {item['skipped']}, "
+                  f"{item['rate']}/с (в работе {item['service_rate']}/с), "
+                  f"занятость {item['busy']:.0%}, простой {item['idle']:.0%}, "
+                  f"backpressure {item['backpressure']:.0%}, очередь до {item['max_queue']}")
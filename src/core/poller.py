@@ -0,0 +1,42 @@
+"""
+Адаптивный интервал опроса WB
+"""
+
+import random
+
+class AdaptivePoller:
+    """Интервал до следующей проверки отзывов
+
+    После проверки, в которой нашлись новые отзывы, следующая проверка
+    идет через min_interval - отзывы часто приходят пачками. Каждая пустая
+    проверка умножает интервал на backoff, но не больше max_interval.
+    Разброс jitter (доля интервала) не дает нескольким ботам опрашивать
+    API синхронно.
+    """
+
+    def __init__(self, min_interval: float = 60.0, max_interval: float = 1800.0,
+                 backoff: float = 2.0, jitter: float = 0.1):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.backoff = backoff
+        self.jitter = jitter
+        self.interval = min_interval
+        self.empty_polls = 0
+
+    def next_interval(self, found: int) -> float:
+        """Учитывает результат проверки и возвращает паузу до следующей, секунды"""
+        if found:
+            self.empty_polls = 0
+            self.interval = self.min_interval
+        else:
+            self.empty_polls += 1
+            # Первая пустая проверка после активности оставляет быстрый темп
+            if self.empty_polls > 1:
+                self.interval = min(self.interval * self.backoff, self.max_interval)
+
+        return self._with_jitter(self.interval)
+
+    def _with_jitter(self, interval: float) -> float:
+        spread = interval * self.jitter
+        delay = interval + random.uniform(-spread, spread)
+        return min(max(delay, self.min_interval), self.max_interval * (1 + self.jitter))
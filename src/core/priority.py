@@ -0,0 +1,59 @@
+"""
+Приоритет отзывов по сроку ответа (SLA)
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+from src.api.models import WBReview
+
+# Доля целевого срока ответа в зависимости от оценки: на негатив отвечаем быстрее
+SEVERITY_FACTORS = {1: 0.25, 2: 0.4, 3: 0.6, 4: 1.0, 5: 1.0}
+
+class SLAPolicy:
+    """Ранжирует отзывы по сроку, к которому на них нужно ответить
+
+    Срок ответа - дата отзыва плюс целевое время, уменьшенное для низких
+    оценок. Чем раньше срок, тем выше приоритет (earliest deadline first):
+    старый отзыв на 1 звезду обгоняет свежие пятерки, а свежая единица -
+    пятерку, которая еще далека от просрочки. Отзывы без даты считаются
+    только что созданными.
+    """
+
+    def __init__(self, target_hours: float = 24.0, factors: Optional[Dict[int, float]] = None):
+        self.target_seconds = target_hours * 3600
+        self.factors = factors or SEVERITY_FACTORS
+        self._lock = threading.Lock()
+        self.answered = 0
+        self.overdue = 0
+        self.max_lateness = 0.0
+
+    def target_for(self, rating: int) -> float:
+        """Целевое время ответа в секундах для оценки"""
+        return self.target_seconds * self.factors.get(rating, 1.0)
+
+    def due_at(self, review: WBReview) -> float:
+        """Момент, к которому нужно ответить на отзыв (unix time)"""
+        created = review.created_ts or time.time()
+        return created + self.target_for(review.rating)
+
+    def priority(self, item) -> float:
+        """Ключ для приоритетной очереди: отзыв или результат генерации"""
+        review = item["review"] if isinstance(item, dict) else item
+        return self.due_at(review)
+
+    def record(self, review: WBReview, answered_at: Optional[float] = None):
+        """Учитывает ответ на отзыв в статистике соблюдения SLA"""
+        lateness = (answered_at or time.time()) - self.due_at(review)
+        with self._lock:
+            self.answered += 1
+            if lateness > 0:
+                self.overdue += 1
+                self.max_lateness = max(self.max_lateness, lateness)
+
+    def stats(self) -> dict:
+        return {
+            'answered': self.answered,
+            'overdue': self.overdue,
+            'max_lateness_hours': round(self.max_lateness / 3600, 1)
+        }
@@ -1,13 +1,30 @@
-from typing import List
-from src.api.models import WBReview
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Callable, List, Optional
+from src.api.models import WBReview, ReviewBatch
 from src.ai.generator import AIGenerator
+from src.config.settings import settings
+from src.utils.deadline import Deadline
+from .dedup import ProcessedIdSet
 
 class ReviewProcessor:
     """Обработчик отзывов"""
 
-    def __init__(self, ai_generator: AIGenerator):
+    def __init__(self, ai_generator: AIGenerator,
+                 confirm_processed: Optional[Callable[[str], bool]] = None,
+                 deadline: Optional[Deadline] = None, fair_share=None, tenant=None):
         self.ai_generator = ai_generator
-        self.processed_ids = set()
+        self.deadline = deadline or Deadline()
+        # Генератор общий для нескольких продавцов - слоты делятся честно
+        self.fair_share = fair_share
+        self.tenant = tenant
+        self.processed_ids = ProcessedIdSet(
+            window_seconds=settings.DEDUP_WINDOW_HOURS * 3600,
+            max_recent=settings.DEDUP_MAX_RECENT,
+            confirm=confirm_processed
+        )
+        self.workers = settings.GENERATION_WORKERS
+        self.batch_size = max(1, settings.GENERATION_BATCH_SIZE)
 
     def should_process(self, review: WBReview) -> bool:
         """Проверяет, нужно ли обрабатывать отзыв"""
@@ -17,7 +34,7 @@ class ReviewProcessor:
         if not review.has_text:
             return False
 
-        if len(review.text.strip()) < 5 and any(char.isdigit() for char in review.text):
+        if review.is_short_numeric:
             return False
 
         return True
@@ -28,9 +45,32 @@ class ReviewProcessor:
             print("📭 Нет отзывов для обработки")
             return []
 
-        results = []
+        to_generate = self.select_reviews(reviews)
 
-        for review in reviews:
+        # Результаты возвращаются в порядке отзывов независимо от режима генерации
+        return [self._make_result(review, reply)
+                for review, reply in zip(to_generate, self._generate_replies(to_generate))]
+
+    def process_review(self, review: WBReview) -> dict:
+        """Генерирует ответ на один отобранный отзыв"""
+        return self._make_result(review, self._generate_reply(review))
+
+    def process_batch(self, reviews: List[WBReview]) -> List[dict]:
+        """Генерирует ответы на пачку отобранных отзывов (стадия потокового конвейера)"""
+        return [self._make_result(review, reply)
+                for review, reply in zip(reviews, self._generate_batch(reviews))]
+
+    def batches(self, reviews: List[WBReview]) -> List[List[WBReview]]:
+        """Делит отзывы на пачки по GENERATION_BATCH_SIZE для одного запроса к LLM"""
+        return [reviews[start:start + self.batch_size]
+                for start in range(0, len(reviews), self.batch_size)]
+
+    def select_reviews(self, reviews: List[WBReview]) -> List[WBReview]:
+        """Выводит информацию об отзывах и отбирает те, на которые нужно ответить"""
+        selected = set(ReviewBatch(reviews).select(exclude_ids=self.processed_ids))
+        to_generate = []
+
+        for index, review in enumerate(reviews):
             print(f"\n--- Обработка отзыва ---")
             print(f"📄 Отзыв ID: {review.id}")
             print(f"⭐ Рейтинг: {review.rating}/5")
@@ -44,34 +84,70 @@ class ReviewProcessor:
             if review.cons:
                 print(f"👎 Cons: {review.cons[:100]}{'...' if len(review.cons) > 100 else ''}")
 
-            if not self.should_process(review):
+            if index not in selected:
                 print("⏭️ Пропускаем отзыв")
                 continue
 
-            # Генерируем ответ используя полный текст отзыва
-            reply = self.ai_generator.generate_reply(
-                review_text=review.review_text,  # Используем свойство которое объединяет все поля
-                product_name=review.product_name,
-                rating=review.rating,
-                user_name=review.user_name,
-                pros=review.pros,
-                cons=review.cons
-            )
-
-            if reply:
-                results.append({
-                    "review": review,
-                    "reply": reply,
-                    "success": True
-                })
-                self.processed_ids.add(review.id)
-                print(f"✅ Ответ сгенерирован для отзыва {review.id}")
-            else:
-                results.append({
-                    "review": review,
-                    "reply": "",
-                    "success": False
-                })
-                print(f"⚠️ Не удалось сгенерировать ответ для отзыва {review.id}")
-
-        return results
+            to_generate.append(review)
+
+        return to_generate
+
+    def _make_result(self, review: WBReview, reply: str) -> dict:
+        """Результат обработки отзыва; успешные отзывы помечаются обработанными"""
+        if not reply:
+            print(f"⚠️ Не удалось сгенерировать ответ для отзыва {review.id}")
+            return {"review": review, "reply": "", "success": False}
+
+        self.processed_ids.add(review.id)
+        print(f"✅ Ответ сгенерирован для отзыва {review.id}")
+        return {"review": review, "reply": reply, "success": True}
+
+    def _generate_replies(self, reviews: List[WBReview]) -> List[str]:
+        """Генерирует ответы пачками последовательно или в пуле потоков (GENERATION_WORKERS > 1)"""
+        batches = self.batches(reviews)
+        if self.workers <= 1 or len(batches) <= 1:
+            return [reply for batch in batches for reply in self._generate_batch(batch)]
+
+        print(f"🧵 Параллельная генерация: {len(reviews)} отзывов, потоков: {self.workers}")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return [reply for replies in executor.map(self._generate_batch, batches) for reply in replies]
+
+    def _generate_batch(self, reviews: List[WBReview]) -> List[str]:
+        """Генерирует ответы на пачку отзывов одним обращением к генератору"""
+        if self.deadline.expired:
+            print(f"⏰ Время запуска истекло, {len(reviews)} отзывов обработаем в следующий раз")
+            return [""] * len(reviews)
+
+        try:
+            with self._fair_slot(), self.ai_generator.concurrency_slot(self.workers):
+                return self.ai_generator.generate_replies(reviews)
+        except Exception as e:
+            print(f"❌ Ошибка генерации для отзывов {', '.join(review.id for review in reviews)}: {e}")
+            return [""] * len(reviews)
+
+    def _generate_reply(self, review: WBReview) -> str:
+        """Генерирует ответ на один отзыв с учетом лимита параллельности провайдера"""
+        if self.deadline.expired:
+            print(f"⏰ Время запуска истекло, отзыв {review.id} обработаем в следующий раз")
+            return ""
+
+        try:
+            with self._fair_slot(), self.ai_generator.concurrency_slot(self.workers):
+                # Генерируем ответ используя полный текст отзыва
+                return self.ai_generator.generate_reply(
+                    review_text=review.review_text,  # Используем свойство которое объединяет все поля
+                    product_name=review.product_name,
+                    rating=review.rating,
+                    user_name=review.user_name,
+                    pros=review.pros,
+                    cons=review.cons
+                )
+        except Exception as e:
+            print(f"❌ Ошибка генерации для отзыва {review.id}: {e}")
+            return ""
+
+    def _fair_slot(self):
+        """Слот генерации в общей очереди продавцов (если генератор общий)"""
+        if self.fair_share is None or self.tenant is None:
+            return nullcontext()
+        return self.fair_share.slot(self.tenant.name, self.tenant.weight)
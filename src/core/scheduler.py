@@ -1,59 +1,119 @@
-import schedule
-import time
+import asyncio
 import signal
-import sys
+from datetime import datetime, timedelta
 from src.config.settings import settings
+from src.utils.deadline import Deadline
+from .async_scheduler import AsyncScheduler
 from .manager import ResponseManager
+from .poller import AdaptivePoller
+from .tenants import TenantRunner, load_tenants
 
 class BotScheduler:
-    """Планировщик задач бота"""
+    """Планировщик задач бота
+
+    Обработка отзывов, ежедневный отчет и проверка здоровья - независимые
+    задачи asyncio: медленный цикл генерации не задерживает остальные.
+    Сигнал завершения обрывает ожидание и истекает дедлайн менеджера,
+    поэтому уже идущая обработка останавливается на ближайшей проверке
+    дедлайна и сохраняет состояние, а не доделывает весь бэклог.
+
+    При нескольких продавцах (TENANTS_FILE) у каждого свои задачи и свой
+    адаптивный интервал опроса, а генератор и HTTP пул общие.
+    """
 
     def __init__(self):
         self.shutdown = False
-        self.manager = ResponseManager(test_mode=settings.TEST_MODE)
+        self.deadline = Deadline()
+        tenants = load_tenants()
+        if tenants:
+            self.runner = TenantRunner(tenants, test_mode=settings.TEST_MODE, deadline=self.deadline)
+            self.managers = list(self.runner.managers.values())
+        else:
+            self.runner = None
+            self.managers = [ResponseManager(test_mode=settings.TEST_MODE, deadline=self.deadline)]
+        self.scheduler = AsyncScheduler(max_workers=len(self.managers) * 3)
 
-        # Обработчики сигналов
-        signal.signal(signal.SIGINT, self._signal_handler)
-        signal.signal(signal.SIGTERM, self._signal_handler)
-
-    def _signal_handler(self, signum, frame):
+    def _signal_handler(self, signum):
         """Обработчик сигналов завершения"""
         print(f"\n🛑 Получен сигнал {signum}. Завершение работы...")
         self.shutdown = True
+        self.deadline.cancel()
+        self.scheduler.stop()
 
-    def job(self):
-        """Задача для планировщика"""
-        if self.shutdown:
-            return
+    def _review_job(self, manager: ResponseManager):
+        """Задача обработки отзывов одного продавца"""
+        def job() -> int:
+            if self.shutdown:
+                return 0
 
-        try:
-            self.manager.process_new_reviews()
-        except Exception as e:
-            print(f"💥 Ошибка в задании: {e}")
+            try:
+                return manager.process_new_reviews() or 0
+            except Exception as e:
+                print(f"💥 Ошибка в задании: {e}")
+                return 0
+        return job
+
+    @staticmethod
+    def _review_interval(manager: ResponseManager):
+        """Адаптивная пауза до следующей проверки отзывов продавца"""
+        poller = AdaptivePoller(
+            min_interval=settings.POLL_MIN_INTERVAL,
+            max_interval=settings.CHECK_INTERVAL * 60,
+            backoff=settings.POLL_BACKOFF,
+            jitter=settings.POLL_JITTER
+        )
+        tenant_title = f" ({manager.tenant.name})" if manager.tenant else ""
+
+        def next_check(found) -> float:
+            delay = poller.next_interval(found or 0)
+            print(f"⏰ Следующая проверка{tenant_title} через {delay / 60:.1f} мин")
+            return delay
+        return next_check
+
+    @staticmethod
+    def _until_next_day(_result=None) -> float:
+        """Секунды до начала следующего дня (отчет отправляется сразу после полуночи)"""
+        now = datetime.now()
+        tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        return (tomorrow - now).total_seconds() + 60
 
     def run(self):
         """Запускает планировщик"""
         print("🚀 Запуск Wildberries Feedback Bot")
         print(f"🔧 Режим: {'ТЕСТОВЫЙ' if settings.TEST_MODE else 'РАБОЧИЙ'}")
-        print(f"⏰ Проверка каждые {settings.CHECK_INTERVAL} минут")
+        print(f"⏰ Проверка каждые {settings.POLL_MIN_INTERVAL:g} с - {settings.CHECK_INTERVAL} мин "
+              f"(чаще, пока приходят новые отзывы)")
         print("Для остановки нажмите Ctrl+C")
         print("-" * 50)
 
-        # Первый запуск
-        print("🎯 Первоначальный запуск...")
-        self.job()
+        for manager in self.managers:
+            suffix = f":{manager.tenant.name}" if manager.tenant else ""
+            self.scheduler.add_job(f'reviews{suffix}', self._review_job(manager),
+                                   every=self._review_interval(manager))
+            self.scheduler.add_job(f'daily_report{suffix}', manager.rollover_daily_stats,
+                                   every=self._until_next_day, run_immediately=False)
+            self.scheduler.add_job(f'health{suffix}', manager.health_check,
+                                   every=settings.HEALTH_CHECK_INTERVAL, jitter=0.1)
+
+        try:
+            asyncio.run(self._run_async())
+        finally:
+            for manager in self.managers:
+                manager.close()
 
-        # Настройка расписания
-        schedule.every(settings.CHECK_INTERVAL).minutes.do(self.job)
-        print("⏰ Планировщик запущен. Следующая проверка по расписанию.")
+        for name, stats in self.scheduler.stats().items():
+            print(f"📋 {name}: запусков {stats['runs']}, ошибок {stats['failures']}, "
+                  f"пропущено {stats['missed']}")
+        print("👋 Работа бота завершена.")
 
-        # Основной цикл
-        while not self.shutdown:
+    async def _run_async(self):
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
             try:
-                schedule.run_pending()
-                time.sleep(1)
-            except Exception as e:
-                print(f"⚠️ Ошибка в основном цикле: {e}")
-                time.sleep(60)
+                loop.add_signal_handler(signum, self._signal_handler, signum)
+            except NotImplementedError:
+                # Windows: обработчик вызывается вне event loop
+                signal.signal(signum, lambda num, frame: loop.call_soon_threadsafe(self._signal_handler, num))
 
-        print("👋 Работа бота завершена.")
+        print("🎯 Первоначальный запуск...")
+        await self.scheduler.run(shutdown_timeout=settings.SHUTDOWN_TIMEOUT)
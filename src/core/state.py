@@ -0,0 +1,54 @@
+"""
+Снимок состояния бота между одноразовыми запусками (GitHub Actions)
+"""
+
+import gzip
+import json
+import os
+from typing import Optional
+
+STATE_VERSION = 1
+
+class RunState:
+    """Версионированный сжатый снимок состояния
+
+    Файл - gzip с JSON внутри, поле version обязательно. Снимок другой
+    версии или поврежденный файл игнорируются: бот просто стартует
+    с чистого состояния. Запись атомарная (временный файл + os.replace),
+    поэтому прерванный запуск не оставит испорченный снимок.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[dict]:
+        """Загружает снимок, None если его нет или он не подходит"""
+        if not os.path.exists(self.path):
+            return None
+
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Снимок состояния поврежден, игнорируем: {e}")
+            return None
+
+        if data.get('version') != STATE_VERSION:
+            print(f"⚠️ Снимок состояния версии {data.get('version')} не поддерживается, игнорируем")
+            return None
+
+        return data
+
+    def save(self, data: dict):
+        """Атомарно сохраняет снимок"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        payload = dict(data, version=STATE_VERSION)
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=9) as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+        print(f"💾 Состояние сохранено: {os.path.getsize(self.path)} байт")
@@ -0,0 +1,170 @@
+"""
+Несколько продавцов в одном процессе
+"""
+
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from src.ai.generator import AIGenerator
+from src.config.settings import settings
+from src.utils.deadline import Deadline
+from src.utils.telegram_notifier import TelegramNotifier
+from .manager import ResponseManager
+
+class Tenant:
+    """Аккаунт продавца: свой ключ WB и свой каталог состояния"""
+
+    def __init__(self, name: str, api_key: str, supplier_id: str = "", weight: float = 1.0):
+        if not re.fullmatch(r"[\w.-]+", name):
+            raise ValueError(f"Недопустимое имя продавца: {name!r}")
+        # Вес делит число выданных слотов: ноль сломает FairShare, отрицательный даст приоритет
+        if not weight > 0:
+            raise ValueError(f"Вес продавца {name} должен быть больше нуля: {weight!r}")
+        self.name = name
+        self.api_key = api_key
+        self.supplier_id = supplier_id
+        self.weight = weight
+
+    @property
+    def state_dir(self) -> str:
+        return os.path.join(settings.STATE_DIR, 'tenants', self.name)
+
+    @property
+    def database_path(self) -> str:
+        return os.path.join(self.state_dir, 'bot.db')
+
+def load_tenants(path: Optional[str] = None) -> List[Tenant]:
+    """Читает реестр продавцов из JSON
+
+    Формат: [{"name": "shop1", "api_key_env": "SHOP1_WB_API_KEY",
+    "supplier_id": "123", "weight": 1}, ...]. Ключ можно указать прямо
+    (api_key), но лучше брать из переменной окружения (api_key_env).
+    Без файла реестра возвращается пустой список - бот работает с
+    одним продавцом из WB_API_KEY.
+    """
+    path = path or settings.TENANTS_FILE
+    if not path or not os.path.exists(path):
+        return []
+
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+
+    tenants = []
+    for entry in entries:
+        api_key = entry.get('api_key') or os.getenv(entry.get('api_key_env', ''), '')
+        if not api_key:
+            print(f"⚠️ У продавца {entry.get('name')} не задан API ключ, пропускаем")
+            continue
+        tenants.append(Tenant(entry['name'], api_key, str(entry.get('supplier_id', '')),
+                              float(entry.get('weight', 1.0))))
+
+    names = [tenant.name for tenant in tenants]
+    if len(names) != len(set(names)):
+        raise ValueError("Имена продавцов в реестре должны быть уникальными")
+    return tenants
+
+class FairShare:
+    """Честное разделение общих слотов генерации между продавцами
+
+    Свободный слот получает ожидающий продавец с наименьшим виртуальным
+    временем (число полученных слотов, деленное на вес). Продавец,
+    простаивавший какое-то время, начинает с текущего виртуального
+    времени, а не с нуля, - поэтому не может надолго захватить все слоты,
+    а продавец с большим бэклогом не вытесняет остальных.
+    """
+
+    def __init__(self, slots: int):
+        self.slots = max(1, slots)
+        self._free = self.slots
+        self._cond = threading.Condition()
+        self._virtual_time = 0.0
+        self._finish: Dict[str, float] = {}
+        self._waiting: Dict[str, int] = {}
+        self.granted: Dict[str, int] = {}
+
+    @contextmanager
+    def slot(self, tenant: str, weight: float = 1.0):
+        self.acquire(tenant, weight)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, tenant: str, weight: float = 1.0):
+        with self._cond:
+            if not self._waiting.get(tenant):
+                self._finish[tenant] = max(self._finish.get(tenant, 0.0), self._virtual_time)
+            self._waiting[tenant] = self._waiting.get(tenant, 0) + 1
+
+            while not (self._free and self._next_tenant() == tenant):
+                self._cond.wait()
+
+            self._waiting[tenant] -= 1
+            if not self._waiting[tenant]:
+                del self._waiting[tenant]
+            self._free -= 1
+            self._virtual_time = self._finish[tenant]
+            self._finish[tenant] += 1.0 / weight
+            self.granted[tenant] = self.granted.get(tenant, 0) + 1
+            # Следующий в очереди может оказаться другим продавцом
+            self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self._free += 1
+            self._cond.notify_all()
+
+    def _next_tenant(self) -> str:
+        return min(self._waiting, key=lambda name: (self._finish[name], name))
+
+class TenantRunner:
+    """Обработка отзывов всех продавцов в одном процессе
+
+    У каждого продавца свой ResponseManager: клиент WB с собственным
+    лимитом запросов, курсор, outbox, история и статистика. AI генератор,
+    HTTP пул и Telegram общие. Продавцы обрабатываются параллельно, а
+    слоты генерации делятся через FairShare.
+    """
+
+    def __init__(self, tenants: List[Tenant], test_mode: bool = False,
+                 snapshot: Optional[dict] = None, deadline: Optional[Deadline] = None):
+        snapshot = snapshot or {}
+        tenant_snapshots = snapshot.get('tenants', {})
+        self.tenants = tenants
+        self.deadline = deadline or Deadline()
+        self.ai_generator = AIGenerator(test_mode=test_mode, provider_state=snapshot.get('provider'),
+                                        deadline=self.deadline)
+        self.telegram = TelegramNotifier()
+        self.fair_share = FairShare(settings.GENERATION_WORKERS)
+        self.managers = {
+            tenant.name: ResponseManager(test_mode=test_mode, snapshot=tenant_snapshots.get(tenant.name),
+                                         deadline=self.deadline, tenant=tenant,
+                                         ai_generator=self.ai_generator, telegram=self.telegram,
+                                         fair_share=self.fair_share)
+            for tenant in tenants
+        }
+
+    def process_all(self) -> Dict[str, int]:
+        """Один цикл обработки для всех продавцов"""
+        with ThreadPoolExecutor(max_workers=len(self.managers),
+                                thread_name_prefix="tenant") as executor:
+            futures = {name: executor.submit(manager.process_new_reviews)
+                       for name, manager in self.managers.items()}
+            found = {name: future.result() or 0 for name, future in futures.items()}
+
+        print(f"🏪 Слоты генерации по продавцам: {self.fair_share.granted}")
+        return found
+
+    def export_state(self) -> dict:
+        return {
+            'tenants': {name: manager.export_state() for name, manager in self.managers.items()},
+            'provider': self.ai_generator.provider_state()
+        }
+
+    def close(self):
+        for manager in self.managers.values():
+            manager.close()
@@ -0,0 +1,183 @@
+"""
+Обработка отзывов через очередь задач: один выборщик, много воркеров
+"""
+
+import random
+import threading
+from typing import Optional
+from src.api.models import WBReview
+from src.config.settings import settings
+from src.storage.work_queue import WorkQueue
+from .manager import ResponseManager
+
+class ReviewProducer:
+    """Выбирает новые отзывы из WB и ставит их в очередь задач
+
+    Выборщик должен быть один: он владеет курсором синхронизации. Курсор
+    сдвигается сразу после постановки в очередь - задачи в очереди
+    долговечны, и упавший воркер их не потеряет.
+    """
+
+    def __init__(self, manager: ResponseManager, queue: WorkQueue):
+        self.manager = manager
+        self.queue = queue
+
+    def run_once(self) -> int:
+        """Один проход по бэклогу, возвращает число поставленных задач"""
+        manager = self.manager
+        if not manager.test_mode and manager.sync_cursor.is_fresh:
+            if not manager.wb_client.has_unseen_feedbacks():
+                print("📭 Новых отзывов нет, выборка пропущена.")
+                return 0
+
+        # Задачи, исчерпавшие попытки, ставим заново, если отзыв все еще без ответа
+        for job_id in self.queue.dead_ids():
+            manager.processor.processed_ids.discard(job_id)
+
+        queued = 0
+        newest_seen = None
+        date_from = None if manager.test_mode else manager.sync_cursor.date_from
+        if not manager.test_mode and not manager.sync_cursor.is_fresh:
+            print("🔄 Курсор синхронизации устарел, запрашиваем все неотвеченные отзывы")
+            date_from = None
+
+        for page in manager.wb_client.iter_unanswered_pages(date_from=date_from):
+            if manager.deadline.expired:
+                print("⏰ Время запуска на исходе, выборка остановлена")
+                return queued
+
+            manager.store.save_reviews(page)
+            newest = max((review.created_ts for review in page), default=0)
+            if newest:
+                newest_seen = max(newest_seen or 0, newest)
+
+            for review in manager.processor.select_reviews(page):
+                if self.queue.put(review.id, review.to_dict()):
+                    queued += 1
+                # Повторно отзыв выберем только если воркер так и не справился
+                manager.processor.processed_ids.add(review.id)
+
+        if not manager.test_mode:
+            # Курсор не уходит дальше отзывов, ответ на которые еще не готов:
+            # если их задачи умрут, следующая выборка найдет их снова
+            open_ts = [WBReview(payload).created_ts for payload in self.queue.in_flight()]
+            oldest_open = min((created_ts for created_ts in open_ts if created_ts), default=None)
+            if oldest_open is not None and newest_seen is not None:
+                newest_seen = min(newest_seen, oldest_open)
+            manager.sync_cursor.advance(newest_seen)
+            manager.sync_cursor.save()
+
+        print(f"📥 В очередь поставлено {queued} отзывов, в очереди: {self.queue.stats()}")
+        return queued
+
+class ReviewWorker:
+    """Забирает отзывы из очереди, генерирует и отправляет ответы
+
+    Задача подтверждается (ack), когда ответ сохранен в outbox воркера:
+    дальше его доставку доводит dispatcher. Если воркер упал раньше,
+    через visibility_timeout задачу заберет другой воркер; на повторной
+    попытке сначала проверяем в WB, не отвечен ли уже отзыв. Неудачная
+    генерация возвращает задачу в очередь с экспоненциальной паузой.
+    Отзыв берется в работу через аренды менеджера, как в обычном запуске
+    бота, поэтому воркеры и main.py не ответят на один отзыв дважды.
+    """
+
+    def __init__(self, manager: ResponseManager, queue: WorkQueue,
+                 visibility_timeout: float = 120.0, retry_base: float = 30.0):
+        self.manager = manager
+        self.queue = queue
+        self.visibility_timeout = visibility_timeout
+        self.retry_base = retry_base
+        self.stats = {'done': 0, 'sent': 0, 'retried': 0, 'postponed': 0, 'lost': 0}
+        self._lock = threading.Lock()
+
+    def run(self, stop: Optional[threading.Event] = None, once: bool = False,
+            idle_sleep: float = 5.0) -> dict:
+        """Обрабатывает задачи до stop (или до пустой очереди при once)"""
+        stop = stop or threading.Event()
+        while not stop.is_set() and not self.manager.deadline.expired:
+            if self.run_once():
+                continue
+            if once:
+                break
+            stop.wait(idle_sleep)
+        return self.stats
+
+    def run_once(self) -> bool:
+        """Обрабатывает одну задачу, False если очередь пуста"""
+        job = self.queue.claim(self.visibility_timeout)
+        if job is None:
+            return False
+
+        review = WBReview(job['payload'])
+        try:
+            self._process(review, job)
+        except Exception as e:
+            print(f"❌ Ошибка обработки отзыва {review.id}: {e}")
+            self.manager.release_lease(review)
+            self._retry(job, str(e))
+        return True
+
+    def _process(self, review: WBReview, job: dict):
+        manager = self.manager
+
+        if job['attempts'] > 1 and self._already_handled(review):
+            print(f"⏭️ Отзыв {review.id} уже обработан, задача закрыта")
+            self._ack(job)
+            return
+
+        # Отзыв обрабатывает другой экземпляр - вернемся к нему, когда его аренда истечет.
+        # Ожидание аренды - не ошибка, попытку не тратим
+        if not manager.acquire_lease(review):
+            self.queue.postpone(job['job_id'], job['receipt'], settings.LEASE_TTL)
+            with self._lock:
+                self.stats['postponed'] += 1
+            return
+
+        result = manager.processor.process_review(review)
+        if not result["success"]:
+            manager.release_lease(review)
+            self._retry(job, "не удалось сгенерировать ответ")
+            return
+
+        manager.store.save_reply(review.id, result["reply"], manager.ai_generator.provider_name)
+        if manager.test_mode:
+            self._ack(job)
+            return
+
+        # Если аренду уже забрал другой экземпляр, в WB уйдет его ответ
+        queued = manager.queue_reply(review, result["reply"])
+        self._ack(job)
+        if not queued:
+            return
+
+        # Ответ уже в outbox - не отправленный сейчас дошлет drain
+        item = manager.outbox.claim(review.id)
+        if item is not None and manager.dispatcher.send(item):
+            manager.dispatcher.notify(item)
+            print(f"✅ Ответ отправлен для отзыва {review.id}")
+            with self._lock:
+                self.stats['sent'] += 1
+
+    def _already_handled(self, review: WBReview) -> bool:
+        """Повторная попытка: ответ мог остаться в outbox или уже дойти до WB"""
+        manager = self.manager
+        if manager.outbox and manager.outbox.contains(review.id):
+            return True
+        return bool(manager.wb_client.is_review_answered(review.id))
+
+    def _ack(self, job: dict):
+        with self._lock:
+            if self.queue.ack(job['job_id'], job['receipt']):
+                self.stats['done'] += 1
+            else:
+                # Таймаут видимости истек, и задачу уже забрал другой воркер
+                self.stats['lost'] += 1
+                print(f"⚠️ Задача {job['job_id']} уже передана другому воркеру")
+
+    def _retry(self, job: dict, error: str):
+        delay = self.retry_base * (2 ** (job['attempts'] - 1)) * random.uniform(0.8, 1.2)
+        self.queue.nack(job['job_id'], job['receipt'], delay=delay, error=error)
+        with self._lock:
+            self.stats['retried'] += 1
+        print(f"🔁 Отзыв {job['job_id']} вернется в очередь через {delay:.0f} с")
@@ -0,0 +1 @@
+"""Module package"""
\ No newline at end of file
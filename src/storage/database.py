@@ -0,0 +1,197 @@
+"""
+Локальное хранилище отзывов, ответов и истории запусков (SQLite)
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+from src.api.models import WBReview
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    id TEXT PRIMARY KEY,
+    created_ts INTEGER NOT NULL,
+    rating INTEGER NOT NULL,
+    nm_id INTEGER,
+    product_name TEXT,
+    user_name TEXT,
+    text TEXT,
+    pros TEXT,
+    cons TEXT,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reviews_created ON reviews (created_ts);
+CREATE INDEX IF NOT EXISTS idx_reviews_rating ON reviews (rating);
+
+CREATE TABLE IF NOT EXISTS replies (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    review_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    provider TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_replies_review ON replies (review_id);
+
+CREATE TABLE IF NOT EXISTS post_attempts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    review_id TEXT NOT NULL,
+    attempted_at REAL NOT NULL,
+    success INTEGER NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_post_attempts_review ON post_attempts (review_id, success);
+
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    test_mode INTEGER NOT NULL,
+    reviews_fetched INTEGER NOT NULL,
+    replies_generated INTEGER NOT NULL,
+    replies_sent INTEGER NOT NULL,
+    errors INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs (started_at);
+"""
+
+_STOP = object()
+
+class ReviewStore:
+    """Хранилище в SQLite (режим WAL)
+
+    Запись идет через очередь: методы save_*/record_* только кладут
+    операцию в очередь и сразу возвращаются, а фоновый поток пишет
+    накопленные операции пачками, одной транзакцией на пачку. Чтение
+    выполняется из вызывающего потока через отдельное соединение - WAL
+    позволяет читать параллельно с записью. flush() дожидается, пока все
+    поставленные в очередь операции будут записаны.
+    """
+
+    def __init__(self, path: str, enabled: bool = True, batch_size: int = 500):
+        self.path = path
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self._queue: "queue.Queue" = queue.Queue()
+        self._local = threading.local()
+        self._writer: Optional[threading.Thread] = None
+
+        if not self.enabled:
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+
+        self._writer = threading.Thread(target=self._writer_loop, name="review-store-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """Соединение для чтения, отдельное на каждый поток"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _enqueue(self, sql: str, rows: List[Tuple]):
+        if self.enabled and rows:
+            self._queue.put((sql, rows))
+
+    def _writer_loop(self):
+        """Фоновый поток: пишет операции из очереди пачками"""
+        conn = self._connect()
+
+        while True:
+            item = self._queue.get()
+            batch = [item]
+
+            # Забираем все, что уже накопилось, не дожидаясь новых операций
+            while item is not _STOP and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+
+            operations = [op for op in batch if op is not _STOP]
+            try:
+                with conn:
+                    for sql, rows in operations:
+                        conn.executemany(sql, rows)
+            except sqlite3.Error as e:
+                print(f"❌ Ошибка записи в базу: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if len(operations) != len(batch):
+                conn.close()
+                return
+
+    def save_reviews(self, reviews: Iterable[WBReview]):
+        """Сохраняет (или обновляет) отзывы"""
+        now = time.time()
+        self._enqueue(
+            "INSERT OR REPLACE INTO reviews VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(r.id, r.created_ts, r.rating or 0, r.nm_id, r.product_name, r.user_name,
+              r.text, r.pros, r.cons, now) for r in reviews]
+        )
+
+    def save_reply(self, review_id: str, text: str, provider: str = ""):
+        """Сохраняет сгенерированный ответ"""
+        self._enqueue(
+            "INSERT INTO replies (review_id, text, provider, created_at) VALUES (?, ?, ?, ?)",
+            [(review_id, text, provider, time.time())]
+        )
+
+    def record_post_attempt(self, review_id: str, success: bool, error: str = ""):
+        """Сохраняет попытку отправки ответа в WB"""
+        self._enqueue(
+            "INSERT INTO post_attempts (review_id, attempted_at, success, error) VALUES (?, ?, ?, ?)",
+            [(review_id, time.time(), int(success), error)]
+        )
+
+    def record_run(self, started_at: float, test_mode: bool, reviews_fetched: int,
+                   replies_generated: int, replies_sent: int, errors: int):
+        """Сохраняет метрики одного цикла обработки"""
+        self._enqueue(
+            "INSERT INTO runs (started_at, finished_at, test_mode, reviews_fetched, "
+            "replies_generated, replies_sent, errors) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(started_at, time.time(), int(test_mode), reviews_fetched,
+              replies_generated, replies_sent, errors)]
+        )
+
+    def is_replied(self, review_id: str) -> bool:
+        """Был ли ответ на отзыв успешно отправлен"""
+        if not self.enabled:
+            return False
+
+        row = self._reader().execute(
+            "SELECT 1 FROM post_attempts WHERE review_id = ? AND success = 1 LIMIT 1",
+            (review_id,)
+        ).fetchone()
+        return row is not None
+
+    def flush(self):
+        """Ждет, пока фоновый поток запишет все операции из очереди"""
+        if self.enabled:
+            self._queue.join()
+
+    def close(self):
+        """Записывает остаток очереди и останавливает фоновый поток"""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        self._writer = None
@@ -0,0 +1,181 @@
+"""
+Аренды (leases): отзыв или разовая задача за одним экземпляром бота
+"""
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional
+from urllib.parse import urlparse
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT,
+    token INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+def default_owner() -> str:
+    """Имя экземпляра: хост, процесс и случайный суффикс"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+class LeaseStore:
+    """Интерфейс хранилища аренд
+
+    acquire выдает аренду ресурса на ttl секунд и возвращает токен
+    ограждения (fencing token) - число, которое растет с каждой новой
+    выдачей этого ресурса. Перед необратимым действием (отправкой ответа)
+    владелец продлевает аренду с этим токеном: если аренда истекла и ее
+    уже получил другой экземпляр, токен устарел, и действие отменяется.
+    """
+
+    def __init__(self, owner: Optional[str] = None):
+        self.owner = owner or default_owner()
+
+    def acquire(self, name: str, ttl: float) -> Optional[int]:
+        """Токен аренды или None, если ресурс занят другим экземпляром"""
+        raise NotImplementedError
+
+    def renew(self, name: str, token: int, ttl: float) -> bool:
+        """Продлевает аренду, False если токен устарел"""
+        raise NotImplementedError
+
+    def release(self, name: str, token: int) -> bool:
+        """Освобождает аренду досрочно"""
+        raise NotImplementedError
+
+    def leader(self, name: str, ttl: float) -> bool:
+        """Лидерство в разовой задаче: получить или продлить аренду"""
+        raise NotImplementedError
+
+class SQLiteLeaseStore(LeaseStore):
+    """Аренды в SQLite - для экземпляров на одном хосте"""
+
+    def __init__(self, path: str, owner: Optional[str] = None):
+        super().__init__(owner)
+        self.path = path
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """Соединение в режиме autocommit, отдельное на каждый поток"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, name: str, ttl: float) -> Optional[int]:
+        conn = self._conn()
+        now = time.time()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT * FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row['owner'] and row['expires_at'] > now:
+                conn.execute("COMMIT")
+                return None
+
+            # Запись не удаляется при освобождении - токен ресурса только растет
+            token = (row['token'] if row is not None else 0) + 1
+            conn.execute(
+                "INSERT OR REPLACE INTO leases (name, owner, token, expires_at) VALUES (?, ?, ?, ?)",
+                (name, self.owner, token, now + ttl)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return token
+
+    def renew(self, name: str, token: int, ttl: float) -> bool:
+        now = time.time()
+        cursor = self._conn().execute(
+            "UPDATE leases SET expires_at = ? WHERE name = ? AND owner = ? AND token = ? AND expires_at > ?",
+            (now + ttl, name, self.owner, token, now)
+        )
+        return cursor.rowcount == 1
+
+    def release(self, name: str, token: int) -> bool:
+        cursor = self._conn().execute(
+            "UPDATE leases SET owner = NULL, expires_at = 0 WHERE name = ? AND owner = ? AND token = ?",
+            (name, self.owner, token)
+        )
+        return cursor.rowcount == 1
+
+    def leader(self, name: str, ttl: float) -> bool:
+        conn = self._conn()
+        row = conn.execute("SELECT * FROM leases WHERE name = ?", (name,)).fetchone()
+        if row is not None and row['owner'] == self.owner and self.renew(name, row['token'], ttl):
+            return True
+        return self.acquire(name, ttl) is not None
+
+class RedisLeaseStore(LeaseStore):
+    """Аренды в Redis - для экземпляров на нескольких хостах"""
+
+    def __init__(self, client, prefix: str = 'wbbot:lease', owner: Optional[str] = None):
+        super().__init__(owner)
+        self.client = client
+        self.prefix = prefix
+
+    def _keys(self, name: str):
+        return f"{self.prefix}:{name}", f"{self.prefix}:fence:{name}"
+
+    def acquire(self, name: str, ttl: float) -> Optional[int]:
+        key, fence_key = self._keys(name)
+        token = self.client.execute('INCR', fence_key)
+        # Токен тратится и при неудаче - он обязан только расти
+        if self.client.execute('SET', key, f"{self.owner}|{token}", 'NX', 'PX', int(ttl * 1000)) is None:
+            return None
+        return token
+
+    def renew(self, name: str, token: int, ttl: float) -> bool:
+        key, _ = self._keys(name)
+        self.client.execute('WATCH', key)
+        if self.client.execute('GET', key) != f"{self.owner}|{token}":
+            self.client.execute('UNWATCH')
+            return False
+        return self.client.transaction(('PEXPIRE', key, int(ttl * 1000))) is not None
+
+    def release(self, name: str, token: int) -> bool:
+        key, _ = self._keys(name)
+        self.client.execute('WATCH', key)
+        if self.client.execute('GET', key) != f"{self.owner}|{token}":
+            self.client.execute('UNWATCH')
+            return False
+        return self.client.transaction(('DEL', key)) is not None
+
+    def leader(self, name: str, ttl: float) -> bool:
+        key, _ = self._keys(name)
+        value = self.client.execute('GET', key)
+        if value and value.rsplit('|', 1)[0] == self.owner:
+            if self.renew(name, int(value.rsplit('|', 1)[1]), ttl):
+                return True
+        return self.acquire(name, ttl) is not None
+
+def create_lease_store(url: str, owner: Optional[str] = None) -> LeaseStore:
+    """Хранилище аренд по адресу: sqlite:///data/leases.db или redis://host:6379/0"""
+    parsed = urlparse(url)
+
+    if parsed.scheme == "sqlite":
+        return SQLiteLeaseStore(parsed.path[1:], owner=owner)
+
+    if parsed.scheme == "redis":
+        from .redis_queue import RESPClient
+        client = RESPClient(parsed.hostname or 'localhost', parsed.port or 6379,
+                            db=int(parsed.path.lstrip('/') or 0), password=parsed.password)
+        return RedisLeaseStore(client, owner=owner)
+
+    raise ValueError(f"Неизвестный тип хранилища аренд: {url}")
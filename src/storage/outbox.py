@@ -0,0 +1,239 @@
+"""
+Надежная очередь ответов на отправку (outbox)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+from src.api.models import WBReview
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    review_id TEXT PRIMARY KEY,
+    reply TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    user_name TEXT,
+    rating INTEGER,
+    product_name TEXT,
+    review_text TEXT,
+    review_created_ts INTEGER,
+    lease_token INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+"""
+
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+class ReplyOutbox:
+    """Очередь сгенерированных ответов, переживающая перезапуск бота
+
+    Ответ сначала синхронно записывается в SQLite (status=pending) и только
+    потом отправляется. Перед отправкой запись переводится в sending с
+    увеличением attempts - так после падения процесса видно, какие ответы
+    могли уйти в WB, но не были подтверждены. Ключ - ID отзыва, поэтому
+    один отзыв не может попасть в очередь дважды; только окончательно
+    неотправленный (failed) ответ заменяется новым. Вместе с ответом
+    хранится токен аренды отзыва (lease_token): dispatcher продлевает
+    аренду этим токеном перед каждой попыткой отправки.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 5):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn().executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Добавляет колонки, которых нет в outbox, созданном прошлой версией бота"""
+        conn = self._conn()
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(outbox)")}
+        for column in ('review_created_ts', 'lease_token'):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE outbox ADD COLUMN {column} INTEGER")
+
+    def _conn(self) -> sqlite3.Connection:
+        """Соединение в режиме autocommit, отдельное на каждый поток"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, review: WBReview, reply: str, lease_token: Optional[int] = None) -> bool:
+        """Ставит ответ в очередь, False если ответ на этот отзыв уже ждет отправки или отправлен"""
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT INTO outbox (review_id, reply, status, attempts, next_attempt_at, "
+            "user_name, rating, product_name, review_text, review_created_ts, lease_token, "
+            "created_at, updated_at) "
+            "VALUES (?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (review_id) DO UPDATE SET reply = excluded.reply, status = excluded.status, "
+            "attempts = 0, next_attempt_at = excluded.next_attempt_at, last_error = NULL, "
+            "lease_token = excluded.lease_token, updated_at = excluded.updated_at "
+            "WHERE outbox.status = ?",
+            (review.id, reply, STATUS_PENDING, now, review.user_name, review.rating,
+             review.product_name, review.review_text, review.created_ts or None, lease_token,
+             now, now, STATUS_FAILED)
+        )
+        return cursor.rowcount == 1
+
+    def contains(self, review_id: str) -> bool:
+        """Есть ли на отзыв ответ, который ждет отправки или уже отправлен
+
+        Окончательно неотправленный (failed) ответ не считается: такой отзыв
+        нужно обработать снова.
+        """
+        row = self._conn().execute(
+            "SELECT 1 FROM outbox WHERE review_id = ? AND status != ?", (review_id, STATUS_FAILED)
+        ).fetchone()
+        return row is not None
+
+    def recover(self) -> int:
+        """Возвращает в очередь ответы, зависшие в sending после падения процесса"""
+        cursor = self._conn().execute(
+            "UPDATE outbox SET status = ?, updated_at = ? WHERE status = ?",
+            (STATUS_PENDING, time.time(), STATUS_SENDING)
+        )
+        return cursor.rowcount
+
+    def claim_due(self, limit: int = 100) -> List[dict]:
+        """Забирает готовые к отправке ответы, переводя их в sending"""
+        conn = self._conn()
+        now = time.time()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT * FROM outbox WHERE status = ? AND next_attempt_at <= ? "
+                "ORDER BY created_at LIMIT ?",
+                (STATUS_PENDING, now, limit)
+            ).fetchall()
+
+            conn.executemany(
+                "UPDATE outbox SET status = ?, attempts = attempts + 1, updated_at = ? WHERE review_id = ?",
+                [(STATUS_SENDING, now, row['review_id']) for row in rows]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        items = []
+        for row in rows:
+            item = dict(row)
+            item['attempts'] += 1
+            items.append(item)
+        return items
+
+    def claim(self, review_id: str) -> Optional[dict]:
+        """Забирает на отправку конкретный ответ, если он готов к отправке"""
+        now = time.time()
+        cursor = self._conn().execute(
+            "UPDATE outbox SET status = ?, attempts = attempts + 1, updated_at = ? "
+            "WHERE review_id = ? AND status = ? AND next_attempt_at <= ?",
+            (STATUS_SENDING, now, review_id, STATUS_PENDING, now)
+        )
+        if cursor.rowcount != 1:
+            return None
+
+        row = self._conn().execute(
+            "SELECT * FROM outbox WHERE review_id = ?", (review_id,)
+        ).fetchone()
+        return dict(row)
+
+    def release(self, review_id: str, delay: float = 0.0):
+        """Возвращает забранный ответ в очередь не раньше чем через delay секунд, не засчитывая попытку"""
+        now = time.time()
+        self._conn().execute(
+            "UPDATE outbox SET status = ?, attempts = MAX(attempts - 1, 0), next_attempt_at = ?, "
+            "updated_at = ? WHERE review_id = ? AND status = ?",
+            (STATUS_PENDING, now + delay, now, review_id, STATUS_SENDING)
+        )
+
+    def set_lease_token(self, review_id: str, lease_token: Optional[int]):
+        """Запоминает новый токен аренды отзыва"""
+        self._conn().execute(
+            "UPDATE outbox SET lease_token = ?, updated_at = ? WHERE review_id = ?",
+            (lease_token, time.time(), review_id)
+        )
+
+    def mark_sent(self, review_id: str):
+        """Ответ подтвержден WB"""
+        self._conn().execute(
+            "UPDATE outbox SET status = ?, last_error = NULL, updated_at = ? WHERE review_id = ?",
+            (STATUS_SENT, time.time(), review_id)
+        )
+
+    def mark_failed(self, review_id: str, attempts: int, error: str, retry_delay: float) -> str:
+        """Неудачная отправка: планирует повтор или окончательно помечает failed"""
+        status = STATUS_FAILED if attempts >= self.max_attempts else STATUS_PENDING
+        now = time.time()
+        self._conn().execute(
+            "UPDATE outbox SET status = ?, last_error = ?, next_attempt_at = ?, updated_at = ? "
+            "WHERE review_id = ?",
+            (status, error, now + retry_delay, now, review_id)
+        )
+        return status
+
+    def export_pending(self) -> List[dict]:
+        """Неотправленные ответы (для снимка состояния)"""
+        rows = self._conn().execute(
+            "SELECT * FROM outbox WHERE status IN (?, ?)", (STATUS_PENDING, STATUS_SENDING)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def import_pending(self, items: List[dict]) -> int:
+        """Восстанавливает неотправленные ответы из снимка, существующие не трогает"""
+        columns = ("review_id", "reply", "status", "attempts", "next_attempt_at", "last_error",
+                   "user_name", "rating", "product_name", "review_text", "review_created_ts", "lease_token",
+                   "created_at", "updated_at")
+        rows = []
+        for item in items:
+            row = dict(item)
+            # Ответ мог уйти перед завершением прошлого запуска - проверим перед отправкой
+            row['status'] = STATUS_PENDING
+            rows.append(tuple(row.get(column) for column in columns))
+
+        conn = self._conn()
+        before = conn.total_changes
+        conn.executemany(
+            f"INSERT OR IGNORE INTO outbox ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})",
+            rows
+        )
+        return conn.total_changes - before
+
+    def pending_count(self) -> int:
+        """Сколько ответов ждут отправки"""
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM outbox WHERE status IN (?, ?)", (STATUS_PENDING, STATUS_SENDING)
+        ).fetchone()
+        return row[0]
+
+    def next_due_in(self) -> Optional[float]:
+        """Через сколько секунд наступит ближайшая повторная отправка"""
+        row = self._conn().execute(
+            "SELECT MIN(next_attempt_at) FROM outbox WHERE status = ?", (STATUS_PENDING,)
+        ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
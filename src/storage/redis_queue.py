@@ -0,0 +1,295 @@
+"""
+Очередь задач в Redis (или любом сервере с протоколом RESP)
+"""
+
+import json
+import socket
+import threading
+import time
+import uuid
+from typing import List, Optional
+from .work_queue import WorkQueue
+
+# Сколько раз повторять транзакцию, прерванную конкурентным изменением (WATCH)
+MAX_TRANSACTION_RETRIES = 20
+
+class RESPError(Exception):
+    """Ошибка, которую вернул сервер"""
+
+class RESPClient:
+    """Минимальный клиент протокола Redis (RESP2) без внешних зависимостей
+
+    Соединение отдельное на каждый поток: WATCH/MULTI/EXEC - состояние
+    соединения, и транзакции разных потоков не должны смешиваться.
+    """
+
+    def __init__(self, host: str = 'localhost', port: int = 6379, db: int = 0,
+                 password: Optional[str] = None, timeout: float = 10.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            conn = (sock, sock.makefile('rb'))
+            self._local.conn = conn
+            if self.password:
+                self.execute('AUTH', self.password)
+            if self.db:
+                self.execute('SELECT', self.db)
+        return conn
+
+    def execute(self, *args):
+        """Выполняет команду и возвращает разобранный ответ"""
+        sock, reader = self._connection()
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            parts.append(f"${len(data)}\r\n".encode())
+            parts.append(data + b"\r\n")
+
+        try:
+            sock.sendall(b"".join(parts))
+            return self._read_reply(reader)
+        except (OSError, ConnectionError, ValueError):
+            self.close()
+            raise
+
+    def _read_reply(self, reader):
+        """Читает ответ сервера целиком
+
+        Ошибка внутри массива (например, в результате EXEC) пробрасывается
+        только после чтения всего массива: иначе остаток ответа достался бы
+        следующей команде этого соединения.
+        """
+        reply = self._read_value(reader)
+        error = self._first_error(reply)
+        if error is not None:
+            raise error
+        return reply
+
+    def _read_value(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Соединение с сервером очереди закрыто")
+
+        kind, body = line[:1], line[1:-2]
+        if kind == b'+':
+            return body.decode('utf-8')
+        if kind == b'-':
+            return RESPError(body.decode('utf-8'))
+        if kind == b':':
+            return int(body)
+        if kind == b'$':
+            length = int(body)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2].decode('utf-8')
+        if kind == b'*':
+            count = int(body)
+            if count < 0:
+                return None
+            return [self._read_value(reader) for _ in range(count)]
+        # Поток ответов рассинхронизирован - соединение закроет execute
+        raise ConnectionError(f"Неизвестный ответ сервера: {line!r}")
+
+    @classmethod
+    def _first_error(cls, reply) -> Optional[RESPError]:
+        if isinstance(reply, RESPError):
+            return reply
+        if isinstance(reply, list):
+            for item in reply:
+                error = cls._first_error(item)
+                if error is not None:
+                    return error
+        return None
+
+    def transaction(self, *commands) -> Optional[list]:
+        """MULTI/EXEC; None если транзакция прервана из-за WATCH"""
+        self.execute('MULTI')
+        try:
+            for command in commands:
+                self.execute(*command)
+        except RESPError:
+            self.execute('DISCARD')
+            raise
+        return self.execute('EXEC')
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            sock, reader = conn
+            reader.close()
+            sock.close()
+            self._local.conn = None
+
+class RedisWorkQueue(WorkQueue):
+    """Очередь в Redis - для воркеров на нескольких хостах
+
+    Ожидающие задачи лежат в sorted set pending (score - момент, когда
+    задача станет видимой), забранные - в inflight (score - окончание
+    таймаута видимости). Все переходы выполняются транзакциями с WATCH,
+    поэтому одну задачу не заберут два воркера одновременно.
+    """
+
+    def __init__(self, client: RESPClient, prefix: str = 'wbbot:queue',
+                 max_attempts: int = 5, done_ttl: float = 72 * 3600):
+        self.client = client
+        self.max_attempts = max_attempts
+        self.done_ttl = int(done_ttl)
+        self.pending = f"{prefix}:pending"
+        self.inflight = f"{prefix}:inflight"
+        self.jobs = f"{prefix}:jobs"
+        self.receipt_prefix = f"{prefix}:receipt:"
+        self.attempts = f"{prefix}:attempts"
+        self.dead = f"{prefix}:dead"
+        self.done_prefix = f"{prefix}:done:"
+
+    def put(self, job_id: str, payload: dict) -> bool:
+        data = json.dumps(payload, ensure_ascii=False)
+        for _ in range(MAX_TRANSACTION_RETRIES):
+            self.client.execute('WATCH', self.jobs, self.done_prefix + job_id)
+            if (self.client.execute('HEXISTS', self.jobs, job_id)
+                    or self.client.execute('EXISTS', self.done_prefix + job_id)):
+                self.client.execute('UNWATCH')
+                return False
+
+            # Задача из dead ставится заново
+            result = self.client.transaction(
+                ('HSET', self.jobs, job_id, data),
+                ('ZADD', self.pending, time.time(), job_id),
+                ('HDEL', self.dead, job_id)
+            )
+            if result is not None:
+                return True
+        raise RESPError("Не удалось поставить задачу: слишком много конкурентных изменений")
+
+    def claim(self, visibility_timeout: float) -> Optional[dict]:
+        for _ in range(MAX_TRANSACTION_RETRIES):
+            now = time.time()
+            self.client.execute('WATCH', self.pending)
+            ids = self.client.execute('ZRANGEBYSCORE', self.pending, '-inf', now, 'LIMIT', 0, 1)
+            if not ids:
+                self.client.execute('UNWATCH')
+                # Очередь пуста - может, есть задачи упавших воркеров
+                if self.requeue_expired():
+                    continue
+                return None
+
+            job_id = ids[0]
+            receipt = uuid.uuid4().hex
+            result = self.client.transaction(
+                ('ZREM', self.pending, job_id),
+                ('ZADD', self.inflight, now + visibility_timeout, job_id),
+                ('SET', self.receipt_prefix + job_id, receipt),
+                ('HINCRBY', self.attempts, job_id, 1),
+                ('HGET', self.jobs, job_id)
+            )
+            if result is None:
+                continue
+
+            attempts, payload = result[3], result[4]
+            if payload is None or attempts > self.max_attempts:
+                self._bury(job_id, "visibility timeout" if payload else "payload missing")
+                continue
+
+            return {'job_id': job_id, 'payload': json.loads(payload),
+                    'attempts': attempts, 'receipt': receipt}
+        return None
+
+    def ack(self, job_id: str, receipt: str) -> bool:
+        return self._finish(job_id, receipt, [
+            ('HDEL', self.jobs, job_id),
+            ('HDEL', self.attempts, job_id),
+            ('SET', self.done_prefix + job_id, 1, 'EX', self.done_ttl)
+        ])
+
+    def nack(self, job_id: str, receipt: str, delay: float = 0.0, error: str = "") -> bool:
+        attempts = int(self.client.execute('HGET', self.attempts, job_id) or 0)
+        if attempts >= self.max_attempts:
+            commands = [
+                ('HSET', self.dead, job_id, error or "max attempts"),
+                ('HDEL', self.jobs, job_id),
+                ('HDEL', self.attempts, job_id)
+            ]
+        else:
+            commands = [('ZADD', self.pending, time.time() + delay, job_id)]
+        return self._finish(job_id, receipt, commands)
+
+    def postpone(self, job_id: str, receipt: str, delay: float) -> bool:
+        return self._finish(job_id, receipt, [
+            ('ZADD', self.pending, time.time() + delay, job_id),
+            ('HINCRBY', self.attempts, job_id, -1)
+        ])
+
+    def _finish(self, job_id: str, receipt: str, commands: List[tuple]) -> bool:
+        """Снимает задачу с inflight, если квитанция еще действительна"""
+        receipt_key = self.receipt_prefix + job_id
+        for _ in range(MAX_TRANSACTION_RETRIES):
+            self.client.execute('WATCH', receipt_key)
+            if self.client.execute('GET', receipt_key) != receipt:
+                self.client.execute('UNWATCH')
+                return False
+
+            result = self.client.transaction(
+                ('ZREM', self.inflight, job_id),
+                ('DEL', receipt_key),
+                *commands
+            )
+            if result is not None:
+                return True
+        raise RESPError("Не удалось завершить задачу: слишком много конкурентных изменений")
+
+    def _bury(self, job_id: str, error: str):
+        self.client.transaction(
+            ('ZREM', self.inflight, job_id),
+            ('DEL', self.receipt_prefix + job_id),
+            ('HDEL', self.jobs, job_id),
+            ('HDEL', self.attempts, job_id),
+            ('HSET', self.dead, job_id, error)
+        )
+
+    def requeue_expired(self) -> int:
+        for _ in range(MAX_TRANSACTION_RETRIES):
+            now = time.time()
+            self.client.execute('WATCH', self.inflight)
+            ids = self.client.execute('ZRANGEBYSCORE', self.inflight, '-inf', now, 'LIMIT', 0, 100)
+            if not ids:
+                self.client.execute('UNWATCH')
+                return 0
+
+            scores = []
+            for job_id in ids:
+                scores += [now, job_id]
+            result = self.client.transaction(
+                ('ZREM', self.inflight, *ids),
+                ('DEL', *[self.receipt_prefix + job_id for job_id in ids]),
+                ('ZADD', self.pending, *scores)
+            )
+            if result is not None:
+                return len(ids)
+        return 0
+
+    def in_flight(self) -> List[dict]:
+        ids = (self.client.execute('ZRANGEBYSCORE', self.pending, '-inf', '+inf')
+               + self.client.execute('ZRANGEBYSCORE', self.inflight, '-inf', '+inf'))
+        if not ids:
+            return []
+        payloads = self.client.execute('HMGET', self.jobs, *ids)
+        return [json.loads(payload) for payload in payloads if payload is not None]
+
+    def dead_ids(self) -> List[str]:
+        return self.client.execute('HKEYS', self.dead)
+
+    def stats(self) -> dict:
+        return {
+            'ready': self.client.execute('ZCARD', self.pending),
+            'claimed': self.client.execute('ZCARD', self.inflight),
+            'dead': self.client.execute('HLEN', self.dead)
+        }
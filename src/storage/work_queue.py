@@ -0,0 +1,236 @@
+"""
+Очередь задач на обработку отзывов для нескольких воркеров
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import List, Optional
+from urllib.parse import urlparse
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_queue (
+    job_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    visible_at REAL NOT NULL,
+    receipt TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_work_queue_visible ON work_queue (status, visible_at);
+"""
+
+JOB_READY = "ready"
+JOB_CLAIMED = "claimed"
+JOB_DONE = "done"
+JOB_DEAD = "dead"
+
+class WorkQueue:
+    """Интерфейс очереди задач
+
+    Задача - отзыв (payload) с ключом job_id. Воркер забирает задачу через
+    claim: она становится невидимой для остальных на visibility_timeout
+    секунд. Если воркер не подтвердил задачу (ack) за это время - например,
+    упал - задача снова становится доступной. Квитанция (receipt) из claim
+    защищает от опоздавшего воркера: ack и nack с чужой квитанцией
+    игнорируются. Завершенные задачи помнятся done_ttl секунд, чтобы
+    повторная выборка того же отзыва не поставила его в очередь снова.
+    Задача, исчерпавшая попытки (dead), ставится заново следующим put.
+    """
+
+    def put(self, job_id: str, payload: dict) -> bool:
+        """Ставит задачу в очередь, False если она уже есть (или недавно выполнена)"""
+        raise NotImplementedError
+
+    def claim(self, visibility_timeout: float) -> Optional[dict]:
+        """Забирает задачу: {'job_id', 'payload', 'attempts', 'receipt'} или None"""
+        raise NotImplementedError
+
+    def ack(self, job_id: str, receipt: str) -> bool:
+        """Задача выполнена"""
+        raise NotImplementedError
+
+    def nack(self, job_id: str, receipt: str, delay: float = 0.0, error: str = "") -> bool:
+        """Задача не выполнена: вернуть в очередь через delay секунд (или в dead)"""
+        raise NotImplementedError
+
+    def postpone(self, job_id: str, receipt: str, delay: float) -> bool:
+        """Возвращает задачу в очередь через delay секунд, не засчитывая попытку"""
+        raise NotImplementedError
+
+    def requeue_expired(self) -> int:
+        """Возвращает в очередь задачи с истекшим таймаутом видимости"""
+        raise NotImplementedError
+
+    def in_flight(self) -> List[dict]:
+        """Payload задач, которые ждут воркера или обрабатываются"""
+        raise NotImplementedError
+
+    def dead_ids(self) -> List[str]:
+        """Задачи, исчерпавшие попытки"""
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+class SQLiteWorkQueue(WorkQueue):
+    """Очередь в SQLite - для воркеров на одном хосте"""
+
+    def __init__(self, path: str, max_attempts: int = 5, done_ttl: float = 72 * 3600):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.done_ttl = done_ttl
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """Соединение в режиме autocommit, отдельное на каждый поток"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def put(self, job_id: str, payload: dict) -> bool:
+        now = time.time()
+        conn = self._conn()
+        # Выполненные задачи старше done_ttl забываем - место под новые
+        conn.execute("DELETE FROM work_queue WHERE job_id = ? AND status = ? AND updated_at < ?",
+                     (job_id, JOB_DONE, now - self.done_ttl))
+        cursor = conn.execute(
+            "INSERT INTO work_queue (job_id, payload, status, visible_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (job_id) DO UPDATE SET payload = excluded.payload, status = excluded.status, "
+            "attempts = 0, visible_at = excluded.visible_at, last_error = NULL, "
+            "updated_at = excluded.updated_at WHERE work_queue.status = ?",
+            (job_id, json.dumps(payload, ensure_ascii=False), JOB_READY, now, now, now, JOB_DEAD)
+        )
+        return cursor.rowcount == 1
+
+    def claim(self, visibility_timeout: float) -> Optional[dict]:
+        conn = self._conn()
+        now = time.time()
+        receipt = uuid.uuid4().hex
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._bury_expired(conn, now)
+            row = conn.execute(
+                "SELECT * FROM work_queue WHERE status IN (?, ?) AND visible_at <= ? "
+                "ORDER BY visible_at LIMIT 1",
+                (JOB_READY, JOB_CLAIMED, now)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE work_queue SET status = ?, attempts = attempts + 1, visible_at = ?, "
+                    "receipt = ?, updated_at = ? WHERE job_id = ?",
+                    (JOB_CLAIMED, now + visibility_timeout, receipt, now, row['job_id'])
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        if row is None:
+            return None
+        return {
+            'job_id': row['job_id'],
+            'payload': json.loads(row['payload']),
+            'attempts': row['attempts'] + 1,
+            'receipt': receipt
+        }
+
+    def ack(self, job_id: str, receipt: str) -> bool:
+        cursor = self._conn().execute(
+            "UPDATE work_queue SET status = ?, receipt = NULL, updated_at = ? "
+            "WHERE job_id = ? AND receipt = ? AND status = ?",
+            (JOB_DONE, time.time(), job_id, receipt, JOB_CLAIMED)
+        )
+        return cursor.rowcount == 1
+
+    def nack(self, job_id: str, receipt: str, delay: float = 0.0, error: str = "") -> bool:
+        now = time.time()
+        cursor = self._conn().execute(
+            "UPDATE work_queue SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+            "visible_at = ?, receipt = NULL, last_error = ?, updated_at = ? "
+            "WHERE job_id = ? AND receipt = ? AND status = ?",
+            (self.max_attempts, JOB_DEAD, JOB_READY, now + delay, error, now,
+             job_id, receipt, JOB_CLAIMED)
+        )
+        return cursor.rowcount == 1
+
+    def postpone(self, job_id: str, receipt: str, delay: float) -> bool:
+        now = time.time()
+        cursor = self._conn().execute(
+            "UPDATE work_queue SET status = ?, attempts = MAX(attempts - 1, 0), visible_at = ?, "
+            "receipt = NULL, updated_at = ? WHERE job_id = ? AND receipt = ? AND status = ?",
+            (JOB_READY, now + delay, now, job_id, receipt, JOB_CLAIMED)
+        )
+        return cursor.rowcount == 1
+
+    def _bury_expired(self, conn: sqlite3.Connection, now: float):
+        """Просроченные задачи, исчерпавшие попытки, больше не выдаются"""
+        conn.execute(
+            "UPDATE work_queue SET status = ?, receipt = NULL, last_error = ?, updated_at = ? "
+            "WHERE status = ? AND visible_at <= ? AND attempts >= ?",
+            (JOB_DEAD, "visibility timeout", now, JOB_CLAIMED, now, self.max_attempts)
+        )
+
+    def requeue_expired(self) -> int:
+        # claim и сам забирает просроченные задачи - это явный проход для статистики
+        now = time.time()
+        conn = self._conn()
+        self._bury_expired(conn, now)
+        cursor = conn.execute(
+            "UPDATE work_queue SET status = ?, receipt = NULL, updated_at = ? "
+            "WHERE status = ? AND visible_at <= ?",
+            (JOB_READY, now, JOB_CLAIMED, now)
+        )
+        return cursor.rowcount
+
+    def in_flight(self) -> List[dict]:
+        rows = self._conn().execute(
+            "SELECT payload FROM work_queue WHERE status IN (?, ?)", (JOB_READY, JOB_CLAIMED)
+        ).fetchall()
+        return [json.loads(row['payload']) for row in rows]
+
+    def dead_ids(self) -> List[str]:
+        rows = self._conn().execute(
+            "SELECT job_id FROM work_queue WHERE status = ?", (JOB_DEAD,)
+        ).fetchall()
+        return [row['job_id'] for row in rows]
+
+    def stats(self) -> dict:
+        rows = self._conn().execute(
+            "SELECT status, COUNT(*) AS count FROM work_queue GROUP BY status"
+        ).fetchall()
+        return {row['status']: row['count'] for row in rows}
+
+def create_work_queue(url: str, max_attempts: int = 5, done_ttl: float = 72 * 3600) -> WorkQueue:
+    """Очередь по адресу: sqlite:///data/queue.db или redis://host:6379/0"""
+    parsed = urlparse(url)
+
+    if parsed.scheme == "sqlite":
+        # sqlite:///data/queue.db - относительный путь, sqlite:////var/queue.db - абсолютный
+        return SQLiteWorkQueue(parsed.path[1:], max_attempts=max_attempts, done_ttl=done_ttl)
+
+    if parsed.scheme == "redis":
+        from .redis_queue import RedisWorkQueue, RESPClient
+        client = RESPClient(parsed.hostname or 'localhost', parsed.port or 6379,
+                            db=int(parsed.path.lstrip('/') or 0), password=parsed.password)
+        return RedisWorkQueue(client, max_attempts=max_attempts, done_ttl=done_ttl)
+
+    raise ValueError(f"Неизвестный тип очереди: {url}")
@@ -0,0 +1,52 @@
+"""
+Бюджет времени одного запуска
+"""
+
+import time
+from typing import Optional, Tuple
+
+class Deadline:
+    """Момент, к которому запуск должен завершиться
+
+    reserve - запас на сохранение состояния: remaining считается до
+    начала резерва, поэтому работа останавливается заранее и снимок
+    успевает записаться до того, как раннер убьет процесс. Без бюджета
+    (budget=None) дедлайн бесконечен.
+    """
+
+    def __init__(self, budget: Optional[float] = None, reserve: float = 0.0):
+        self.budget = budget
+        self.reserve = reserve
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + budget if budget else None
+
+    @property
+    def remaining(self) -> float:
+        """Сколько секунд осталось на работу (без учета резерва)"""
+        if self.expires_at is None:
+            return float('inf')
+        return max(0.0, self.expires_at - self.reserve - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining <= 0
+
+    def cancel(self):
+        """Истекает немедленно: запущенная работа завершается на ближайшей проверке"""
+        self.expires_at = time.monotonic() + self.reserve
+
+    def allows(self, seconds: float) -> bool:
+        """Успеет ли операция ожидаемой длительности до дедлайна"""
+        return self.remaining > seconds
+
+    def timeout(self, connect: float, read: float) -> Optional[Tuple[float, float]]:
+        """Таймауты запроса, урезанные до оставшегося времени; None - времени нет"""
+        remaining = self.remaining
+        if remaining <= 0:
+            return None
+        return min(connect, remaining), min(read, remaining)
+
+    def describe(self) -> str:
+        if self.expires_at is None:
+            return "без ограничения"
+        return f"{self.remaining:.0f} с"
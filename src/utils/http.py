@@ -0,0 +1,125 @@
+"""
+Общий HTTP транспорт с пулом keep-alive соединений
+"""
+
+import threading
+from collections import Counter
+from typing import Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config.settings import settings
+
+Timeout = Union[float, Tuple[float, float]]
+
+class HTTPTransport:
+    """HTTP транспорт для запросов к WB, LLM провайдерам и Telegram
+
+    Одна requests.Session держит отдельный пул keep-alive соединений на каждый
+    хост, поэтому TCP+TLS рукопожатие выполняется один раз на соединение,
+    а не на каждый запрос. Ответы запрашиваются со сжатием gzip.
+    """
+
+    def __init__(self, connect_timeout: float = 5.0, read_timeout: float = 30.0,
+                 pool_size: int = 10):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+        self._session: Optional[requests.Session] = None
+        self._lock = threading.Lock()
+        self._requests_by_host = Counter()
+        self._errors_by_host = Counter()
+
+    @property
+    def session(self) -> requests.Session:
+        """Лениво создает общую сессию"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self) -> requests.Session:
+        """Создает сессию с настроенными пулами соединений"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"Accept-Encoding": "gzip, deflate"})
+        return session
+
+    def request(self, method: str, url: str, timeout: Optional[Timeout] = None,
+                **kwargs) -> requests.Response:
+        """Выполняет запрос через общий пул соединений"""
+        host = urlsplit(url).netloc
+        if timeout is None:
+            timeout = (self.connect_timeout, self.read_timeout)
+
+        with self._lock:
+            self._requests_by_host[host] += 1
+
+        try:
+            return self.session.request(method, url, timeout=timeout, **kwargs)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._errors_by_host[host] += 1
+            raise
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def pool_stats(self) -> dict:
+        """Статистика пулов соединений по хостам
+
+        connections_opened - сколько соединений было установлено,
+        requests_sent - сколько запросов прошло через пул,
+        idle_connections - соединения, ожидающие повторного использования.
+        """
+        stats = {}
+        with self._lock:
+            for host, count in self._requests_by_host.items():
+                stats[host] = {
+                    'requests': count,
+                    'errors': self._errors_by_host.get(host, 0),
+                    'connections_opened': 0,
+                    'requests_sent': 0,
+                    'idle_connections': 0,
+                }
+
+        if self._session is None:
+            return stats
+
+        for adapter in set(self._session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                host = pool.host if pool.port in (None, 80, 443) else f"{pool.host}:{pool.port}"
+                entry = stats.setdefault(host, {'requests': 0, 'errors': 0, 'connections_opened': 0,
+                                                'requests_sent': 0, 'idle_connections': 0})
+                entry['connections_opened'] += pool.num_connections
+                entry['requests_sent'] += pool.num_requests
+                if pool.pool is not None:
+                    # Очередь пула заранее заполнена None-заглушками
+                    entry['idle_connections'] += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+
+        return stats
+
+    def close(self):
+        """Закрывает все соединения"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+transport = HTTPTransport(
+    connect_timeout=settings.HTTP_CONNECT_TIMEOUT,
+    read_timeout=settings.HTTP_READ_TIMEOUT,
+    pool_size=settings.HTTP_POOL_SIZE
+)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# Добавляем путь к src
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.config.settings import settings
+
+@pytest.fixture
+def bot_settings(tmp_path, monkeypatch):
+    """Настройки бота с состоянием во временном каталоге и локальными шаблонами"""
+    monkeypatch.setattr(settings, 'STATE_DIR', str(tmp_path))
+    monkeypatch.setattr(settings, 'DATABASE_PATH', str(tmp_path / 'bot.db'))
+    monkeypatch.setattr(settings, 'LEASE_URL', f"sqlite:///{tmp_path / 'leases.db'}")
+    monkeypatch.setattr(settings, 'AI_PROVIDER', 'fallback')
+    monkeypatch.delenv('TELEGRAM_BOT_TOKEN', raising=False)
+    monkeypatch.delenv('TELEGRAM_CHAT_ID', raising=False)
+    return settings
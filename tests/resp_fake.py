@@ -0,0 +1,261 @@
+"""
+Минимальный сервер RESP в памяти процесса для тестов очереди и аренд
+"""
+
+import socketserver
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Ответ EXEC, прерванного изменением ключа из WATCH
+NULL_ARRAY = object()
+
+class FakeRESPServer:
+    """Подмножество Redis, которое используют RedisWorkQueue и RedisLeaseStore
+
+    Строки, хэши и sorted set в памяти, срок жизни ключей (EX/PX/PEXPIRE),
+    WATCH/MULTI/EXEC/DISCARD с проверкой версий ключей. Сервер слушает
+    127.0.0.1 на свободном порту и работает в фоновом потоке.
+    """
+
+    def __init__(self):
+        self.data: Dict[str, object] = {}
+        self.expires: Dict[str, float] = {}
+        self.versions: Dict[str, int] = {}
+        self.lock = threading.RLock()
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                fake._serve(self.rfile, self.wfile)
+
+        self._server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self) -> 'FakeRESPServer':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _serve(self, reader, writer):
+        """Цикл одного соединения: у каждого свои WATCH и MULTI"""
+        watched: Dict[str, int] = {}
+        queued: Optional[List[list]] = None
+
+        while True:
+            line = reader.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(reader.readline()[1:])
+                args.append(reader.read(length + 2)[:-2].decode('utf-8'))
+            command, args = args[0].upper(), args[1:]
+
+            with self.lock:
+                if command == 'WATCH':
+                    self._expire()
+                    watched.update({key: self.versions.get(key, 0) for key in args})
+                    reply = ('OK',)
+                elif command == 'UNWATCH':
+                    watched, reply = {}, ('OK',)
+                elif command == 'MULTI':
+                    queued, reply = [], ('OK',)
+                elif command == 'DISCARD':
+                    queued, watched, reply = None, {}, ('OK',)
+                elif command == 'EXEC':
+                    self._expire()
+                    if any(self.versions.get(key, 0) != version for key, version in watched.items()):
+                        reply = NULL_ARRAY
+                    else:
+                        reply = [self._call(*item) for item in queued or []]
+                    queued, watched = None, {}
+                elif queued is not None:
+                    queued.append([command, args])
+                    reply = ('QUEUED',)
+                else:
+                    reply = self._call(command, args)
+
+            writer.write(self._encode(reply))
+
+    def _call(self, command: str, args: List[str]):
+        self._expire()
+        handler = getattr(self, f"_cmd_{command.lower()}", None)
+        if handler is None:
+            return Exception(f"ERR unknown command '{command}'")
+        try:
+            return handler(*args)
+        except (ValueError, TypeError) as e:
+            return Exception(f"ERR {e}")
+
+    def _encode(self, value) -> bytes:
+        if value is NULL_ARRAY:
+            return b"*-1\r\n"
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, Exception):
+            return f"-{value}\r\n".encode()
+        if isinstance(value, tuple):
+            return f"+{value[0]}\r\n".encode()
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, int):
+            return f":{value}\r\n".encode()
+        if isinstance(value, list):
+            return f"*{len(value)}\r\n".encode() + b"".join(self._encode(item) for item in value)
+        data = str(value).encode('utf-8')
+        return f"${len(data)}\r\n".encode() + data + b"\r\n"
+
+    def _expire(self):
+        now = time.time()
+        for key, expires_at in list(self.expires.items()):
+            if expires_at <= now:
+                self.data.pop(key, None)
+                del self.expires[key]
+                self._touch(key)
+
+    def _touch(self, key: str):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def _typed(self, key: str, kind: type):
+        value = self.data.get(key)
+        if value is not None and not isinstance(value, kind):
+            raise TypeError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    # Строки и ключи
+
+    def _cmd_get(self, key):
+        return self._typed(key, str)
+
+    def _cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        if 'NX' in options and key in self.data:
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if 'EX' in options:
+            self.expires[key] = time.time() + int(options[options.index('EX') + 1])
+        if 'PX' in options:
+            self.expires[key] = time.time() + int(options[options.index('PX') + 1]) / 1000
+        self._touch(key)
+        return ('OK',)
+
+    def _cmd_incr(self, key):
+        value = int(self._typed(key, str) or 0) + 1
+        self.data[key] = str(value)
+        self._touch(key)
+        return value
+
+    def _cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if key in self.data:
+                del self.data[key]
+                self.expires.pop(key, None)
+                self._touch(key)
+                removed += 1
+        return removed
+
+    def _cmd_exists(self, *keys):
+        return sum(key in self.data for key in keys)
+
+    def _cmd_pexpire(self, key, milliseconds):
+        if key not in self.data:
+            return 0
+        self.expires[key] = time.time() + int(milliseconds) / 1000
+        self._touch(key)
+        return 1
+
+    def _cmd_select(self, db):
+        return ('OK',)
+
+    def _cmd_ping(self):
+        return ('PONG',)
+
+    # Хэши
+
+    def _hash(self, key: str, create: bool = False) -> dict:
+        value = self._typed(key, dict)
+        if value is None:
+            value = {}
+            if create:
+                self.data[key] = value
+        return value
+
+    def _cmd_hset(self, key, *pairs):
+        values = self._hash(key, create=True)
+        added = 0
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            added += field not in values
+            values[field] = value
+        self._touch(key)
+        return added
+
+    def _cmd_hget(self, key, field):
+        return self._hash(key).get(field)
+
+    def _cmd_hmget(self, key, *fields):
+        values = self._hash(key)
+        return [values.get(field) for field in fields]
+
+    def _cmd_hkeys(self, key):
+        return list(self._hash(key))
+
+    def _cmd_hexists(self, key, field):
+        return int(field in self._hash(key))
+
+    def _cmd_hdel(self, key, *fields):
+        values = self._hash(key)
+        removed = sum(values.pop(field, None) is not None for field in fields)
+        if removed:
+            self._touch(key)
+        return removed
+
+    def _cmd_hlen(self, key):
+        return len(self._hash(key))
+
+    def _cmd_hincrby(self, key, field, amount):
+        values = self._hash(key, create=True)
+        values[field] = str(int(values.get(field, 0)) + int(amount))
+        self._touch(key)
+        return int(values[field])
+
+    # Sorted set (score хранится в словаре участник -> score)
+
+    def _zset(self, key: str, create: bool = False) -> dict:
+        return self._hash(key, create)
+
+    def _cmd_zadd(self, key, *pairs):
+        members = self._zset(key, create=True)
+        added = 0
+        for score, member in zip(pairs[::2], pairs[1::2]):
+            added += member not in members
+            members[member] = float(score)
+        self._touch(key)
+        return added
+
+    def _cmd_zrem(self, key, *names):
+        members = self._zset(key)
+        removed = sum(members.pop(name, None) is not None for name in names)
+        if removed:
+            self._touch(key)
+        return removed
+
+    def _cmd_zcard(self, key):
+        return len(self._zset(key))
+
+    def _cmd_zrangebyscore(self, key, low, high, *limit):
+        low = float('-inf') if low == '-inf' else float(low)
+        high = float('inf') if high == '+inf' else float(high)
+        found = sorted((score, name) for name, score in self._zset(key).items() if low <= score <= high)
+        names = [name for _, name in found]
+        if limit and limit[0].upper() == 'LIMIT':
+            offset, count = int(limit[1]), int(limit[2])
+            names = names[offset:offset + count]
+        return names
@@ -0,0 +1,73 @@
+import asyncio
+
+from src.core import async_scheduler
+from src.core.async_scheduler import AsyncScheduler
+
+class FakeClock:
+    """Часы, которые двигает сам тест: сон и работа задачи не занимают реального времени"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+def run_with_clock(monkeypatch, durations, interval: float = 10.0):
+    """Запускает задачу с фиксированным интервалом; durations - длительность каждого запуска"""
+    clock = FakeClock()
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(seconds):
+        clock.now += seconds
+        await real_sleep(0)
+
+    monkeypatch.setattr(async_scheduler, 'time', clock)
+    monkeypatch.setattr(async_scheduler.asyncio, 'sleep', fake_sleep)
+
+    scheduler = AsyncScheduler(max_workers=1)
+    started = []
+    remaining = list(durations)
+
+    def work():
+        started.append(clock.now)
+        clock.now += remaining.pop(0)
+        if not remaining:
+            loop.call_soon_threadsafe(scheduler.stop)
+
+    job = scheduler.add_job('reviews', work, every=interval)
+
+    async def main():
+        nonlocal loop
+        loop = asyncio.get_running_loop()
+        await scheduler.run(shutdown_timeout=1)
+
+    loop = None
+    asyncio.run(main())
+    return job, started
+
+def test_on_time_runs_are_not_missed(monkeypatch):
+    job, started = run_with_clock(monkeypatch, [1, 1, 1])
+
+    assert started == [1000, 1010, 1020]
+    assert job.missed == 0
+
+def test_run_ending_on_next_slot_misses_nothing(monkeypatch):
+    job, started = run_with_clock(monkeypatch, [10, 1])
+
+    assert started == [1000, 1010]
+    assert job.missed == 0
+
+def test_overrun_counts_only_skipped_slots(monkeypatch):
+    # Запуск 1000..1025 перекрыл сроки 1010 и 1020: 1010 выполняется сразу в 1025, 1020 пропущен
+    job, started = run_with_clock(monkeypatch, [25, 1, 1])
+
+    assert started == [1000, 1025, 1035]
+    assert job.missed == 1
+
+def test_missed_runs():
+    assert AsyncScheduler._missed_runs(1010, 1009, 10) == 0
+    assert AsyncScheduler._missed_runs(1010, 1010, 10) == 0
+    assert AsyncScheduler._missed_runs(1010, 1019.9, 10) == 0
+    assert AsyncScheduler._missed_runs(1010, 1020, 10) == 1
+    assert AsyncScheduler._missed_runs(1010, 1055, 10) == 4
+    assert AsyncScheduler._missed_runs(1010, 1055, 0) == 0
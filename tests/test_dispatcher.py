@@ -0,0 +1,73 @@
+from src.api.models import WBReview
+from src.core.dispatcher import OutboxDispatcher
+from src.storage.leases import create_lease_store
+from src.storage.outbox import ReplyOutbox, STATUS_FAILED, STATUS_PENDING
+
+REVIEW = WBReview({'id': 'r1', 'text': 'Хорошо', 'productValuation': 5,
+                   'productDetails': {'productName': 'Платье'}})
+
+class FakeWB:
+    def __init__(self, success=True):
+        self.success = success
+        self.posted = []
+
+    def post_reply_to_review(self, review_id, text):
+        self.posted.append(review_id)
+        return self.success
+
+    def is_review_answered(self, review_id):
+        return False
+
+class Silent:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+def make_dispatcher(tmp_path, wb, max_attempts=5):
+    outbox = ReplyOutbox(str(tmp_path / 'outbox.db'), max_attempts=max_attempts)
+    leases = create_lease_store(f"sqlite:///{tmp_path / 'leases.db'}")
+    dispatcher = OutboxDispatcher(wb, outbox, Silent(), Silent(), retry_base=0,
+                                  leases=leases, lease_ttl=60)
+    return dispatcher, outbox, leases
+
+def other_instance(tmp_path):
+    return create_lease_store(f"sqlite:///{tmp_path / 'leases.db'}")
+
+def status(outbox, review_id):
+    return outbox._conn().execute("SELECT status FROM outbox WHERE review_id = ?", (review_id,)).fetchone()[0]
+
+def test_lease_token_is_kept_with_reply_and_held_after_send(tmp_path):
+    wb = FakeWB()
+    dispatcher, outbox, leases = make_dispatcher(tmp_path, wb)
+    token = leases.acquire('review:r1', 60)
+    outbox.add(REVIEW, 'Спасибо!', lease_token=token)
+
+    assert dispatcher.send(outbox.claim('r1'))
+
+    assert wb.posted == ['r1']
+    # Аренда не освобождается сразу: WB отмечает отзыв отвеченным с задержкой
+    assert other_instance(tmp_path).acquire('review:r1', 60) is None
+
+def test_retry_keeps_lease_and_permanent_failure_releases_it(tmp_path):
+    wb = FakeWB(success=False)
+    dispatcher, outbox, leases = make_dispatcher(tmp_path, wb, max_attempts=2)
+    outbox.add(REVIEW, 'Спасибо!', lease_token=leases.acquire('review:r1', 60))
+
+    assert not dispatcher.send(outbox.claim('r1'))
+    assert status(outbox, 'r1') == STATUS_PENDING
+    assert other_instance(tmp_path).acquire('review:r1', 60) is None
+
+    assert not dispatcher.send(outbox.claim('r1'))
+    assert status(outbox, 'r1') == STATUS_FAILED
+    assert other_instance(tmp_path).acquire('review:r1', 60) is not None
+
+def test_reply_is_postponed_while_another_instance_holds_the_lease(tmp_path):
+    wb = FakeWB()
+    dispatcher, outbox, leases = make_dispatcher(tmp_path, wb)
+    outbox.add(REVIEW, 'Спасибо!')
+    assert other_instance(tmp_path).acquire('review:r1', 60)
+
+    assert dispatcher.drain() == []
+
+    assert wb.posted == []
+    assert status(outbox, 'r1') == STATUS_PENDING
+    assert outbox.next_due_in() > 30
@@ -0,0 +1,92 @@
+import sqlite3
+import time
+
+from src.api.models import WBReview
+from src.core.manager import ResponseManager
+from src.storage.leases import create_lease_store
+
+CURSOR = 1704067200  # 2024-01-01T00:00:00Z
+
+def make_review(review_id: str, created: str) -> WBReview:
+    return WBReview({
+        'id': review_id,
+        'text': 'Отличный товар, спасибо',
+        'productValuation': 5,
+        'createdDate': created,
+        'productDetails': {'productName': 'Платье'}
+    })
+
+def make_manager(monkeypatch, pages) -> ResponseManager:
+    manager = ResponseManager()
+    manager.sync_cursor.date_from = CURSOR
+    monkeypatch.setattr(manager.wb_client, 'get_unanswered_count', lambda: {})
+    monkeypatch.setattr(manager.wb_client, 'iter_unanswered_pages',
+                        lambda date_from=None: iter(pages))
+    return manager
+
+def locked(*args, **kwargs):
+    raise sqlite3.OperationalError("database is locked")
+
+def test_select_error_keeps_cursor_at_failed_page(bot_settings, monkeypatch):
+    newer = make_review('r2', '2024-01-03T10:00:00Z')
+    failed = make_review('r1', '2024-01-02T10:00:00Z')
+    manager = make_manager(monkeypatch, [[newer], [failed]])
+    save_reviews = manager.store.save_reviews
+    monkeypatch.setattr(manager.store, 'save_reviews',
+                        lambda page: locked() if failed in page else save_reviews(page))
+
+    manager.process_new_reviews()
+
+    assert CURSOR <= manager.sync_cursor.date_from <= failed.created_ts
+
+def test_generate_error_keeps_cursor_at_failed_review(bot_settings, monkeypatch):
+    failed = make_review('r1', '2024-01-02T10:00:00Z')
+    newer = make_review('r2', '2024-01-03T10:00:00Z')
+    manager = make_manager(monkeypatch, [[newer, failed]])
+    monkeypatch.setattr(manager.store, 'save_reply', locked)
+    monkeypatch.setattr(manager.processor, 'batch_size', 1)
+
+    manager.process_new_reviews()
+
+    assert CURSOR <= manager.sync_cursor.date_from <= failed.created_ts
+
+def test_review_leased_by_another_instance_keeps_cursor(bot_settings, monkeypatch):
+    leased = make_review('r1', '2024-01-02T10:00:00Z')
+    newer = make_review('r2', '2024-01-03T10:00:00Z')
+    manager = make_manager(monkeypatch, [[newer, leased]])
+    monkeypatch.setattr(manager.wb_client, 'post_reply_to_review', lambda review_id, text: True)
+    other = create_lease_store(bot_settings.LEASE_URL)
+    assert other.acquire('review:r1', bot_settings.LEASE_TTL)
+
+    manager.process_new_reviews()
+
+    assert CURSOR <= manager.sync_cursor.date_from <= leased.created_ts
+
+def test_stale_cursor_forces_full_fetch(bot_settings, monkeypatch):
+    manager = make_manager(monkeypatch, [])
+    requested = []
+    monkeypatch.setattr(manager.wb_client, 'has_unseen_feedbacks', lambda: True)
+    monkeypatch.setattr(manager.wb_client, 'iter_unanswered_pages',
+                        lambda date_from=None: requested.append(date_from) or iter([]))
+
+    manager.sync_cursor.checked_at = time.time()
+    manager.process_new_reviews()
+    manager.sync_cursor.checked_at = 0
+    manager.process_new_reviews()
+
+    assert requested == [CURSOR, None]
+
+def test_failed_reply_rewinds_cursor(bot_settings, monkeypatch):
+    review = make_review('r1', '2024-01-02T10:00:00Z')
+    manager = make_manager(monkeypatch, [])
+    manager.sync_cursor.date_from = review.created_ts + 86400
+    manager.outbox.max_attempts = 1
+    monkeypatch.setattr(manager.wb_client, 'is_review_answered', lambda review_id: False)
+    monkeypatch.setattr(manager.wb_client, 'post_reply_to_review', lambda review_id, text: False)
+    manager.processor.processed_ids.add(review.id)
+    manager.outbox.add(review, 'Спасибо!')
+
+    assert manager.dispatcher.drain() == []
+
+    assert manager.sync_cursor.date_from == review.created_ts
+    assert review.id not in manager.processor.processed_ids
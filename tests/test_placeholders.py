@@ -0,0 +1,47 @@
+from src.ai.generator import AIGenerator
+from src.ai.templates import has_leftover_placeholder, replace_name_placeholder
+
+class ScriptedGenerator:
+    """Генератор, который по очереди возвращает заранее заданные ответы"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    def generate_reply(self, *args, **kwargs):
+        self.calls += 1
+        return self.replies.pop(0)
+
+    def generate_replies(self, reviews):
+        return [self.generate_reply(**review) for review in reviews]
+
+def test_name_placeholder_is_replaced_in_any_case():
+    text = "Спасибо, [имя]! Ждем вас снова, [Имя] и [ ИМЯ ]."
+    assert replace_name_placeholder(text, " Анна ") == "Спасибо, Анна! Ждем вас снова, Анна и Анна."
+    assert replace_name_placeholder("Спасибо, [Имя]!", "") == "Спасибо, !"
+
+def test_leftover_placeholders_are_detected():
+    assert not has_leftover_placeholder("Спасибо, [имя]! Рады, что платье подошло.")
+    assert not has_leftover_placeholder("Спасибо, [ИМЯ]!")
+    assert not has_leftover_placeholder("Спасибо, что указали имя в заказе!")
+    assert has_leftover_placeholder("Спасибо, [Имя покупателя]!")
+    assert has_leftover_placeholder("Спасибо за отзыв о [название товара]!")
+    assert has_leftover_placeholder("Имя, спасибо за отзыв!")
+    assert has_leftover_placeholder("Спасибо, ИМЯ!")
+
+def test_reply_with_placeholder_is_regenerated(bot_settings):
+    generator = AIGenerator()
+    generator.generator = ScriptedGenerator("Спасибо, [Имя покупателя]!", "Спасибо, Анна!")
+
+    assert generator.generate_reply("Отличное платье", rating=5, user_name="Анна") == "Спасибо, Анна!"
+    assert generator.generator.calls == 2
+
+def test_reply_falls_back_to_template_when_placeholder_stays(bot_settings):
+    generator = AIGenerator()
+    generator.generator = ScriptedGenerator("Имя, спасибо!", "Спасибо, [клиент]!")
+
+    reply = generator.generate_reply("Отличное платье", rating=5, user_name="Анна")
+
+    assert "Анна" in reply
+    assert not has_leftover_placeholder(reply)
+    assert generator.generator.calls == 2
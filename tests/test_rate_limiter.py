@@ -0,0 +1,37 @@
+import asyncio
+import sqlite3
+import time
+
+from src.api.shared_rate_limiter import SQLiteRateLimiter
+
+def test_sqlite_limiter_does_not_block_event_loop(tmp_path):
+    path = str(tmp_path / 'rate.db')
+    limiter = SQLiteRateLimiter(path, rate=100, burst=10)
+
+    # Другой процесс держит блокировку записи
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        acquire = asyncio.create_task(limiter.acquire_async('feedbacks'))
+        await asyncio.sleep(0.3)
+        other.execute("COMMIT")
+        await acquire
+        task.cancel()
+        return ticks
+
+    started = time.monotonic()
+    ticks = asyncio.run(main())
+
+    # Пока резервирование ждало блокировку, event loop продолжал работать
+    assert ticks >= 10
+    assert time.monotonic() - started < 5
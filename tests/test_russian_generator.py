@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+from src.ai.russian_generator import RussianAIGenerator
+from src.config.providers import AIProvider
+
+BATCH = [
+    {'review_text': 'Отличное платье', 'rating': 5, 'user_name': 'Анна'},
+    {'review_text': 'Хорошая ткань', 'rating': 4, 'user_name': ''}
+]
+
+@pytest.fixture
+def generator(monkeypatch):
+    monkeypatch.setattr('src.ai.russian_generator.settings.YANDEX_API_KEY', 'key', raising=False)
+    monkeypatch.setattr('src.ai.russian_generator.settings.GIGACHAT_API_KEY', 'key', raising=False)
+    generator = RussianAIGenerator({'provider': AIProvider.YANDEX_GPT.value, 'checked_at': time.time()})
+    monkeypatch.setattr(generator, '_test_provider', lambda provider: True)
+    return generator
+
+def test_batch_transport_failure_moves_whole_batch_to_next_provider(generator, monkeypatch):
+    requests = []
+
+    def make_request(provider, prompt, max_tokens=None):
+        requests.append(provider)
+        if provider == AIProvider.YANDEX_GPT:
+            return None
+        return '[{"id": 1, "reply": "Спасибо, [имя]!"}, {"id": 2, "reply": "Спасибо!"}]'
+
+    monkeypatch.setattr(generator, '_make_request', make_request)
+
+    assert generator.generate_replies(BATCH) == ["Спасибо, Анна!", "Спасибо!"]
+    # Один запрос пачкой к упавшему провайдеру, без повторов по одному отзыву
+    assert requests == [AIProvider.YANDEX_GPT, AIProvider.GIGA_CHAT]
+    assert generator.current_provider == AIProvider.GIGA_CHAT
+
+def test_unparsed_items_are_retried_one_by_one(generator, monkeypatch):
+    responses = ['[{"id": 1, "reply": "Спасибо, [имя]!"}]', "Рады, что ткань понравилась!"]
+    monkeypatch.setattr(generator, '_make_request', lambda *args, **kwargs: responses.pop(0))
+
+    assert generator.generate_replies(BATCH) == ["Спасибо, Анна!", "Рады, что ткань понравилась!"]
+    assert generator.current_provider == AIProvider.YANDEX_GPT
+
+def test_batch_response_takes_first_balanced_array():
+    response = ('Вот ответы [2 шт.]:\n```json\n[{"id": 1, "reply": "Спасибо [за] отзыв"}, '
+                '{"id": 2, "reply": "Рады помочь"}]\n```\nЕсли нужно, [уточните].')
+
+    assert RussianAIGenerator._parse_batch_response(response, 2) == {
+        1: "Спасибо [за] отзыв",
+        2: "Рады помочь"
+    }
+    assert RussianAIGenerator._parse_batch_response("без JSON", 2) == {}
+
+def test_batch_response_skips_arrays_without_replies():
+    response = ('Ответы [1]: пример формата [] и [{"id": "x"}]\n'
+                '[{"id": 1, "reply": "Спасибо!"}, {"id": 2, "reply": "Рады помочь"}]')
+
+    assert RussianAIGenerator._parse_batch_response(response, 2) == {1: "Спасибо!", 2: "Рады помочь"}
@@ -0,0 +1,18 @@
+import json
+
+import pytest
+
+from src.core.tenants import load_tenants
+
+def write_registry(tmp_path, weight):
+    path = tmp_path / 'tenants.json'
+    path.write_text(json.dumps([{'name': 'shop1', 'api_key': 'key', 'weight': weight}]), encoding='utf-8')
+    return str(path)
+
+def test_tenant_weight_is_loaded(tmp_path):
+    assert load_tenants(write_registry(tmp_path, 2))[0].weight == 2.0
+
+@pytest.mark.parametrize('weight', [0, -1, 'nan'])
+def test_non_positive_weight_is_rejected(tmp_path, weight):
+    with pytest.raises(ValueError, match="shop1"):
+        load_tenants(write_registry(tmp_path, weight))
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from src.storage.redis_queue import RedisWorkQueue, RESPClient, RESPError
+from src.storage.work_queue import SQLiteWorkQueue
+from resp_fake import FakeRESPServer
+
+@pytest.fixture
+def resp_server():
+    server = FakeRESPServer().start()
+    yield server
+    server.stop()
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def queue(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLiteWorkQueue(str(tmp_path / 'queue.db'), max_attempts=2)
+    server = request.getfixturevalue('resp_server')
+    return RedisWorkQueue(RESPClient(server.host, server.port), max_attempts=2)
+
+def test_put_is_idempotent(queue):
+    assert queue.put('r1', {'id': 'r1'})
+    assert not queue.put('r1', {'id': 'r1'})
+
+def test_claim_hides_job_until_ack(queue):
+    queue.put('r1', {'id': 'r1'})
+
+    job = queue.claim(visibility_timeout=30)
+    assert job['job_id'] == 'r1'
+    assert job['payload'] == {'id': 'r1'}
+    assert job['attempts'] == 1
+    assert queue.claim(visibility_timeout=30) is None
+
+    assert queue.ack(job['job_id'], job['receipt'])
+    assert queue.claim(visibility_timeout=30) is None
+    # Выполненная задача не ставится повторно
+    assert not queue.put('r1', {'id': 'r1'})
+
+def test_each_job_is_claimed_once_by_concurrent_workers(queue):
+    for index in range(50):
+        queue.put(f"r{index}", {'id': index})
+
+    claimed = []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            job = queue.claim(visibility_timeout=30)
+            if job is None:
+                return
+            with lock:
+                claimed.append(job['job_id'])
+            assert queue.ack(job['job_id'], job['receipt'])
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(f"r{index}" for index in range(50))
+
+def test_visibility_timeout_returns_job_and_rejects_stale_receipt(queue):
+    queue.put('r1', {'id': 'r1'})
+    first = queue.claim(visibility_timeout=0.2)
+    assert queue.claim(visibility_timeout=0.2) is None
+
+    time.sleep(0.3)
+    second = queue.claim(visibility_timeout=30)
+    assert second['job_id'] == 'r1'
+    assert second['attempts'] == 2
+
+    # Опоздавший воркер не может закрыть задачу, которую уже забрал другой
+    assert not queue.ack(first['job_id'], first['receipt'])
+    assert queue.ack(second['job_id'], second['receipt'])
+
+def test_nack_after_max_attempts_buries_job(queue):
+    queue.put('r1', {'id': 'r1'})
+    job = queue.claim(visibility_timeout=30)
+    assert queue.nack(job['job_id'], job['receipt'])
+
+    job = queue.claim(visibility_timeout=30)
+    assert job['attempts'] == 2
+    assert queue.nack(job['job_id'], job['receipt'], error="boom")
+    assert queue.claim(visibility_timeout=30) is None
+
+def test_error_inside_exec_does_not_desync_connection(resp_server):
+    client = RESPClient(resp_server.host, resp_server.port)
+    client.execute('SET', 'text', 'abc')
+
+    with pytest.raises(RESPError):
+        client.transaction(('INCR', 'text'), ('SET', 'after', '1'))
+
+    # Остаток ответа EXEC прочитан - следующие команды получают свои ответы
+    assert client.execute('GET', 'after') == '1'
+    assert client.execute('INCR', 'counter') == 1
+
+def test_dead_job_is_revived_by_put(queue):
+    queue.put('r1', {'id': 'r1'})
+    for _ in range(2):
+        job = queue.claim(visibility_timeout=30)
+        queue.nack(job['job_id'], job['receipt'], error="boom")
+    assert queue.dead_ids() == ['r1']
+
+    assert queue.put('r1', {'id': 'r1'})
+    assert queue.dead_ids() == []
+    assert queue.claim(visibility_timeout=30)['attempts'] == 1
+
+def test_postpone_does_not_spend_attempts(queue):
+    queue.put('r1', {'id': 'r1'})
+    for _ in range(3):
+        job = queue.claim(visibility_timeout=30)
+        assert job['attempts'] == 1
+        assert queue.postpone(job['job_id'], job['receipt'], delay=0)
+
+    assert queue.in_flight() == [{'id': 'r1'}]
+    assert queue.dead_ids() == []
@@ -0,0 +1,80 @@
+from src.core.manager import ResponseManager
+from src.api.models import WBReview
+from src.core.workers import ReviewProducer, ReviewWorker
+from src.storage.leases import create_lease_store
+from src.storage.work_queue import SQLiteWorkQueue
+
+PAYLOAD = {
+    'id': 'r1',
+    'text': 'Отличный товар, спасибо',
+    'productValuation': 5,
+    'createdDate': '2024-01-02T10:00:00Z',
+    'productDetails': {'productName': 'Платье'}
+}
+
+def make_worker(bot_settings, monkeypatch, tmp_path):
+    manager = ResponseManager()
+    sent = []
+    monkeypatch.setattr(manager.wb_client, 'post_reply_to_review',
+                        lambda review_id, text: sent.append(review_id) or True)
+    monkeypatch.setattr(manager.wb_client, 'is_review_answered', lambda review_id: False)
+    queue = SQLiteWorkQueue(str(tmp_path / 'queue.db'))
+    queue.put('r1', PAYLOAD)
+    return ReviewWorker(manager, queue), queue, sent
+
+def test_worker_skips_review_leased_by_another_instance(bot_settings, monkeypatch, tmp_path):
+    worker, queue, sent = make_worker(bot_settings, monkeypatch, tmp_path)
+    other = create_lease_store(bot_settings.LEASE_URL)
+    assert other.acquire('review:r1', bot_settings.LEASE_TTL)
+
+    assert worker.run_once()
+
+    assert sent == []
+    assert not worker.manager.outbox.contains('r1')
+    # Задача вернется в очередь, когда аренда другого экземпляра истечет; попытка не потрачена
+    assert worker.stats['postponed'] == 1
+    assert queue.claim(visibility_timeout=30) is None
+    row = queue._conn().execute("SELECT attempts FROM work_queue WHERE job_id = 'r1'").fetchone()
+    assert row['attempts'] == 0
+
+def test_worker_drops_reply_when_lease_was_taken_over(bot_settings, monkeypatch, tmp_path):
+    worker, queue, sent = make_worker(bot_settings, monkeypatch, tmp_path)
+    manager = worker.manager
+    process_review = manager.processor.process_review
+
+    def slow_process(review):
+        # Пока шла генерация, аренда истекла и ее получил другой экземпляр
+        manager.leases.release(f"review:{review.id}", manager._lease_tokens[review.id])
+        create_lease_store(bot_settings.LEASE_URL).acquire(f"review:{review.id}", 600)
+        return process_review(review)
+
+    monkeypatch.setattr(manager.processor, 'process_review', slow_process)
+
+    assert worker.run_once()
+
+    assert sent == []
+    assert not manager.outbox.contains('r1')
+    assert worker.stats['done'] == 1
+
+def test_producer_keeps_cursor_at_unfinished_jobs_and_requeues_dead(bot_settings, monkeypatch, tmp_path):
+    manager = ResponseManager()
+    older = dict(PAYLOAD, id='r0', createdDate='2024-01-01T10:00:00Z')
+    newer = dict(PAYLOAD, id='r2', createdDate='2024-01-03T10:00:00Z')
+    reviews = [WBReview(newer), WBReview(older)]
+    monkeypatch.setattr(manager.wb_client, 'iter_unanswered_pages', lambda date_from=None: iter([reviews]))
+    monkeypatch.setattr(manager.wb_client, 'has_unseen_feedbacks', lambda: True)
+    queue = SQLiteWorkQueue(str(tmp_path / 'queue.db'), max_attempts=1)
+    producer = ReviewProducer(manager, queue)
+
+    assert producer.run_once() == 2
+    # Ответы еще не готовы - курсор держится на самом старом отзыве в очереди
+    assert manager.sync_cursor.date_from == reviews[1].created_ts
+
+    jobs = {job['job_id']: job for job in (queue.claim(30), queue.claim(30))}
+    queue.ack('r2', jobs['r2']['receipt'])
+    queue.nack('r0', jobs['r0']['receipt'], error="boom")
+
+    # Задача r0 умерла - следующая выборка ставит ее заново
+    assert queue.dead_ids() == ['r0']
+    assert producer.run_once() == 1
+    assert queue.dead_ids() == []